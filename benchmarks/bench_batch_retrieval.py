@@ -0,0 +1,66 @@
+"""Throughput of retrieve_context_batch against one retrieve_context call per question.
+
+Usage:
+    python benchmarks/bench_batch_retrieval.py --questions 1000 --batch-size 256
+"""
+import argparse
+import time
+
+from bench_utils import load_chunks, sample_questions, write_results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--n-results", type=int, default=5)
+    parser.add_argument("--chroma-path", default="car_chroma_db")
+    args = parser.parse_args()
+
+    import chromadb
+    from llm_rag import load_embedding_function, parse_query_for_filters, retrieve_context, retrieve_context_batch
+
+    embedding_function = load_embedding_function()
+    collection = chromadb.PersistentClient(path=args.chroma_path).get_collection(
+        name="car_data_chunks", embedding_function=embedding_function
+    )
+    questions = sample_questions(load_chunks(), limit=args.questions)
+    print(f"Benchmarking {len(questions)} questions against {collection.count()} chunks")
+
+    # Warm up the encoder and the HNSW index
+    retrieve_context(collection, questions[0], n_results=args.n_results)
+
+    start = time.perf_counter()
+    single = [
+        retrieve_context(collection, q, n_results=args.n_results, filters=parse_query_for_filters(q))
+        for q in questions
+    ]
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = []
+    for offset in range(0, len(questions), args.batch_size):
+        batched.extend(retrieve_context_batch(
+            collection, questions[offset:offset + args.batch_size],
+            n_results=args.n_results, embedding_function=embedding_function
+        ))
+    batch_seconds = time.perf_counter() - start
+
+    agreement = sum(
+        [c["chunk_id"] for c in a] == [c["chunk_id"] for c in b] for a, b in zip(single, batched)
+    ) / len(questions)
+
+    results = {
+        "questions": len(questions),
+        "batch_size": args.batch_size,
+        "n_results": args.n_results,
+        "single_qps": len(questions) / single_seconds,
+        "batch_qps": len(questions) / batch_seconds,
+        "speedup": single_seconds / batch_seconds,
+        "identical_results_ratio": agreement,
+    }
+    for key, value in results.items():
+        print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
+    write_results("batch_retrieval", results)
+
+if __name__ == "__main__":
+    main()
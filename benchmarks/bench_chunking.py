@@ -0,0 +1,108 @@
+"""Chunking throughput of the field-aware chunker on a synthetic listing corpus.
+
+The corpus is generated from the scraped listings, varying URL, price and
+kms so every listing is distinct; a small share get long seller remarks so
+the multi-chunk path is exercised too. LangChain's recursive splitter is
+timed on a smaller sample when it is installed.
+
+Usage:
+    python benchmarks/bench_chunking.py --listings 1000000
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+
+from bench_utils import DATA_DIR, write_results
+
+LONG_REMARKS = ("Single owner, all services done at the authorised service centre, "
+                "new tyres and battery, no accidents, insurance valid till next year. ") * 30
+
+def legacy_format_car_for_chunking(car):
+    """The original += formatter, kept here as the baseline"""
+    formatted_text = f"CAR: {car['car_name']}\n"
+    formatted_text += f"PRICE: {car['price']}\n"
+    formatted_text += "DETAILS:\n"
+    for key, value in car['details'].items():
+        formatted_text += f"  {key.replace('_', ' ').title()}: {value}\n"
+    if car['seller_remarks']:
+        formatted_text += f"SELLER REMARKS: {car['seller_remarks']}\n"
+    formatted_text += f"URL: {car['url']}\n"
+    return formatted_text
+
+def synthetic_listings(templates, count, long_share=0.02):
+    """count distinct listings cycled from the scraped ones"""
+    long_every = int(1 / long_share) if long_share else 0
+    for i, template in zip(range(count), itertools.cycle(templates)):
+        details = dict(template.get("details") or {})
+        details["kms_driven"] = f"{(i * 7919) % 150000:,} Kms"
+        yield {
+            "car_name": template.get("car_name"),
+            "price": f"₹ {1 + (i % 4000) / 100:.2f} Lakh",
+            "details": details,
+            "seller_remarks": LONG_REMARKS if long_every and i % long_every == 0 else template.get("seller_remarks"),
+            "url": f"{template.get('url')}?listing={i}",
+        }
+
+def timed(label, process, corpus, count, count_label, block_size=50000):
+    """Run process over the corpus in pre-generated blocks, timing only the processing"""
+    produced, seconds = 0, 0.0
+    listings = corpus(count)
+    while True:
+        block = list(itertools.islice(listings, block_size))
+        if not block:
+            break
+        start = time.perf_counter()
+        produced += process(block)
+        seconds += time.perf_counter() - start
+    rate = produced / seconds if seconds else None
+    print(f"{label}: {produced} {count_label} in {seconds:.2f}s ({rate:,.0f} {count_label}/sec)")
+    return {"count": produced, "seconds": seconds, f"{count_label}_per_second": rate}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", default=os.path.join(DATA_DIR, 'cartrade_cars_final.json'))
+    parser.add_argument("--listings", type=int, default=1000000)
+    parser.add_argument("--chunk-size", type=int, default=1500)
+    parser.add_argument("--chunk-overlap", type=int, default=150)
+    parser.add_argument("--recursive-sample", type=int, default=20000,
+                        help="listings to run through LangChain's splitter (0 to skip)")
+    args = parser.parse_args()
+
+    from chunking import format_car_for_chunking, iter_car_documents, iter_chunks, split_car_text
+
+    with open(args.source, 'r', encoding='utf-8') as file:
+        templates = [car for car in json.load(file) if car.get("car_name")]
+    corpus = lambda count: synthetic_listings(templates, count)
+
+    results = {"listings": args.listings, "chunk_size": args.chunk_size}
+    results["format_legacy"] = timed(
+        "format (+=)", lambda cars: sum(1 for car in cars if legacy_format_car_for_chunking(car)),
+        corpus, args.listings, "listings")
+    results["format_join"] = timed(
+        "format (join)", lambda cars: sum(1 for car in cars if format_car_for_chunking(car)),
+        corpus, args.listings, "listings")
+    results["split_fields"] = timed(
+        "format + split (fields)",
+        lambda cars: sum(len(split_car_text(format_car_for_chunking(car), args.chunk_size)) for car in cars),
+        corpus, args.listings, "chunks")
+    results["pipeline_fields"] = timed(
+        "documents + chunks + IDs (fields)",
+        lambda cars: sum(1 for _ in iter_chunks(iter_car_documents(cars), args.chunk_size, args.chunk_overlap)),
+        corpus, args.listings, "chunks")
+
+    if args.recursive_sample:
+        try:
+            results["pipeline_recursive"] = timed(
+                "documents + chunks + IDs (recursive)",
+                lambda cars: sum(1 for _ in iter_chunks(iter_car_documents(cars), args.chunk_size,
+                                                        args.chunk_overlap, splitter="recursive")),
+                corpus, args.recursive_sample, "chunks")
+        except ImportError:
+            print("LangChain is not installed; skipping the recursive splitter baseline")
+
+    write_results("chunking", results)
+
+if __name__ == "__main__":
+    main()
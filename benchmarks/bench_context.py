@@ -0,0 +1,149 @@
+"""Prompt size and end-to-end latency of the compact context layout against the full one.
+
+For every sampled question the retrieved chunks are formatted with the
+original "full" layout and with the "compact" layout at each --budgets value.
+Per layout it reports prompt tokens (context_builder.estimate_tokens),
+listings kept and formatting time. Then the whole pipeline is load tested
+once per layout, as in load_test.py.
+
+Answers come from an in-process llm_standin server. It charges
+--prefill-tokens-per-second for reading the prompt, so shorter prompts
+answer sooner, as they do with a hosted model. --llm gemini measures the
+real API instead.
+
+Usage:
+    python benchmarks/bench_context.py --encoder hash --budgets 1200 600 --requests 200
+    python benchmarks/bench_context.py --llm gemini --concurrency 2 --requests 50
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from bench_retrieval import load_encoder, open_or_build_collection
+from bench_utils import DATA_DIR, load_chunks, sample_questions, summarize_latencies, write_results
+from load_test import run_level, summarize_level
+
+def layouts_for(budgets):
+    """(name, layout, token_budget) for the full layout and each compact budget"""
+    return [("full", "full", None)] + [(f"compact_{budget}", "compact", budget) for budget in budgets]
+
+def summarize_values(values):
+    ordered = sorted(values)
+    return {
+        "mean": sum(values) / len(values) if values else None,
+        "p50": ordered[len(ordered) // 2] if values else None,
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if values else None,
+    }
+
+def measure_prompts(collection, questions, layouts, n_results):
+    """Prompt tokens, listing count and formatting latency per layout over the same retrieved contexts"""
+    from context_builder import estimate_tokens
+    from llm_rag import PROMPT_TEMPLATE, format_context_for_llm, retrieve_context
+
+    # retrieve_context logs every filter fallback; keep those lines out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        contexts = [retrieve_context(collection, q, n_results=n_results) for q in questions]
+
+    results = {}
+    for name, layout, budget in layouts:
+        tokens, listings, latencies = [], [], []
+        for question, ctx in zip(questions, contexts):
+            start = time.perf_counter()
+            formatted = format_context_for_llm(ctx, layout, budget)
+            latencies.append(time.perf_counter() - start)
+            tokens.append(estimate_tokens(PROMPT_TEMPLATE.format(context=formatted, query=question)))
+            listings.append(formatted.count("[CAR "))
+        results[name] = {
+            "prompt_tokens": summarize_values(tokens),
+            "listings": summarize_values(listings),
+            "format": summarize_latencies(latencies),
+        }
+
+    baseline = results["full"]["prompt_tokens"]["mean"]
+    for name, result in results.items():
+        result["token_reduction"] = 1 - result["prompt_tokens"]["mean"] / baseline if baseline else None
+        print(f"{name:14s} prompt tokens mean {result['prompt_tokens']['mean']:7.1f}  "
+              f"p95 {result['prompt_tokens']['p95']:6d}  ({result['token_reduction']:.1%} saved)  "
+              f"listings {result['listings']['mean']:.2f}  format p50 {result['format']['p50_ms']:.3f}ms")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budgets", type=int, nargs="+", default=[1200, 600], help="compact token budgets")
+    parser.add_argument("--n-results", type=int, default=5)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200, help="pipeline requests per layout")
+    parser.add_argument("--encoder", choices=["model", "hash"], default="model")
+    parser.add_argument("--chroma-path", default="car_chroma_db")
+    parser.add_argument("--chunks", default=os.path.join(DATA_DIR, 'cartrade_cars_chunked.json'))
+    parser.add_argument("--listings", default=os.path.join(DATA_DIR, 'cartrade_cars_final.json'))
+    parser.add_argument("--llm", choices=["standin", "gemini"], default="standin")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="stand-in time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=2000.0)
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--answer-tokens", type=int, default=35)
+    parser.add_argument("--output", help="results file (default benchmarks/results/context.json)")
+    args = parser.parse_args()
+
+    from llm_backends import HttpLLMBackend
+    from llm_rag import RAGEngine, initialize_clients
+    from llm_standin import start_standin
+
+    standin = None
+    embedding_function = load_encoder(args.encoder)
+    if args.llm == "gemini":
+        _, llm_client = initialize_clients(embedding_function)
+    else:
+        standin = start_standin(port=0, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                prefill_tokens_per_second=args.prefill_tokens_per_second,
+                                tokens_per_second=args.tokens_per_second, answer_tokens=args.answer_tokens, seed=7)
+        llm_client = HttpLLMBackend(standin.url)
+
+    layouts = layouts_for(args.budgets)
+    questions = sample_questions(load_chunks(args.chunks), limit=args.questions)
+    end_to_end = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        collection, _ = open_or_build_collection(args.chroma_path, args.chunks, embedding_function, tmpdir)
+        print(f"Comparing context layouts over {len(questions)} questions, {args.n_results} chunks each")
+        prompts = measure_prompts(collection, questions, layouts, args.n_results)
+
+        print(f"\nEnd to end at concurrency {args.concurrency}:")
+        for name, layout, budget in layouts:
+            engine = RAGEngine.from_components(collection, llm_client, embedding_function, answer_cache_path=None,
+                                               listings_path=args.listings, context_layout=layout,
+                                               context_token_budget=budget)
+            records, wall_seconds = run_level(engine, "pipeline", questions, args.concurrency, args.requests)
+            print(f"{name:14s}", end=" ")
+            end_to_end[name] = summarize_level(args.concurrency, records, wall_seconds)
+
+    baseline = end_to_end["full"]["latency"]["p50_ms"]
+    for name, summary in end_to_end.items():
+        summary["p50_change"] = summary["latency"]["p50_ms"] / baseline - 1 if baseline else None
+    print("p50 latency vs full: " + "  ".join(f"{name} {summary['p50_change']:+.1%}"
+                                             for name, summary in end_to_end.items() if name != "full"))
+
+    if standin is not None:
+        standin.shutdown()
+        standin.server_close()
+
+    write_results("context", {
+        "encoder": args.encoder,
+        "llm": args.llm,
+        "standin": None if standin is None else {
+            "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+            "prefill_tokens_per_second": args.prefill_tokens_per_second,
+            "tokens_per_second": args.tokens_per_second, "answer_tokens": args.answer_tokens,
+        },
+        "n_results": args.n_results,
+        "questions": len(questions),
+        "prompts": prompts,
+        "end_to_end": end_to_end,
+    }, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Per-query cost of the compiled FilterExtractor against the old keyword loops.
+
+Usage:
+    python benchmarks/bench_filter_extractor.py --repeat 2000
+"""
+import argparse
+import os
+import re
+
+from bench_utils import DATA_DIR, load_chunks, sample_questions, summarize_latencies, time_calls, write_results
+
+def legacy_parse_query_for_filters(query):
+    """The keyword-loop implementation parse_query_for_filters used to have"""
+    filters = []
+
+    brands = ["Toyota", "Honda", "Maruti", "Suzuki", "Hyundai", "Mahindra", "Tata", "Kia",
+              "Mercedes", "BMW", "Audi", "Volkswagen", "Ford", "Renault", "Nissan", "MG"]
+    for brand in brands:
+        if brand.lower() in query.lower():
+            filters.append({"car_name": {"$contains": brand}})
+            break
+
+    fuel_types = ["Petrol", "Diesel", "CNG", "Electric", "Hybrid"]
+    for fuel in fuel_types:
+        if fuel.lower() in query.lower():
+            filters.append({"fuel_type": fuel})
+            break
+
+    cities = ["Delhi", "Mumbai", "Bangalore", "Hyderabad", "Chennai", "Kolkata", "Pune"]
+    for city in cities:
+        if city.lower() in query.lower():
+            filters.append({"city": city})
+            break
+
+    year_match = re.search(r'\b(20\d{2})\b', query)
+    if year_match:
+        filters.append({"manufacturing_year": year_match.group(1)})
+
+    return {"$and": filters} if len(filters) > 1 else filters[0] if filters else None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--listings", default=os.path.join(DATA_DIR, 'cartrade_cars_final.json'))
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    from filter_extractor import FilterExtractor
+
+    extractor = FilterExtractor.from_json(args.listings)
+    questions = sample_questions(load_chunks(), limit=args.repeat)
+    calls = [(q,) for q in questions]
+
+    legacy = summarize_latencies(time_calls(legacy_parse_query_for_filters, calls))
+    compiled = summarize_latencies(time_calls(extractor.where_for, calls))
+
+    def filtered_fields(where):
+        return len(where["$and"]) if where and "$and" in where else (1 if where else 0)
+
+    results = {
+        "questions": len(questions),
+        "legacy": legacy,
+        "compiled": compiled,
+        "legacy_avg_fields": sum(filtered_fields(legacy_parse_query_for_filters(q)) for q in questions) / len(questions),
+        "compiled_avg_fields": sum(filtered_fields(extractor.where_for(q)) for q in questions) / len(questions),
+    }
+    for name in ("legacy", "compiled"):
+        print(f"{name:8s} p50 {results[name]['p50_ms'] * 1000:.1f}us  p99 {results[name]['p99_ms'] * 1000:.1f}us  "
+              f"avg filters/query {results[name + '_avg_fields']:.2f}")
+    write_results("filter_extractor", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Latency and recall of vector, BM25 and hybrid retrieval on the chunk set.
+
+Queries are exact "<model> <variant>" strings taken from the listings; a chunk
+is relevant when its text contains the queried string.
+
+Usage:
+    python benchmarks/bench_hybrid_retrieval.py --queries 200 --k 5
+    python benchmarks/bench_hybrid_retrieval.py --lexical-only   # no model or Chroma needed
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from bench_utils import load_chunks, summarize_latencies, write_results
+
+def build_queries(chunks, count, seed=7):
+    """Pick '<model> <first two variant words>' strings from random listings"""
+    from car_fields import split_car_name
+
+    rng = random.Random(seed)
+    queries = []
+    for chunk in rng.sample(chunks, min(count, len(chunks))):
+        parts = split_car_name(chunk["metadata"].get("car_name"))
+        if parts["model"] and parts["variant"]:
+            variant = " ".join(parts["variant"].split()[:2])
+            queries.append(f"{parts['model']} {variant}")
+    return queries
+
+def relevant_ids(chunks, query):
+    needle = query.lower()
+    return {chunk["chunk_id"] for chunk in chunks if needle in chunk["text"].lower()}
+
+def recall_at_k(retrieved, relevant, k):
+    if not relevant:
+        return None
+    return len(set(retrieved[:k]) & relevant) / min(k, len(relevant))
+
+def evaluate(name, search, queries, chunks, k):
+    latencies, recalls = [], []
+    for query in queries:
+        start = time.perf_counter()
+        retrieved = search(query)
+        latencies.append(time.perf_counter() - start)
+        recall = recall_at_k(retrieved, relevant_ids(chunks, query), k)
+        if recall is not None:
+            recalls.append(recall)
+    summary = summarize_latencies(latencies)
+    summary["recall_at_k"] = sum(recalls) / len(recalls) if recalls else None
+    print(f"{name:8s} recall@{k} {summary['recall_at_k']:.3f}  p50 {summary['p50_ms']:.2f}ms  "
+          f"p95 {summary['p95_ms']:.2f}ms")
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--chroma-path", default="car_chroma_db")
+    parser.add_argument("--lexical-only", action="store_true")
+    args = parser.parse_args()
+
+    from lexical_index import BM25Index
+
+    chunks = load_chunks()
+    queries = build_queries(chunks, args.queries)
+
+    start = time.perf_counter()
+    lexical_index = BM25Index.build([c["chunk_id"] for c in chunks], [c["text"] for c in chunks])
+    build_seconds = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "bm25_index.npz")
+        lexical_index.save(path)
+        index_bytes = os.path.getsize(path)
+    print(f"BM25 index over {len(chunks)} chunks built in {build_seconds:.2f}s, {index_bytes / 1024:.1f} KiB on disk")
+
+    results = {
+        "chunks": len(chunks),
+        "queries": len(queries),
+        "k": args.k,
+        "bm25_build_seconds": build_seconds,
+        "bm25_index_bytes": index_bytes,
+    }
+    results["lexical"] = evaluate(
+        "lexical", lambda q: [i for i, _ in lexical_index.search(q, top_k=args.k)], queries, chunks, args.k
+    )
+
+    if not args.lexical_only:
+        import chromadb
+        from llm_rag import load_embedding_function, retrieve_context
+
+        collection = chromadb.PersistentClient(path=args.chroma_path).get_collection(
+            name="car_data_chunks", embedding_function=load_embedding_function()
+        )
+
+        def search(query, mode):
+            contexts = retrieve_context(collection, query, n_results=args.k, lexical_index=lexical_index, mode=mode)
+            return [ctx["chunk_id"] for ctx in contexts]
+
+        search(queries[0], "vector")  # warm up the encoder
+        results["vector"] = evaluate("vector", lambda q: search(q, "vector"), queries, chunks, args.k)
+        results["hybrid"] = evaluate("hybrid", lambda q: search(q, "hybrid"), queries, chunks, args.k)
+
+    write_results("hybrid_retrieval", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Latency of aggregation questions answered by the columnar ListingIndex.
+
+Usage:
+    python benchmarks/bench_listing_index.py --repeat 1000
+"""
+import argparse
+import os
+
+from bench_utils import DATA_DIR, summarize_latencies, time_calls, write_results
+
+QUESTIONS = [
+    "average price of 2019 diesel Creta",
+    "cheapest Honda under 50,000 km",
+    "How many Toyota cars are listed?",
+    "most expensive BMW",
+    "average kms of petrol Maruti Suzuki Swift",
+    "cheapest car under 5 lakh",
+]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--listings", default=os.path.join(DATA_DIR, 'cartrade_cars_final.json'))
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    from listing_index import ListingIndex, parse_analytical_query
+
+    index = ListingIndex.from_json(args.listings)
+    print(f"Indexed {index.size} listings")
+
+    results = {}
+    for question in QUESTIONS:
+        spec = parse_analytical_query(question)
+        parse_latencies = time_calls(parse_analytical_query, [(question,)] * args.repeat)
+        answer_latencies = time_calls(index.answer, [(spec,)] * args.repeat)
+        results[question] = {
+            "parse": summarize_latencies(parse_latencies),
+            "answer": summarize_latencies(answer_latencies),
+            "matched": index.answer(spec)["matched"],
+        }
+        print(f"{question!r}: parse p50 {results[question]['parse']['p50_ms'] * 1000:.1f}us, "
+              f"answer p50 {results[question]['answer']['p50_ms'] * 1000:.1f}us")
+    write_results("listing_index", results)
+
+if __name__ == "__main__":
+    main()
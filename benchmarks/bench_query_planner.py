@@ -0,0 +1,154 @@
+"""Filtered retrieval with the query planner against filter-then-fallback.
+
+Questions with filters (the evaluation-style price/fuel questions plus broad
+"fuel in city" and "brand fuel" ones) are answered with retrieve_context,
+once without a planner and once with a QueryPlanner built from the
+collection's field statistics. Per approach it reports latency, how full
+the result lists are, how many results satisfy the whole filter and the
+recall of the exact filtered top-n. For the planner it also reports the
+chosen strategies and how often filters were relaxed.
+
+The collection is built from --listings with the current chunker, so chunks
+carry the brand/model/variant/colour metadata the filters use.
+
+Usage:
+    python benchmarks/bench_query_planner.py --encoder hash --queries 300
+    python benchmarks/bench_query_planner.py --n-results 10 --exact-scan-max 32
+"""
+import argparse
+import collections
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+
+from bench_retrieval import load_encoder, open_or_build_collection
+from bench_utils import DATA_DIR, sample_questions, summarize_latencies, write_results
+
+def write_listing_chunks(listings_path, output_path):
+    from chunking import iter_car_documents, iter_chunks
+    from jsonl_io import iter_json_records, write_jsonl
+    write_jsonl(iter_chunks(iter_car_documents(iter_json_records(listings_path))), output_path)
+    return output_path
+
+def broad_questions(stats, limit, seed=7):
+    """Questions filtering on common field values, e.g. "Diesel cars in Delhi" """
+    def common(field, count=6):
+        counts = stats.fields.get(field, {})
+        return [value for value, _ in sorted(counts.items(), key=lambda item: -item[1]) if value != "Unknown"][:count]
+
+    rng = random.Random(seed)
+    cities, fuels, brands = common("city"), common("fuel_type", 3), common("brand")
+    questions = []
+    for _ in range(limit):
+        if rng.random() < 0.5:
+            questions.append(f"{rng.choice(fuels)} cars in {rng.choice(cities)}")
+        else:
+            questions.append(f"Used {rng.choice(brands)} {rng.choice(fuels).lower()} cars")
+    return questions
+
+def run_approach(collection, cases, n_results, embedding_cache, planner, truth):
+    """Time retrieve_context over every (question, filters) case and score the results"""
+    from llm_rag import retrieve_context
+    from query_planner import where_matches
+
+    latencies, returned, strict, recalls = [], [], [], []
+    for (question, filters), expected in zip(cases, truth):
+        # retrieve_context logs every filter fallback; keep those lines out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            contexts = retrieve_context(collection, question, n_results=n_results, filters=filters,
+                                        embedding_cache=embedding_cache, planner=planner)
+            latencies.append(time.perf_counter() - start)
+        ids = [ctx["chunk_id"] for ctx in contexts]
+        returned.append(len(ids))
+        records = collection.get(ids=ids, include=["metadatas"]) if ids else {"metadatas": []}
+        strict.append(sum(where_matches(filters, m) for m in records["metadatas"]))
+        if expected:
+            recalls.append(len(set(ids) & set(expected)) / len(expected))
+    return {
+        "latency": summarize_latencies(latencies),
+        "fill_rate": sum(returned) / (n_results * len(cases)),
+        "strict_match_rate": sum(strict) / sum(returned) if sum(returned) else None,
+        "filtered_recall": sum(recalls) / len(recalls) if recalls else None,
+    }
+
+def report(name, result):
+    print(f"{name:10s} p50 {result['latency']['p50_ms']:7.2f}ms  p95 {result['latency']['p95_ms']:7.2f}ms  "
+          f"fill {result['fill_rate']:.1%}  strict matches {result['strict_match_rate']:.1%}  "
+          f"filtered recall {result['filtered_recall']:.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=300, help="evaluation-style questions (half as many broad ones)")
+    parser.add_argument("--n-results", type=int, default=5)
+    parser.add_argument("--encoder", choices=["model", "hash"], default="model")
+    parser.add_argument("--listings", default=os.path.join(DATA_DIR, 'cartrade_cars_final.json'))
+    parser.add_argument("--exact-scan-max", type=int, default=64)
+    parser.add_argument("--post-filter-min-selectivity", type=float, default=0.25)
+    parser.add_argument("--output", help="results file (default benchmarks/results/query_planner.json)")
+    args = parser.parse_args()
+
+    from filter_extractor import FilterExtractor
+    from query_planner import FieldStats, QueryPlanner
+    from rag_cache import EmbeddingCache
+
+    embedding_function = load_encoder(args.encoder)
+    extractor = FilterExtractor.from_json(args.listings)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        chunks_path = write_listing_chunks(args.listings, os.path.join(tmpdir, "chunks.jsonl"))
+        collection, _ = open_or_build_collection("", chunks_path, embedding_function, tmpdir)
+        start = time.perf_counter()
+        stats = FieldStats.from_collection(collection)
+        stats_seconds = time.perf_counter() - start
+        planner = QueryPlanner(stats, exact_scan_max=args.exact_scan_max,
+                               post_filter_min_selectivity=args.post_filter_min_selectivity)
+
+        from jsonl_io import iter_json_records
+        questions = sample_questions(list(iter_json_records(chunks_path)), limit=args.queries)
+        questions += broad_questions(stats, args.queries // 2)
+        cases = [(q, extractor.where_for(q)) for q in questions]
+        cases = [(q, filters) for q, filters in cases if filters]
+
+        # Warm the embedding cache so both approaches only differ in how they query
+        embedding_cache = EmbeddingCache(embedding_function, max_size=len(cases) + 1)
+        for question, _ in cases:
+            embedding_cache.get_embedding(question)
+        truth = []
+        for question, filters in cases:
+            ids = planner._exact_scan(collection, embedding_cache.get_embedding(question), filters, args.n_results)[0]
+            truth.append(list(ids))
+
+        print(f"{len(cases)} filtered questions over {stats.total} chunks "
+              f"({sum(1 for t in truth if len(t) < args.n_results)} with fewer than {args.n_results} exact matches)")
+        baseline = run_approach(collection, cases, args.n_results, embedding_cache, None, truth)
+        report("fallback", baseline)
+        planned = run_approach(collection, cases, args.n_results, embedding_cache, planner, truth)
+        report("planner", planned)
+
+        strategies = collections.Counter()
+        relaxed = 0
+        for question, filters in cases:
+            plan = planner.plan(filters, args.n_results)
+            strategies[plan.steps[0].strategy] += 1
+            relaxed += plan.steps[0].estimated < args.n_results
+        planned["first_step_strategies"] = dict(strategies)
+        planned["planned_relaxation_rate"] = relaxed / len(cases)
+        print(f"First-step strategies: {dict(strategies)}; relaxation planned for {relaxed / len(cases):.1%}")
+
+    write_results("query_planner", {
+        "encoder": args.encoder,
+        "n_results": args.n_results,
+        "questions": len(cases),
+        "chunks": stats.total,
+        "field_stats_seconds": stats_seconds,
+        "exact_scan_max": args.exact_scan_max,
+        "post_filter_min_selectivity": args.post_filter_min_selectivity,
+        "fallback": baseline,
+        "planner": planned,
+    }, args.output)
+
+if __name__ == "__main__":
+    main()
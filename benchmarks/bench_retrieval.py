@@ -0,0 +1,190 @@
+"""Stage-by-stage latency of retrieval: encoder, Chroma query (with and without filters) and prompt formatting.
+
+Each stage is timed on its own for every --n-results value and summarized as
+p50/p95/p99 latency and QPS. Results are written as JSON; --compare prints the
+change against an earlier results file and flags regressions.
+
+The collection in --chroma-path is used when it exists; otherwise one is built
+from the chunk file in a temporary directory. --encoder hash swaps the
+sentence-transformer for a feature-hashing encoder so Chroma itself can be
+measured on machines without the model (encoder timings then describe the
+hashing encoder, not the model).
+
+Usage:
+    python benchmarks/bench_retrieval.py --queries 200 --n-results 1 5 10 20
+    python benchmarks/bench_retrieval.py --encoder hash --compare benchmarks/results/retrieval.json
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import time
+
+import numpy as np
+
+from bench_utils import DATA_DIR, load_chunks, sample_questions, summarize_latencies, time_calls, write_results
+
+# Latencies shown by --compare; an increase beyond the tolerance in a gated one is a regression
+# (p99 over a few hundred queries is too noisy to gate on)
+COMPARED_FIELDS = ("p50_ms", "p95_ms", "p99_ms")
+GATED_FIELDS = ("p50_ms", "p95_ms")
+
+class HashingEmbeddingFunction:
+    """Deterministic bag-of-words feature hashing into a unit vector (no model download)"""
+
+    def __init__(self, dimensions=384):
+        self.dimensions = dimensions
+
+    def __call__(self, input):
+        vectors = np.zeros((len(input), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(input):
+            for token in re.findall(r"\w+", text.lower()):
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                vectors[row, value % self.dimensions] += 1.0 if value >> 63 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return list(vectors / np.where(norms == 0, 1.0, norms))
+
+    @staticmethod
+    def name():
+        return "bench-hashing"
+
+def load_encoder(kind):
+    if kind == "hash":
+        return HashingEmbeddingFunction()
+    from llm_rag import load_embedding_function
+    return load_embedding_function()
+
+def open_or_build_collection(chroma_path, chunks_path, embedding_function, build_dir):
+    """The stored collection when there is one, else a fresh one built from the chunk file"""
+    import chromadb
+    from embedding_store import COLLECTION_NAME, ChunkEncoder, ingest, open_collection
+    from jsonl_io import iter_json_records
+
+    if not isinstance(embedding_function, HashingEmbeddingFunction) and os.path.isdir(chroma_path):
+        client = chromadb.PersistentClient(path=chroma_path)
+        if COLLECTION_NAME in client.list_collections():
+            return client.get_collection(name=COLLECTION_NAME, embedding_function=embedding_function), None
+
+    collection = open_collection(build_dir, embedding_function=embedding_function)
+    encoder = ChunkEncoder(embedding_function=embedding_function)
+    stats = ingest(iter_json_records(chunks_path), collection, encoder)
+    print(f"Built a collection of {stats['added']} chunks in {stats['seconds']:.1f}s")
+    return collection, stats["seconds"]
+
+def report(name, summary):
+    print(f"{name:32s} p50 {summary['p50_ms']:8.2f}ms  p95 {summary['p95_ms']:8.2f}ms  "
+          f"p99 {summary['p99_ms']:8.2f}ms  {summary['qps']:9.1f} qps")
+    return summary
+
+def run_stages(collection, embedding_function, questions, filters, n_results_values):
+    """Time every stage; returns {stage: summary} with one entry per n_results where it applies"""
+    from llm_rag import format_context_for_llm, retrieve_context
+
+    stages = {}
+    calls = [(q,) for q in questions]
+    stages["encoder"] = report("encoder", summarize_latencies(time_calls(lambda q: embedding_function([q]), calls)))
+    embeddings = [embedding_function([q])[0] for q in questions]
+
+    filtered = [(embedding, where) for embedding, where in zip(embeddings, filters) if where]
+    for n in n_results_values:
+        stages[f"query_n{n}"] = report(f"collection.query n={n}", summarize_latencies(time_calls(
+            lambda e: collection.query(query_embeddings=[e], n_results=n), [(e,) for e in embeddings]
+        )))
+
+        if filtered:
+            hits = []
+
+            def filtered_query(embedding, where):
+                result = collection.query(query_embeddings=[embedding], n_results=n, where=where)
+                hits.append(bool(result["ids"][0]))
+
+            summary = summarize_latencies(time_calls(filtered_query, filtered, warmup=0))
+            summary["hit_ratio"] = sum(hits) / len(hits)
+            stages[f"query_filtered_n{n}"] = report(f"collection.query+where n={n}", summary)
+
+        # retrieve_context logs every filter fallback; keep those lines out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            contexts = [retrieve_context(collection, q, n_results=n) for q in questions]
+            retrieve_latencies = time_calls(lambda q, where: retrieve_context(collection, q, n_results=n, filters=where),
+                                            list(zip(questions, filters)))
+        stages[f"format_n{n}"] = report(f"format_context_for_llm n={n}", summarize_latencies(
+            time_calls(format_context_for_llm, [(c,) for c in contexts])
+        ))
+        stages[f"retrieve_context_n{n}"] = report(f"retrieve_context n={n}", summarize_latencies(retrieve_latencies))
+    return stages
+
+def compare(previous_path, stages, tolerance):
+    """Print per-stage changes against an earlier run; returns the names of regressed stages"""
+    with open(previous_path, encoding="utf-8") as file:
+        previous = json.load(file)["results"]["stages"]
+    regressions = []
+    print(f"\nChange against {previous_path} (regression threshold {tolerance:.0%}):")
+    for name, summary in stages.items():
+        if name not in previous:
+            continue
+        changes = []
+        for field in COMPARED_FIELDS:
+            before, after = previous[name].get(field), summary.get(field)
+            if before and after is not None:
+                change = after / before - 1
+                changes.append(f"{field} {change:+.1%}")
+                if field in GATED_FIELDS and change > tolerance:
+                    regressions.append(name)
+        print(f"  {name:28s} " + "  ".join(changes))
+    regressions = sorted(set(regressions))
+    print(f"Regressed stages: {', '.join(regressions)}" if regressions else "No regressions")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--n-results", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--chroma-path", default="car_chroma_db")
+    parser.add_argument("--chunks", default=os.path.join(DATA_DIR, 'cartrade_cars_chunked.json'))
+    parser.add_argument("--listings", default=os.path.join(DATA_DIR, 'cartrade_cars_final.json'))
+    parser.add_argument("--encoder", choices=["model", "hash"], default="model")
+    parser.add_argument("--output", help="results file (default benchmarks/results/retrieval.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative slowdown counted as a regression")
+    args = parser.parse_args()
+
+    from filter_extractor import FilterExtractor
+
+    # The same extractor parse_query_for_filters builds from the scraped listings
+    extractor = FilterExtractor.from_json(args.listings) if os.path.exists(args.listings) else FilterExtractor.default()
+    questions = sample_questions(load_chunks(args.chunks), limit=args.queries)
+    start = time.perf_counter()
+    filters = [extractor.where_for(q) for q in questions]
+    filter_seconds = time.perf_counter() - start
+
+    embedding_function = load_encoder(args.encoder)
+    with tempfile.TemporaryDirectory() as build_dir:
+        collection, build_seconds = open_or_build_collection(args.chroma_path, args.chunks, embedding_function,
+                                                             build_dir)
+        print(f"Benchmarking {len(questions)} queries against {collection.count()} chunks "
+              f"({sum(1 for f in filters if f)} with filters)")
+        stages = run_stages(collection, embedding_function, questions, filters, args.n_results)
+        chunk_count = collection.count()
+
+    results = {
+        "encoder": args.encoder,
+        "queries": len(questions),
+        "filtered_queries": sum(1 for f in filters if f),
+        "chunks": chunk_count,
+        "n_results": args.n_results,
+        "collection_build_seconds": build_seconds,
+        "filter_extraction_ms": filter_seconds / len(questions) * 1000 if questions else None,
+        "stages": stages,
+    }
+    # Compared before writing, so the baseline may be the file this run replaces
+    if args.compare:
+        results["regressions"] = compare(args.compare, stages, args.tolerance)
+    write_results("retrieval", results, args.output)
+
+if __name__ == "__main__":
+    main()
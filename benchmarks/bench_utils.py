@@ -0,0 +1,80 @@
+"""Shared helpers for the benchmark scripts in this directory."""
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), '..', 'src')
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+# Make the src/ modules importable the same way the tests do
+sys.path.append(SRC_DIR)
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def summarize_latencies(latencies):
+    """p50/p95/p99/mean in milliseconds and throughput for per-call latencies in seconds"""
+    total = sum(latencies)
+    return {
+        "count": len(latencies),
+        "mean_ms": total / len(latencies) * 1000 if latencies else None,
+        "p50_ms": percentile(latencies, 50) * 1000 if latencies else None,
+        "p95_ms": percentile(latencies, 95) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 99) * 1000 if latencies else None,
+        "qps": len(latencies) / total if total else None,
+    }
+
+def time_calls(func, args_list, warmup=1):
+    """Call func once per argument tuple and return the per-call latencies in seconds"""
+    for args in args_list[:warmup]:
+        func(*args)
+    latencies = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def load_chunks(path=None):
+    """Load the chunked car data used as the benchmark corpus"""
+    path = path or os.path.join(DATA_DIR, 'cartrade_cars_chunked.json')
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def sample_questions(chunks, limit=None):
+    """Evaluation-style questions about the cars in the chunk set"""
+    questions = []
+    for chunk in chunks:
+        car_name = chunk.get('metadata', {}).get('car_name')
+        if not car_name or car_name == "None":
+            continue
+        questions.append(f"What is the price of {car_name}?")
+        questions.append(f"What is the fuel type of {car_name}?")
+        if limit and len(questions) >= limit:
+            break
+    return questions[:limit] if limit else questions
+
+def write_results(name, results, output_path=None):
+    """Write benchmark results as JSON, tagged with the environment they were measured in"""
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output_path = output_path or os.path.join(RESULTS_DIR, f"{name}.json")
+    payload = {
+        "benchmark": name,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    with open(output_path, 'w', encoding='utf-8') as file:
+        json.dump(payload, file, indent=2)
+    print(f"Saved results to {output_path}")
+    return output_path
@@ -0,0 +1,189 @@
+"""Closed-loop load test of the RAG pipeline against a local LLM stand-in.
+
+Worker threads send questions through car_rag_pipeline (or, with --target
+stream, car_rag_pipeline_stream as the Streamlit front end does) at each
+--concurrency level. Per level it reports throughput, latency percentiles,
+error rate and how request time splits between retrieval and generation
+(plus time to first token when streaming). With --trace each level also
+gets the per-stage span timings from the tracing module.
+
+By default answers come from an in-process llm_standin server, so no Gemini
+calls are made; --encoder hash also removes the embedding model, making the
+whole run offline.
+
+Usage:
+    python benchmarks/load_test.py --encoder hash --concurrency 1 4 16 --requests 200
+    python benchmarks/load_test.py --target stream --latency-ms 600 --tokens-per-second 50 --error-rate 0.02
+    python benchmarks/load_test.py --llm-url http://127.0.0.1:8765 --concurrency 32
+    python benchmarks/load_test.py --encoder hash --trace
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+
+from bench_retrieval import load_encoder, open_or_build_collection
+from bench_utils import DATA_DIR, load_chunks, sample_questions, summarize_latencies, write_results
+
+def run_request(engine, target, question):
+    """Answer one question; returns its latency, time split and whether it failed"""
+    from llm_rag import car_rag_pipeline, car_rag_pipeline_stream
+
+    trace = {}
+    first_token = None
+    start = time.perf_counter()
+    if target == "stream":
+        fragments = []
+        for fragment in car_rag_pipeline_stream(question, engine=engine, trace=trace):
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            fragments.append(fragment)
+        answer = "".join(fragments)
+    else:
+        answer = car_rag_pipeline(question, engine=engine, trace=trace)
+    return {
+        "seconds": time.perf_counter() - start,
+        "retrieval_seconds": trace.get("retrieval_seconds", 0.0),
+        "generation_seconds": trace.get("generation_seconds", 0.0),
+        "first_token_seconds": first_token,
+        "error": answer.startswith("Error"),
+    }
+
+def run_level(engine, target, questions, concurrency, requests, duration=None):
+    """Keep `concurrency` requests in flight until `requests` are sent (or `duration` seconds pass)"""
+    lock = threading.Lock()
+    sent = [0]
+    records = []
+    deadline = time.perf_counter() + duration if duration else None
+
+    def worker():
+        while True:
+            with lock:
+                if sent[0] >= requests or (deadline and time.perf_counter() >= deadline):
+                    return
+                question = questions[sent[0] % len(questions)]
+                sent[0] += 1
+            record = run_request(engine, target, question)
+            with lock:
+                records.append(record)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    # The pipeline logs every step; keep that out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return records, time.perf_counter() - start
+
+def summarize_level(concurrency, records, wall_seconds):
+    total_seconds = sum(r["seconds"] for r in records)
+    errors = sum(r["error"] for r in records)
+    summary = {
+        "concurrency": concurrency,
+        "requests": len(records),
+        "errors": errors,
+        "error_rate": errors / len(records) if records else None,
+        "wall_seconds": wall_seconds,
+        "throughput_rps": len(records) / wall_seconds if wall_seconds else None,
+        "latency": summarize_latencies([r["seconds"] for r in records]),
+        "retrieval": summarize_latencies([r["retrieval_seconds"] for r in records]),
+        "generation": summarize_latencies([r["generation_seconds"] for r in records]),
+        "retrieval_share": sum(r["retrieval_seconds"] for r in records) / total_seconds if total_seconds else None,
+        "generation_share": sum(r["generation_seconds"] for r in records) / total_seconds if total_seconds else None,
+    }
+    first_tokens = [r["first_token_seconds"] for r in records if r["first_token_seconds"] is not None]
+    if first_tokens:
+        summary["time_to_first_token"] = summarize_latencies(first_tokens)
+    print(f"concurrency {concurrency:3d}: {summary['throughput_rps']:7.2f} req/s  "
+          f"p50 {summary['latency']['p50_ms']:8.1f}ms  p95 {summary['latency']['p95_ms']:8.1f}ms  "
+          f"p99 {summary['latency']['p99_ms']:8.1f}ms  errors {summary['error_rate']:.1%}  "
+          f"retrieval {summary['retrieval_share']:.0%} / generation {summary['generation_share']:.0%}")
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--duration", type=float, help="stop each level after this many seconds")
+    parser.add_argument("--target", choices=["pipeline", "stream"], default="pipeline")
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--encoder", choices=["model", "hash"], default="model")
+    parser.add_argument("--chroma-path", default="car_chroma_db")
+    parser.add_argument("--chunks", default=os.path.join(DATA_DIR, 'cartrade_cars_chunked.json'))
+    parser.add_argument("--listings", default=os.path.join(DATA_DIR, 'cartrade_cars_final.json'))
+    parser.add_argument("--answer-cache", action="store_true", help="keep the answer cache on (off by default)")
+    parser.add_argument("--llm", choices=["standin", "gemini"], default="standin")
+    parser.add_argument("--llm-url", help="an already running HTTP backend instead of the in-process stand-in")
+    parser.add_argument("--latency-ms", type=float, default=400.0, help="stand-in time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--answer-tokens", type=int, default=35)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--trace", action="store_true", help="record per-stage timings with the tracing module")
+    parser.add_argument("--output", help="results file (default benchmarks/results/load_test.json)")
+    args = parser.parse_args()
+
+    from llm_backends import HttpLLMBackend
+    from llm_rag import RAGEngine, initialize_clients
+    from llm_standin import start_standin
+    import tracing
+
+    tracer = tracing.enable_tracing() if args.trace else tracing.get_tracer()
+
+    standin = None
+    embedding_function = load_encoder(args.encoder)
+    if args.llm == "gemini":
+        _, llm_client = initialize_clients(embedding_function)
+    elif args.llm_url:
+        llm_client = HttpLLMBackend(args.llm_url)
+    else:
+        standin = start_standin(port=0, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                tokens_per_second=args.tokens_per_second, answer_tokens=args.answer_tokens,
+                                error_rate=args.error_rate, seed=7)
+        llm_client = HttpLLMBackend(standin.url)
+
+    questions = sample_questions(load_chunks(args.chunks), limit=args.questions)
+    levels = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        collection, _ = open_or_build_collection(args.chroma_path, args.chunks, embedding_function, tmpdir)
+        engine = RAGEngine.from_components(
+            collection, llm_client, embedding_function,
+            answer_cache_path=os.path.join(tmpdir, "answers.sqlite3") if args.answer_cache else None,
+            listings_path=args.listings,
+            max_concurrent_llm_calls=max(args.concurrency)
+        )
+        print(f"Load testing {args.target} over {collection.count()} chunks with {len(questions)} distinct questions")
+        for concurrency in args.concurrency:
+            tracer.reset()
+            records, wall_seconds = run_level(engine, args.target, questions, concurrency, args.requests,
+                                              args.duration)
+            levels.append(summarize_level(concurrency, records, wall_seconds))
+            if args.trace:
+                levels[-1]["stages"] = tracer.stage_summary()
+                print("    " + "  ".join(f"{stage} {entry['mean_ms']:.1f}ms"
+                                         for stage, entry in sorted(levels[-1]["stages"].items())))
+
+    if standin is not None:
+        standin.shutdown()
+        standin.server_close()
+
+    write_results("load_test", {
+        "target": args.target,
+        "encoder": args.encoder,
+        "llm": args.llm_url or args.llm,
+        "standin": None if standin is None else {
+            "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "tokens_per_second": args.tokens_per_second,
+            "answer_tokens": args.answer_tokens, "error_rate": args.error_rate, "stats": standin.stats,
+        },
+        "answer_cache": args.answer_cache,
+        "trace": args.trace,
+        "levels": levels,
+    }, args.output)
+
+if __name__ == "__main__":
+    main()
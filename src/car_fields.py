@@ -0,0 +1,82 @@
+import re
+
+# Brands whose name spans more than one word in CarTrade listing titles
+MULTI_WORD_BRANDS = ["Maruti Suzuki", "Land Rover", "Aston Martin", "Force Motors"]
+
+_MULTI_WORD_BRANDS_LOWER = [brand.lower() for brand in MULTI_WORD_BRANDS]
+
+OWNER_RANKS = {"first": 1, "second": 2, "third": 3, "fourth": 4, "4 or more": 4}
+
+_YEAR_PATTERN = re.compile(r'(19|20)\d{2}')
+
+def split_car_name(car_name):
+    """Split a listing title like '2020 Kia Seltos HTX 1.5 Diesel' into its parts.
+
+    Returns a dict with year, brand, model and variant (any of which may be
+    None when the title does not contain it).
+    """
+    parts = {"year": None, "brand": None, "model": None, "variant": None}
+    if not car_name or not isinstance(car_name, str):
+        return parts
+
+    words = car_name.split()
+    if words and _YEAR_PATTERN.fullmatch(words[0]):
+        parts["year"] = words.pop(0)
+
+    rest = " ".join(words)
+    rest_lower = rest.lower()
+    for brand in _MULTI_WORD_BRANDS_LOWER:
+        if rest_lower.startswith(brand + " ") or rest_lower == brand:
+            parts["brand"] = rest[:len(brand)]
+            words = rest[len(brand):].split()
+            break
+    else:
+        if words:
+            parts["brand"] = words.pop(0)
+
+    if words:
+        parts["model"] = words.pop(0)
+    if words:
+        parts["variant"] = " ".join(words)
+    return parts
+
+def parse_price_rupees(price_str):
+    """Convert a price string like '₹ 32.8 Lakh' to rupees, or None"""
+    if not price_str or not isinstance(price_str, str):
+        return None
+    match = re.search(r'₹\s*([\d.,]+)\s*(Lakh|Crore)?', price_str, re.IGNORECASE)
+    if not match:
+        return None
+    try:
+        amount = float(match.group(1).replace(',', ''))
+    except ValueError:
+        return None
+    denomination = (match.group(2) or "").lower()
+    if denomination == "lakh":
+        return amount * 100000
+    if denomination == "crore":
+        return amount * 10000000
+    return amount
+
+def parse_kms(kms_str):
+    """Convert '50,745 Kms' to 50745, or None"""
+    if not kms_str or not isinstance(kms_str, str):
+        return None
+    match = re.search(r'([\d,]+)', kms_str)
+    if not match:
+        return None
+    return int(match.group(1).replace(',', ''))
+
+def parse_owner_rank(owners_str):
+    """Convert 'First'/'Second'/... to 1/2/..., or None when unknown"""
+    if not owners_str or not isinstance(owners_str, str):
+        return None
+    return OWNER_RANKS.get(owners_str.strip().lower())
+
+def format_rupees(amount):
+    """Format rupees the way listings do, e.g. '₹12.5 Lakh (₹1,250,000.00)'"""
+    if amount is None:
+        return "Not available"
+    if amount >= 10000000:
+        return f"₹{amount / 10000000:.2f} Crore (₹{amount:,.2f})"
+    return f"₹{amount / 100000:.2f} Lakh (₹{amount:,.2f})"
@@ -0,0 +1,18 @@
+# Where each scraped field lives on CarTrade pages, shared by the Selenium and HTTP scrapers
+
+LISTING_PAGE_URL = "https://www.cartrade.com/second-hand/delhi/page-{page}/#so=-1&sc=-1&city=10"
+
+# Listing page: one <li> card per car, each wrapping a link to the car's detail page
+CARD_XPATH = "/html/body/div[6]/div[2]/div[1]/div[4]/ul/li"
+CARD_ANCHOR_XPATH = CARD_XPATH + "[{index}]/a"
+
+# Car detail page
+PRICE_XPATH = "/html/body/div[2]/div[9]/div[1]/div[2]/div/div[1]/div[1]"
+CAR_NAME_XPATH = "/html/body/div[2]/div[9]/div[1]/div[2]/div/div[2]/h1"
+DETAILS_TABLE_XPATH = "/html/body/div[2]/div[9]/div[1]/div[2]/div/div[4]/table"
+DETAILS_TABLE_CSS = "table.v_table"
+SELLER_REMARKS_XPATH = "/html/body/div[2]/div[9]/div[1]/div[1]/div[3]"
+
+def clean_label(label):
+    """Details table label as a record key, e.g. 'Fuel Type' -> 'fuel_type'"""
+    return label.strip().lower().replace(' ', '_')
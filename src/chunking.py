@@ -1,6 +1,7 @@
+import hashlib
 import json
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-import uuid
+from car_fields import split_car_name
+from jsonl_io import iter_json_records, write_jsonl
 
 # 1. Load the car data from the JSON file
 def load_car_data(filepath):
@@ -10,33 +11,45 @@ def load_car_data(filepath):
 # 2. Convert cars to structured text format for better chunking
 def format_car_for_chunking(car):
     """Format a car JSON object into a structured text representation for chunking."""
-    formatted_text = f"CAR: {car['car_name']}\n"
-    formatted_text += f"PRICE: {car['price']}\n"
+    return "".join(car_field_lines(car))
+
+# Detail keys repeat across every listing, so their display labels are formatted once
+_DETAIL_LABELS = {}
+
+def _detail_label(key):
+    label = _DETAIL_LABELS.get(key)
+    if label is None:
+        label = _DETAIL_LABELS[key] = key.replace('_', ' ').title()
+    return label
+
+def car_field_lines(car):
+    """The lines of a formatted car, one per field, each ending in a newline."""
+    lines = [f"CAR: {car['car_name']}\n", f"PRICE: {car['price']}\n", "DETAILS:\n"]
 
     # Add all details
-    formatted_text += "DETAILS:\n"
-    for key, value in car['details'].items():
-        formatted_text += f"  {key.replace('_', ' ').title()}: {value}\n"
+    lines.extend([f"  {_detail_label(key)}: {value}\n" for key, value in car['details'].items()])
 
     # Add seller remarks if available
     if car['seller_remarks']:
-        formatted_text += f"SELLER REMARKS: {car['seller_remarks']}\n"
+        lines.append(f"SELLER REMARKS: {car['seller_remarks']}\n")
 
-    formatted_text += f"URL: {car['url']}\n"
-
-    return formatted_text
+    lines.append(f"URL: {car['url']}\n")
+    return lines
 
 # 3. Create individual JSON objects for each car with its metadata
 def create_car_documents(cars):
     """Create separate documents for each car with metadata."""
-    documents = []
+    return list(iter_car_documents(cars))
 
+def iter_car_documents(cars):
+    """Yield one document with metadata per car, one car at a time."""
     for car in cars:
         # Create formatted text for the car
         text = format_car_for_chunking(car)
 
         # Extract metadata safely using .get() to avoid KeyErrors
         details = car.get("details", {})
+        name_parts = split_car_name(car.get("car_name"))
         doc = {
             "text": text,
             "metadata": {
@@ -45,42 +58,125 @@ def create_car_documents(cars):
                 "city": details.get("city", "Unknown"),
                 "fuel_type": details.get("fuel_type", "Unknown"),
                 "manufacturing_year": details.get("manufacturing_year", "Unknown"),
+                "brand": name_parts["brand"] or "Unknown",
+                "model": name_parts["model"] or "Unknown",
+                "variant": name_parts["variant"] or "Unknown",
+                "colour": details.get("colour", "Unknown"),
                 "url": car.get("url", "Unknown")
             }
         }
 
-        documents.append(doc)
-
-    return documents
-
-
-# 4. Apply LangChain chunking
-def chunk_car_documents(documents, chunk_size=1000, chunk_overlap=200):
-    """Split documents into chunks using LangChain's RecursiveCharacterTextSplitter."""
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        length_function=len,
-        separators=["\n\n", "\n", " ", ""]
-    )
-
-    chunked_documents = []
+        yield doc
+
+
+def make_chunk_id(url, chunk_index, text, metadata):
+    """Deterministic chunk ID from the listing URL, chunk position and a hash of the content.
+
+    Re-chunking an unchanged listing yields the same ID, while any edit to the
+    text or metadata yields a new one, so ingestion can diff by ID alone.
+    metadata may be passed already serialized by metadata_key.
+    """
+    if not isinstance(metadata, str):
+        metadata = metadata_key(metadata)
+    # Byte for byte json.dumps([text, metadata], sort_keys=True, ensure_ascii=False),
+    # the content IDs have hashed since they were introduced
+    content = f"[{json.dumps(text, ensure_ascii=False)}, {metadata}]"
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    key = f"{url}\x00{chunk_index}\x00{content_hash}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+def metadata_key(metadata):
+    """Canonical serialization of chunk metadata for make_chunk_id"""
+    return json.dumps(metadata, sort_keys=True, ensure_ascii=False)
+
+# 4. Split formatted cars into chunks
+def _split_words(text, room):
+    """Split text at spaces into pieces of at most room characters"""
+    pieces = []
+    while len(text) > room:
+        cut = text.rfind(" ", 0, room + 1)
+        if cut <= 0:
+            # A single word longer than room has to be cut mid-word
+            pieces.append(text[:room])
+            text = text[room:]
+        else:
+            pieces.append(text[:cut])
+            text = text[cut + 1:]
+    if text:
+        pieces.append(text)
+    return pieces
+
+def split_car_text(text, chunk_size=1000):
+    """Field-aware chunking of a formatted car.
+
+    A car that fits in chunk_size is a single chunk, exactly what
+    RecursiveCharacterTextSplitter returns for it (the stripped text). Longer
+    cars are cut between field lines, every chunk after the first repeats the
+    CAR line so it still says which car it describes, and only a line that is
+    too long on its own (in practice the seller remarks) is split between words.
+    """
+    if len(text) <= chunk_size:
+        return [text.strip()]
+
+    lines = text.splitlines()
+    header = lines[0]
+    chunks, current = [], header
+    for line in lines[1:]:
+        if not line.strip():
+            continue
+        if len(current) + 1 + len(line) <= chunk_size:
+            current = f"{current}\n{line}"
+            continue
+        chunks.append(current)
+        room = chunk_size - len(header) - 1
+        pieces = _split_words(line, room) if len(line) > room else [line]
+        for piece in pieces[:-1]:
+            chunks.append(f"{header}\n{piece}")
+        current = f"{header}\n{pieces[-1]}"
+    chunks.append(current)
+    return [chunk.strip() for chunk in chunks if chunk.strip()]
+
+def chunk_car_documents(documents, chunk_size=1000, chunk_overlap=200, splitter="fields"):
+    """Split documents into chunks (see iter_chunks for the splitter options)."""
+    return list(iter_chunks(documents, chunk_size, chunk_overlap, splitter))
+
+def iter_chunks(documents, chunk_size=1000, chunk_overlap=200, splitter="fields"):
+    """Yield chunks document by document, so callers can consume them as they are produced.
+
+    splitter="fields" uses split_car_text; splitter="recursive" uses LangChain's
+    RecursiveCharacterTextSplitter with chunk_overlap, as the pipeline originally did.
+    """
+    if splitter == "recursive":
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len,
+            separators=["\n\n", "\n", " ", ""]
+        )
+        split_text = text_splitter.split_text
+    elif splitter == "fields":
+        split_text = lambda text: split_car_text(text, chunk_size)
+    else:
+        raise ValueError(f"Unknown splitter: {splitter}")
 
     for doc in documents:
         # Split the document text into chunks
-        chunks = text_splitter.split_text(doc["text"])
+        chunks = split_text(doc["text"])
+        doc_metadata_key = metadata_key(doc["metadata"])
 
         # Create new documents for each chunk with the original metadata
         for i, chunk_text in enumerate(chunks):
-            chunk_doc = {
-                "chunk_id": str(uuid.uuid4()),
+            yield {
+                "chunk_id": make_chunk_id(doc["metadata"]["url"], i, chunk_text, doc_metadata_key),
                 "chunk_index": i,
                 "text": chunk_text,
                 "metadata": doc["metadata"]
             }
-            chunked_documents.append(chunk_doc)
 
-    return chunked_documents
+def stream_car_chunks(input_filepath, chunk_size=1000, chunk_overlap=200):
+    """Read listings (JSON array or JSONL) and yield their chunks one listing at a time."""
+    return iter_chunks(iter_car_documents(iter_json_records(input_filepath)), chunk_size, chunk_overlap)
 
 # 5. Main function to process and save chunked data
 def process_and_save_car_chunks(input_filepath, output_filepath, chunk_size=1000, chunk_overlap=200):
@@ -110,13 +206,20 @@ def process_and_save_car_chunks(input_filepath, output_filepath, chunk_size=1000
 
     return chunked_documents
 
+# 6. Streaming variant: constant memory, chunks written as JSON Lines
+def process_and_save_car_chunks_jsonl(input_filepath, output_filepath, chunk_size=1000, chunk_overlap=200):
+    """Chunk listings one at a time and append each chunk to a JSONL file."""
+    count = write_jsonl(stream_car_chunks(input_filepath, chunk_size, chunk_overlap), output_filepath)
+    print(f"Saved {count} chunks from {input_filepath} to {output_filepath}")
+    return count
+
 # Example usage
 if __name__ == "__main__":
     input_file = "cartrade_cars_final.json"
-    output_file = "cartrade_cars_chunked.json"
+    output_file = "cartrade_cars_chunked.jsonl"
 
     # Process with custom chunk size and overlap
-    chunked_data = process_and_save_car_chunks(
+    process_and_save_car_chunks_jsonl(
         input_file,
         output_file,
         chunk_size=1500,  # Adjust based on your needs
@@ -0,0 +1,124 @@
+import logging
+import queue
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+def clean_metadata(metadata):
+    """Replace None values with appropriate defaults for ChromaDB compatibility."""
+    return {
+        key: (str(value) if value is not None else "Unknown")  # Convert None to string
+        for key, value in metadata.items()
+    }
+
+def stored_chunk_ids(collection, page_size=10000):
+    """All chunk IDs currently in the collection, without loading documents or embeddings"""
+    ids = set()
+    offset = 0
+    while True:
+        page = collection.get(include=[], limit=page_size, offset=offset)["ids"]
+        ids.update(page)
+        if len(page) < page_size:
+            return ids
+        offset += page_size
+
+def chunk_record(chunk):
+    """(id, document, metadata) for adding a chunk to the collection"""
+    metadata = clean_metadata(chunk.get("metadata", {}))
+    metadata["chunk_index"] = chunk["chunk_index"]
+    return chunk["chunk_id"], chunk["text"], metadata
+
+def _add_batch(collection, batch, embeddings=None):
+    ids, documents, metadatas = zip(*(chunk_record(chunk) for chunk in batch))
+    collection.add(ids=list(ids), documents=list(documents), metadatas=list(metadatas), embeddings=embeddings)
+
+def _insert_in_background(collection, encoded_batches, queue_size):
+    """Insert (batch, embeddings) pairs on a separate thread while the next batches are encoded"""
+    pending = queue.Queue(maxsize=queue_size)
+    errors = []
+
+    def insert():
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            if errors:
+                continue
+            try:
+                _add_batch(collection, *item)
+            except Exception as e:
+                errors.append(e)
+
+    inserter = threading.Thread(target=insert, name="chroma-inserter", daemon=True)
+    inserter.start()
+    try:
+        for batch, embeddings in encoded_batches:
+            if errors:
+                break
+            pending.put((batch, embeddings))
+    finally:
+        pending.put(None)
+        inserter.join()
+    if errors:
+        raise errors[0]
+
+def sync_chunks(collection, chunks, batch_size=100, encode_batches=None, queue_size=4):
+    """Bring the collection in line with chunks, embedding only what changed.
+
+    Chunk IDs are content-addressed, so a chunk whose ID is already stored is
+    unchanged, and a stored ID that never shows up in chunks belongs to an
+    edited or removed listing and is deleted at the end. chunks may be any
+    iterable, including a generator; it is consumed once, batch by batch.
+
+    When encode_batches is given it maps an iterable of text lists to their
+    embeddings, batch by batch and in order; embeddings are then computed
+    ahead of time and handed to Chroma, with inserts overlapping the encoding
+    of later batches. Returns counts of added, deleted and unchanged chunks.
+    """
+    stored_ids = stored_chunk_ids(collection)
+    seen_ids = set()
+    counts = {"added": 0, "deleted": 0, "unchanged": 0}
+
+    def new_batches():
+        batch = []
+        for chunk in chunks:
+            chunk_id = chunk["chunk_id"]
+            # The scrape can list the same car on several pages; those chunks share an ID
+            if chunk_id in seen_ids:
+                continue
+            seen_ids.add(chunk_id)
+            if chunk_id in stored_ids:
+                counts["unchanged"] += 1
+                continue
+            batch.append(chunk)
+            counts["added"] += 1
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    if encode_batches is None:
+        for batch in new_batches():
+            _add_batch(collection, batch)
+    else:
+        # encode_batches yields in order, so each result belongs to the oldest batch handed out
+        in_flight = deque()
+
+        def texts():
+            for batch in new_batches():
+                in_flight.append(batch)
+                yield [chunk["text"] for chunk in batch]
+
+        encoded = ((in_flight.popleft(), embeddings) for embeddings in encode_batches(texts()))
+        _insert_in_background(collection, encoded, queue_size)
+
+    to_delete = sorted(stored_ids - seen_ids)
+    for start in range(0, len(to_delete), batch_size):
+        collection.delete(ids=to_delete[start:start + batch_size])
+    counts["deleted"] = len(to_delete)
+
+    logger.info(f"Synced chunks: {counts['added']} added, {counts['deleted']} deleted, "
+                f"{counts['unchanged']} unchanged")
+    return counts
@@ -0,0 +1,160 @@
+"""Compact, token-budgeted LLM context from retrieved car chunks.
+
+A chunk's text repeats the CAR, PRICE, City, Fuel Type, Manufacturing Year
+and URL fields that the listing header already shows, and a long listing is
+split into several chunks. build_context groups chunks by listing URL, keeps
+only what the header does not say and fits the result into a token budget:
+every listing's header first, then the remaining details, then seller
+remarks, each pass in retrieval order.
+"""
+import math
+import re
+
+CONTEXT_HEADER = "RELEVANT CAR LISTINGS:\n\n"
+NO_CONTEXT_TEXT = "No relevant car information found."
+
+# Default budget for the listings part of the prompt
+CONTEXT_TOKEN_BUDGET = 1200
+
+# Top-level labels of the chunk text (see chunking.car_field_lines)
+_SECTION_LABELS = {"CAR", "PRICE", "DETAILS", "SELLER REMARKS", "URL"}
+# Detail lines that repeat chunk metadata shown in the header
+HEADER_DETAIL_LABELS = {"City", "Fuel Type", "Manufacturing Year"}
+# The scraped remarks start with the page's own caption
+_REMARKS_CAPTION = "Remarks by seller"
+
+def estimate_tokens(text):
+    """Approximate token count: about four characters per token"""
+    return math.ceil(len(text) / 4)
+
+def clean_price(price_str):
+    """Convert price string like '₹ 32.8 Lakh' to a structured format"""
+    # Extract the numeric part and the denomination (Lakh/Crore)
+    if not price_str or not isinstance(price_str, str):
+        return price_str
+
+    match = re.search(r'₹\s*([\d.]+)\s*(Lakh|Crore)?', price_str)
+    if not match:
+        return price_str
+
+    amount = float(match.group(1))
+    denomination = match.group(2) if match.group(2) else ""
+
+    if denomination.lower() == "lakh":
+        return f"₹{amount} Lakh (₹{amount*100000:,.2f})"
+    elif denomination.lower() == "crore":
+        return f"₹{amount} Crore (₹{amount*10000000:,.2f})"
+    else:
+        return f"₹{amount:,.2f}"
+
+def split_chunk_text(content):
+    """Split a chunk's text into the detail lines and remarks the listing header does not repeat"""
+    details, remarks = [], []
+    for line in (content or "").splitlines():
+        text = line.strip()
+        if not text:
+            continue
+        label, separator, value = text.partition(":")
+        if separator and line.startswith(" "):
+            if label not in HEADER_DETAIL_LABELS:
+                details.append(text)
+        elif separator and label in _SECTION_LABELS:
+            if label == "SELLER REMARKS" and value.strip() not in ("", _REMARKS_CAPTION):
+                remarks.append(value.strip())
+        elif text != _REMARKS_CAPTION:
+            # Remarks continue on the following lines and into later chunks of the listing
+            remarks.append(text)
+    return details, remarks
+
+def group_by_listing(contexts):
+    """Merge the chunks of each listing, in order of the listing's best-ranked chunk.
+
+    Returns dicts with the first chunk's context and the listing's distinct
+    detail lines and remark fragments.
+    """
+    listings = {}
+    for position, ctx in enumerate(contexts):
+        url = ctx.get('url')
+        key = url if url and url != "Unknown" else ctx.get('chunk_id') or position
+        listing = listings.get(key)
+        if listing is None:
+            listing = listings[key] = {"context": ctx, "details": [], "remarks": []}
+        details, remarks = split_chunk_text(ctx.get('content'))
+        listing["details"].extend(d for d in details if d not in listing["details"])
+        listing["remarks"].extend(r for r in remarks if r not in listing["remarks"])
+    return list(listings.values())
+
+def relaxed_filters_note(ctx):
+    """Header line for a listing retrieved after relaxing some requested filters, or "" """
+    fields = ctx.get('relaxed_filters')
+    if not fields:
+        return ""
+    return f"Note: does not match the requested {', '.join(field.replace('_', ' ') for field in fields)}\n"
+
+def _header_lines(number, ctx):
+    return [
+        f"[CAR {number}] {ctx['car_name']}\n",
+        relaxed_filters_note(ctx),
+        f"Price: {clean_price(ctx.get('price', 'Price not available'))}\n",
+        f"Location: {ctx.get('city', 'Not specified')}\n",
+        f"Fuel Type: {ctx.get('fuel_type', 'Not specified')}\n",
+        f"Year: {ctx.get('manufacturing_year', 'Not specified')}\n",
+        f"Listing URL: {ctx.get('url', 'Not available')}\n",
+    ]
+
+def _truncate_words(text, max_tokens):
+    """Longest word prefix of text (plus an ellipsis) within max_tokens, or "" if none fits"""
+    words = text.split(" ")
+    while words and estimate_tokens(" ".join(words) + " ...") > max_tokens:
+        words.pop()
+    return " ".join(words) + " ..." if words else ""
+
+def build_context(contexts, token_budget=CONTEXT_TOKEN_BUDGET):
+    """Deduplicated listings context of at most token_budget tokens (None for no limit).
+
+    Listings whose header does not fit are left out (except the best-ranked
+    one); details and remarks are added while they fit, the last remark cut
+    between words.
+    """
+    if not contexts:
+        return NO_CONTEXT_TEXT
+
+    listings = group_by_listing(contexts)
+    remaining = math.inf if token_budget is None else token_budget - estimate_tokens(CONTEXT_HEADER)
+
+    # Pass 1: headers, stopping at the first listing that does not fit (the top one always goes in)
+    blocks = []
+    for listing in listings:
+        lines = _header_lines(len(blocks) + 1, listing["context"])
+        cost = sum(estimate_tokens(line) for line in lines) + 1
+        if cost > remaining and blocks:
+            break
+        remaining -= cost
+        blocks.append({"header": lines, "details": [], "remarks": []})
+
+    # Pass 2: details; pass 3: seller remarks
+    for field, label in (("details", "Details: "), ("remarks", "Seller Remarks: ")):
+        for block, listing in zip(blocks, listings):
+            for item in listing[field]:
+                label_cost = 0 if block[field] else estimate_tokens(label)
+                cost = label_cost + estimate_tokens(item + "; ")
+                if cost <= remaining:
+                    block[field].append(item)
+                    remaining -= cost
+                    continue
+                if field == "remarks":
+                    partial = _truncate_words(item, remaining - label_cost - 1)
+                    if partial:
+                        block[field].append(partial)
+                        remaining -= label_cost + estimate_tokens(partial + "; ")
+                break
+
+    formatted_context = CONTEXT_HEADER
+    for block in blocks:
+        formatted_context += "".join(block["header"])
+        if block["details"]:
+            formatted_context += "Details: " + "; ".join(block["details"]) + "\n"
+        if block["remarks"]:
+            formatted_context += "Seller Remarks: " + " ".join(block["remarks"]) + "\n"
+        formatted_context += "\n"
+    return formatted_context
@@ -1,131 +1,259 @@
-import json
+import argparse
 import os
 import logging
-import chromadb
-from chromadb.utils import embedding_functions
-from tqdm import tqdm
+import multiprocessing
+import time
+from collections import deque
+import numpy as np
+from collection_sync import clean_metadata, sync_chunks
+from jsonl_io import iter_json_records
+from lexical_index import LEXICAL_INDEX_FILENAME, BM25Builder
+from lazy_import import lazy_import
+from query_planner import FIELD_STATS_FILENAME, FieldStatsBuilder
+
+chromadb = lazy_import("chromadb")
 
-# Set up logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-# Set up paths - modify these to match your environment
-chunked_data_path = "cartrade_cars_chunked.json"  # Path to your chunked car data
-chroma_db_path = "car_chroma_db"  # Where you want to store the ChromaDB
-
-# Create directory for Chroma DB if it doesn't exist
-os.makedirs(chroma_db_path, exist_ok=True)
-
-# Initialize ChromaDB with sentence transformers
-logger.info("Initializing ChromaDB with sentence-transformers...")
-sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-    model_name="all-MiniLM-L6-v2"  # This is a good general-purpose embedding model
-)
-
-# Create Chroma client and collection
-client = chromadb.PersistentClient(path=chroma_db_path)
-collection = client.get_or_create_collection(
-    name="car_data_chunks",
-    embedding_function=sentence_transformer_ef,
-    metadata={"description": "Used car data chunks for RAG system"}
-)
-
-# Load chunked data
-logger.info(f"Loading chunked data from {chunked_data_path}...")
-with open(chunked_data_path, 'r', encoding='utf-8') as f:
-    chunks = json.load(f)
-
-logger.info(f"Found {len(chunks)} chunks")
-
-# Function to clean metadata (replace None values)
-def clean_metadata(metadata):
-    """Replace None values with appropriate defaults for ChromaDB compatibility."""
-    return {
-        key: (str(value) if value is not None else "Unknown")  # Convert None to string
-        for key, value in metadata.items()
-    }
-
-# Process chunks in batches for ChromaDB
-batch_size = 100
-total_batches = (len(chunks) + batch_size - 1) // batch_size  # Ceiling division
-
-logger.info(f"Processing chunks in {total_batches} batches...")
-
-for batch_index in tqdm(range(total_batches), desc="Uploading to ChromaDB"):
-    start_idx = batch_index * batch_size
-    end_idx = min((batch_index + 1) * batch_size, len(chunks))
-    batch_chunks = chunks[start_idx:end_idx]
-
-    ids = []
-    documents = []
-    metadatas = []
-
-    for chunk in batch_chunks:
-        chunk_id = chunk["chunk_id"]
-        ids.append(chunk_id)
-        documents.append(chunk["text"])
-
-        # Clean metadata before inserting
-        raw_metadata = chunk.get("metadata", {})  # Use .get() to avoid KeyError
-        metadata = clean_metadata(raw_metadata)
-        metadata["chunk_index"] = chunk["chunk_index"]  # Ensure chunk_index is included
-
-        metadatas.append(metadata)
-
-    # Add batch to collection (handle potential duplicates)
+# Default paths - modify these to match your environment
+CHUNKED_DATA_PATH = "cartrade_cars_chunked.jsonl"  # Path to your chunked car data (JSONL or JSON)
+CHROMA_DB_PATH = "car_chroma_db"  # Where you want to store the ChromaDB
+COLLECTION_NAME = "car_data_chunks"
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # This is a good general-purpose embedding model
+SAMPLE_QUERY = "White Toyota Fortuner diesel car in Delhi"
+
+def load_embedding_function(model_name=EMBEDDING_MODEL):
+    from chromadb.utils import embedding_functions
+    return embedding_functions.SentenceTransformerEmbeddingFunction(model_name=model_name)
+
+class LazyEmbeddingFunction:
+    """Embedding function that loads its model on first use.
+
+    With encoder workers the main process gets precomputed embeddings and
+    only needs the model for query texts, such as the sample query.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL):
+        self.model_name = model_name
+        self._embedding_function = None
+
+    def __call__(self, input):
+        if self._embedding_function is None:
+            self._embedding_function = load_embedding_function(self.model_name)
+        return self._embedding_function(input)
+
+# Set once per encoder worker process by _init_encoder_worker
+_worker_embedding_function = None
+
+def _init_encoder_worker(model_name):
+    global _worker_embedding_function
+    _worker_embedding_function = load_embedding_function(model_name)
+
+def _encode_in_worker(texts):
+    return np.asarray(_worker_embedding_function(texts), dtype=np.float32)
+
+class ChunkEncoder:
+    """Encodes batches of chunk texts in-process or on a pool of worker processes.
+
+    Each worker loads the sentence-transformer model once and encodes whole
+    batches, and results come back in submission order so they can be paired
+    with their chunks. The main process keeps inserting into Chroma while the
+    workers encode the following batches.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL, workers=1, embedding_function=None):
+        self.workers = workers
+        self._pool = None
+        self._embedding_function = None
+        if workers > 1:
+            # spawn: the model libraries do not survive a fork cleanly
+            self._pool = multiprocessing.get_context("spawn").Pool(
+                workers, initializer=_init_encoder_worker, initargs=(model_name,)
+            )
+        else:
+            self._embedding_function = embedding_function or load_embedding_function(model_name)
+
+    def encode_batches(self, batches):
+        """Embeddings for each list of texts, in order"""
+        if self._pool is None:
+            for texts in batches:
+                yield np.asarray(self._embedding_function(texts), dtype=np.float32)
+            return
+        # Keep a couple of batches queued per worker, but never read the whole stream ahead
+        pending = deque()
+        for texts in batches:
+            pending.append(self._pool.apply_async(_encode_in_worker, (texts,)))
+            if len(pending) >= 2 * self.workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+
+def open_collection(chroma_db_path=CHROMA_DB_PATH, embedding_function=None):
+    """Create or open the car chunk collection"""
+    os.makedirs(chroma_db_path, exist_ok=True)
+    client = chromadb.PersistentClient(path=chroma_db_path)
+    return client.get_or_create_collection(
+        name=COLLECTION_NAME,
+        embedding_function=embedding_function,
+        metadata={"description": "Used car data chunks for RAG system"}
+    )
+
+def iter_chunks_from(chunks_path=None, listings_path=None, chunk_size=1500, chunk_overlap=150):
+    """Stream chunks from a chunk file, or chunk a listings file on the fly"""
+    if listings_path:
+        # Imported here so ingesting a ready chunk file doesn't pull in the text splitter
+        from chunking import stream_car_chunks
+        return stream_car_chunks(listings_path, chunk_size, chunk_overlap)
+    return iter_json_records(chunks_path or CHUNKED_DATA_PATH)
+
+def tee_into_lexical_index(chunks, builder):
+    """Pass chunks through unchanged while adding each distinct one to a BM25Builder"""
+    seen_ids = set()
+    for chunk in chunks:
+        if chunk["chunk_id"] not in seen_ids:
+            seen_ids.add(chunk["chunk_id"])
+            builder.add(chunk["chunk_id"], chunk["text"])
+        yield chunk
+
+def tee_into_field_stats(chunks, builder):
+    """Pass chunks through unchanged while counting their stored metadata values in a FieldStatsBuilder"""
+    for chunk in chunks:
+        builder.add(chunk["chunk_id"], clean_metadata(chunk.get("metadata", {})))
+        yield chunk
+
+def save_field_stats(builder, chroma_db_path=CHROMA_DB_PATH):
+    """Store the metadata value counts the query planner estimates filter selectivity from"""
+    field_stats = builder.finish()
+    field_stats_path = os.path.join(chroma_db_path, FIELD_STATS_FILENAME)
+    field_stats.save(field_stats_path)
+    logger.info(f"Saved value counts of {len(field_stats.fields)} fields over {field_stats.total} chunks "
+                f"to {field_stats_path}")
+    return field_stats
+
+def save_lexical_index(builder, chroma_db_path=CHROMA_DB_PATH):
+    """Store the BM25 index used by hybrid retrieval next to the collection"""
+    lexical_index = builder.finish()
+    lexical_index_path = os.path.join(chroma_db_path, LEXICAL_INDEX_FILENAME)
+    lexical_index.save(lexical_index_path)
+    logger.info(f"Saved BM25 index over {len(lexical_index)} chunks to {lexical_index_path}")
+    return lexical_index
+
+def peak_memory_mb():
+    """Peak resident memory of this process and of its finished worker processes, in MiB.
+
+    resource is POSIX-only; elsewhere the main process's peak comes from
+    psutil when it is installed. Values that cannot be measured are None.
+    """
     try:
-        collection.add(
-            ids=ids,
-            documents=documents,
-            metadatas=metadatas
-        )
-    except Exception as e:
-        logger.warning(f"Error in batch {batch_index}: {str(e)}")
-
-        # Try adding one by one to skip duplicates
-        for i in range(len(ids)):
-            try:
-                collection.add(
-                    ids=[ids[i]],
-                    documents=[documents[i]],
-                    metadatas=[metadatas[i]]
-                )
-            except Exception as sub_e:
-                if "already exists" in str(sub_e):
-                    logger.info(f"Skipping duplicate ID: {ids[i]}")
-                else:
-                    logger.error(f"Error adding document {ids[i]}: {str(sub_e)}")
-
-logger.info(f"Completed loading {collection.count()} chunks into ChromaDB")
-
-# Test a query
-logger.info("\nTesting a sample query...")
-query_text = "White Toyota Fortuner diesel car in Delhi"
-results = collection.query(
-    query_texts=[query_text],
-    n_results=3
-)
-
-if results and results.get("documents") and results["documents"][0]:
-    logger.info("Sample results:")
-    for i in range(len(results["documents"][0])):
-        logger.info(f"\nResult {i+1}:")
-        logger.info(f"Car: {results['metadatas'][0][i]['car_name']}")
-        logger.info(f"Price: {results['metadatas'][0][i]['price']}")
-        logger.info(f"City: {results['metadatas'][0][i]['city']}")
-        logger.info(f"Fuel: {results['metadatas'][0][i]['fuel_type']}")
-        logger.info(f"Year: {results['metadatas'][0][i]['manufacturing_year']}")
-        logger.info(f"Content snippet: {results['documents'][0][i][:150]}...")
-else:
-    logger.warning("No results found for sample query")
-
-logger.info("\nChromaDB setup complete! You can now query the database.")
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None, None
+        peak = getattr(psutil.Process().memory_info(), "peak_wset", None)
+        return (None if peak is None else peak / 2 ** 20), None
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return own, workers
+
+def _format_mb(value):
+    return "unknown" if value is None else f"{value:.0f} MiB"
+
+def ingest(chunks, collection, encoder, batch_size=256):
+    """Sync chunks into the collection with precomputed embeddings; returns the sync counts and timing"""
+    start = time.perf_counter()
+    stats = sync_chunks(collection, chunks, batch_size=batch_size, encode_batches=encoder.encode_batches)
+    stats["seconds"] = time.perf_counter() - start
+    stats["docs_per_second"] = stats["added"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
 
 # Function to query the database
-def query_car_database(query_text, n_results=5):
+def query_car_database(collection, query_text, n_results=5):
     """Query the car database with a natural language query"""
     results = collection.query(
         query_texts=[query_text],
         n_results=n_results
     )
     return results
+
+def log_sample_query(collection, query_text=SAMPLE_QUERY):
+    logger.info(f"Testing a sample query: {query_text}")
+    results = query_car_database(collection, query_text, n_results=3)
+    if results and results.get("documents") and results["documents"][0]:
+        logger.info("Sample results:")
+        for i in range(len(results["documents"][0])):
+            logger.info(f"\nResult {i+1}:")
+            logger.info(f"Car: {results['metadatas'][0][i]['car_name']}")
+            logger.info(f"Price: {results['metadatas'][0][i]['price']}")
+            logger.info(f"City: {results['metadatas'][0][i]['city']}")
+            logger.info(f"Fuel: {results['metadatas'][0][i]['fuel_type']}")
+            logger.info(f"Year: {results['metadatas'][0][i]['manufacturing_year']}")
+            logger.info(f"Content snippet: {results['documents'][0][i][:150]}...")
+    else:
+        logger.warning("No results found for sample query")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Embed chunked car data into ChromaDB")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--chunks", default=CHUNKED_DATA_PATH, help="chunked car data file (JSONL or JSON)")
+    source.add_argument("--listings", help="scraped listings file to chunk on the fly instead")
+    parser.add_argument("--chunk-size", type=int, default=1500, help="chunk size when using --listings")
+    parser.add_argument("--chunk-overlap", type=int, default=150, help="chunk overlap when using --listings")
+    parser.add_argument("--db-path", default=CHROMA_DB_PATH, help="ChromaDB directory")
+    parser.add_argument("--model", default=EMBEDDING_MODEL, help="sentence-transformers model name")
+    parser.add_argument("--batch-size", type=int, default=256,
+                        help="chunks encoded and inserted per batch")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="encoder processes (1 encodes in this process)")
+    parser.add_argument("--sample-query", nargs="?", const=SAMPLE_QUERY, default=None,
+                        help="run a sample query after ingesting")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    logger.info("Initializing ChromaDB with sentence-transformers...")
+    if args.workers > 1:
+        # The workers each load the model; this process only needs it if it embeds a query
+        embedding_function = LazyEmbeddingFunction(args.model)
+    else:
+        embedding_function = load_embedding_function(args.model)
+    collection = open_collection(args.db_path, embedding_function)
+
+    logger.info(f"Streaming chunks from {args.listings or args.chunks}...")
+    lexical_builder = BM25Builder()
+    stats_builder = FieldStatsBuilder()
+    chunks = tee_into_field_stats(tee_into_lexical_index(
+        iter_chunks_from(args.chunks, args.listings, args.chunk_size, args.chunk_overlap), lexical_builder
+    ), stats_builder)
+
+    encoder = ChunkEncoder(args.model, workers=args.workers, embedding_function=embedding_function)
+    try:
+        stats = ingest(chunks, collection, encoder, batch_size=args.batch_size)
+    finally:
+        encoder.close()
+
+    own_mb, workers_mb = peak_memory_mb()
+    logger.info(
+        f"Added {stats['added']}, deleted {stats['deleted']}, kept {stats['unchanged']} unchanged chunks "
+        f"in {stats['seconds']:.1f}s ({stats['docs_per_second']:.1f} docs/sec)"
+    )
+    logger.info(f"Peak memory: {_format_mb(own_mb)} (main process), "
+                f"{_format_mb(workers_mb)} (largest encoder worker)")
+    logger.info(f"Collection now holds {collection.count()} chunks")
+
+    save_lexical_index(lexical_builder, args.db_path)
+    save_field_stats(stats_builder, args.db_path)
+
+    if args.sample_query:
+        log_sample_query(collection, args.sample_query)
+
+    logger.info("ChromaDB setup complete! You can now query the database.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import json
+import sqlite3
+import time
+
+class EvalStore:
+    """SQLite record of the chatbot's answers to evaluation questions.
+
+    Each question is stored with the IDs of the chunks retrieved for it, the
+    prompt sent to the LLM and the response, so metrics can be recomputed
+    later without any retrieval or LLM calls. Records are kept per version,
+    a string naming what else the answer depends on (prompt template, context
+    layout, collection contents; see RAGEngine.answer_version), and a store
+    only sees the records of its own version. With version=None it uses the
+    most recently recorded one.
+    """
+
+    def __init__(self, path="evaluation_responses.sqlite3", version=None):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(responses)")]
+        if columns and "version" not in columns:
+            # Records from before versioning cannot be matched to a prompt or collection; keep them aside
+            self._conn.execute("ALTER TABLE responses RENAME TO responses_unversioned")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "question TEXT NOT NULL, version TEXT NOT NULL, chunk_ids TEXT NOT NULL, prompt TEXT, "
+            "response TEXT NOT NULL, recorded_at REAL NOT NULL, PRIMARY KEY (question, version))"
+        )
+        self._conn.commit()
+        self.version = self.latest_version() if version is None else version
+
+    def latest_version(self):
+        """The version of the most recent record, or "" for an empty store"""
+        row = self._conn.execute("SELECT version FROM responses ORDER BY recorded_at DESC LIMIT 1").fetchone()
+        return row[0] if row else ""
+
+    def get(self, question):
+        """The stored record for a question as a dict, or None"""
+        row = self._conn.execute(
+            "SELECT question, chunk_ids, prompt, response, recorded_at FROM responses "
+            "WHERE question = ? AND version = ?",
+            (question, self.version)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"question": row[0], "chunk_ids": json.loads(row[1]), "prompt": row[2], "response": row[3],
+                "recorded_at": row[4]}
+
+    def __contains__(self, question):
+        return self._conn.execute("SELECT 1 FROM responses WHERE question = ? AND version = ?",
+                                  (question, self.version)).fetchone() is not None
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM responses WHERE version = ?", (self.version,)).fetchone()[0]
+
+    def put(self, question, chunk_ids, prompt, response):
+        """Record (or re-record) the answer to a question"""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (question, version, chunk_ids, prompt, response, recorded_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (question, self.version, json.dumps(list(chunk_ids or [])), prompt, response, time.time())
+        )
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
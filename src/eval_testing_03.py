@@ -1,21 +1,33 @@
 import json
 import re
-from bert_score import score as bert_score
-from rouge_score import rouge_scorer
-from sklearn.metrics import f1_score
-from nltk.translate.meteor_score import meteor_score
-from llm_rag import car_rag_pipeline  # Import the chatbot logic from llm_rag.py
+import time
+from lazy_import import lazy_import
+from llm_rag import NO_CONTEXT_ANSWER, car_rag_pipeline, get_engine  # Import the chatbot logic from llm_rag.py
+from eval_store import EvalStore
 
-import nltk
-nltk.download('wordnet')
-nltk.download('omw-1.4')
+# The metric libraries take seconds to import (rouge_score pulls in nltk), so they load on first use
+bert_score = lazy_import("bert_score")
+rouge_scorer = lazy_import("rouge_score.rouge_scorer")
 
+# JSON file containing car chunks
+CAR_CHUNKS_PATH = 'Car Chatbot\data\cartrade_cars_chunked.json'
 
-# Load the JSON file containing car chunks
-with open('Car Chatbot\data\cartrade_cars_chunked.json', 'r', encoding='utf-8') as file:
-    data = json.load(file)
+def download_nltk_data():
+    """Fetch the WordNet data METEOR needs"""
+    import nltk
+    nltk.download('wordnet')
+    nltk.download('omw-1.4')
 
-car_chunks = [chunk for chunk in data if chunk.get('metadata')]  # Extract valid car chunks
+def meteor_score(references, hypothesis):
+    """nltk's METEOR score, imported on first use"""
+    from nltk.translate.meteor_score import meteor_score as nltk_meteor_score
+    return nltk_meteor_score(references, hypothesis)
+
+def load_car_chunks(path=CAR_CHUNKS_PATH):
+    """Load the chunk file and keep the chunks that describe a car"""
+    with open(path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    return [chunk for chunk in data if chunk.get('metadata')]  # Extract valid car chunks
 
 # Generate questions and answers for each chunk with more detailed ground truth
 def generate_questions(chunk):
@@ -53,46 +65,90 @@ def extract_relevant_info(question, response):
     # For now, return the full response
     return response
 
-# Evaluate metrics (BERTScore, METEOR, ROUGE, F1)
-def evaluate_metrics(ground_truth, generated):
-    # BERTScore
-    P, R, F1 = bert_score([generated], [ground_truth], lang="en")
-    bert_f1 = F1.item()  # Extract the F1 score from tensor
-    
-    # METEOR Score
-    meteor = meteor_score([ground_truth.split()], generated.split())
-    
-    # ROUGE Score
-    scorer = rouge_scorer.RougeScorer(['rouge1', 'rougeL'], use_stemmer=True)
-    rouge_scores = scorer.score(ground_truth, generated)
-    
-    # F1 Score (token-based)
-    ground_truth_tokens = ground_truth.split()
-    generated_tokens = generated.split()
-    
+def token_f1(ground_truth_tokens, generated_tokens):
+    """F1 over the sets of whitespace tokens shared by both texts"""
     common_tokens = set(ground_truth_tokens) & set(generated_tokens)
-    precision = len(common_tokens) / len(generated_tokens) if generated_tokens else 0
-    recall = len(common_tokens) / len(ground_truth_tokens) if ground_truth_tokens else 0
+    precision = len(common_tokens) / len(generated_tokens) if generated_tokens else 0.0
+    recall = len(common_tokens) / len(ground_truth_tokens) if ground_truth_tokens else 0.0
     
-    f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
-    
-    return bert_f1, meteor, rouge_scores['rouge1'].fmeasure, f1
+    return 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0.0
+
+class MetricEvaluator:
+    """Scores (ground_truth, response) pairs with BERTScore, METEOR, ROUGE and token F1.
+
+    The BERT model and the ROUGE scorer are loaded once and reused for every
+    batch. BERTScore runs over the whole batch at once on the model's own
+    batch size; METEOR, ROUGE and F1 share one tokenization per pair. Time
+    spent in each metric accumulates in `timings`.
+    """
+
+    def __init__(self, lang="en", bert_batch_size=64, bert_scorer=None):
+        self.bert_scorer = bert_scorer or bert_score.BERTScorer(lang=lang, batch_size=bert_batch_size)
+        self.rouge = rouge_scorer.RougeScorer(['rouge1', 'rougeL'], use_stemmer=True)
+        self.timings = {"bert_score": 0.0, "meteor_score": 0.0, "rouge_score": 0.0, "f1_score": 0.0}
+        self.pairs_scored = 0
+
+    def score_batch(self, ground_truths, generated):
+        """Metric dicts for each pair, in order"""
+        start = time.perf_counter()
+        _, _, bert_f1 = self.bert_scorer.score(list(generated), list(ground_truths))
+        bert_scores = bert_f1.tolist()
+        self.timings["bert_score"] += time.perf_counter() - start
+
+        tokens = [(truth.split(), text.split()) for truth, text in zip(ground_truths, generated)]
+
+        start = time.perf_counter()
+        meteor_scores = [meteor_score([truth_tokens], text_tokens) for truth_tokens, text_tokens in tokens]
+        self.timings["meteor_score"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        rouge_scores = [self.rouge.score(truth, text)['rouge1'].fmeasure for truth, text in zip(ground_truths, generated)]
+        self.timings["rouge_score"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        f1_scores = [token_f1(truth_tokens, text_tokens) for truth_tokens, text_tokens in tokens]
+        self.timings["f1_score"] += time.perf_counter() - start
+
+        self.pairs_scored += len(bert_scores)
+        return [
+            {"bert_score": bert, "meteor_score": meteor, "rouge_score": rouge, "f1_score": f1}
+            for bert, meteor, rouge, f1 in zip(bert_scores, meteor_scores, rouge_scores, f1_scores)
+        ]
+
+    def timing_summary(self):
+        """Seconds per metric, total and per pair"""
+        pairs = self.pairs_scored or 1
+        return {name: {"seconds": seconds, "ms_per_pair": 1000 * seconds / pairs}
+                for name, seconds in self.timings.items()}
+
+_evaluator = None
+
+def get_evaluator():
+    """Shared MetricEvaluator, created on first use"""
+    global _evaluator
+    if _evaluator is None:
+        _evaluator = MetricEvaluator()
+    return _evaluator
+
+# Evaluate metrics (BERTScore, METEOR, ROUGE, F1)
+def evaluate_metrics(ground_truth, generated, evaluator=None):
+    scores = (evaluator or get_evaluator()).score_batch([ground_truth], [generated])[0]
+    return scores["bert_score"], scores["meteor_score"], scores["rouge_score"], scores["f1_score"]
 
-# Process chunks and evaluate chatbot responses
-results = []
-question_counter = 0
 max_questions = 1000  # Set the maximum number of questions to 1000
 
 # Batch saving parameters
 batch_size = 50  # Save every 50 questions processed
-batch_number = 0
 
-# Calculate metrics summaries
-total_bert = 0
-total_meteor = 0
-total_rouge = 0
-total_f1 = 0
-count = 0
+# Metrics are computed for this many responses at a time (a multiple of batch_size)
+metric_batch_size = 250
+
+# Where chatbot responses come from:
+#   "live"    - ask the chatbot every question and record the answers
+#   "replay"  - only use the answers of the latest recorded run; no retrieval or LLM calls
+#   "partial" - use answers recorded with the current prompt and collection, and ask the chatbot the rest
+evaluation_mode = "live"
+response_store_path = 'evaluation_responses.sqlite3'
 
 def save_results_batch(results_batch, batch_num):
     """Save results to a file incrementally."""
@@ -101,81 +157,147 @@ def save_results_batch(results_batch, batch_num):
         json.dump(results_batch, file, indent=4)
     print(f"Saved batch {batch_num} results to {filename}")
 
-for i, chunk in enumerate(car_chunks):
-    questions, answers = generate_questions(chunk)
-    
-    for j, (question, ground_truth) in enumerate(zip(questions, answers)):
+def score_results(evaluator, results, processed_responses, start):
+    """Add metrics to results[start:] in one batch; returns the number of scored results"""
+    pending = results[start:]
+    if pending:
+        scores = evaluator.score_batch([result["ground_truth"] for result in pending], processed_responses[start:])
+        for result, metrics in zip(pending, scores):
+            result.update(metrics)
+        print(f"Computed metrics for {len(pending)} responses")
+    return len(results)
+
+def save_scored_batches(results, saved, scored, batch_number, final=False):
+    """Write scored results to batch files of batch_size; returns (saved, batch_number)"""
+    while scored - saved >= batch_size or (final and saved < scored):
+        batch = results[saved:saved + batch_size]
+        batch_number += 1
+        save_results_batch(batch, batch_number)
+        saved += len(batch)
+    return saved, batch_number
+
+def get_chatbot_response(question, response_store, engine, mode):
+    """Answer from the response store or the chatbot (recording it), or None if unavailable in replay mode"""
+    if mode != "live":
+        record = response_store.get(question)
+        if record is not None:
+            return record["response"]
+        if mode == "replay":
+            return None
+
+    # Get response from chatbot logic imported from llm_rag.py
+    trace = {}
+    response = car_rag_pipeline(question, engine=engine, trace=trace)
+    # Errors and empty retrievals are not recorded so a partial run asks again
+    if not response.startswith("Error") and response != NO_CONTEXT_ANSWER:
+        response_store.put(question, trace.get("chunk_ids", []), trace.get("prompt"), response)
+    return response
+
+def main():
+    """Ask (or replay) the generated questions and score the chatbot's answers"""
+    download_nltk_data()
+    car_chunks = load_car_chunks()
+
+    # Process chunks and evaluate chatbot responses
+    results = []
+    processed_responses = []
+    question_counter = 0
+    batch_number = 0
+    scored = 0  # Results that already have metrics
+    saved = 0  # Results already written to batch files
+
+    # Load the embedding model, collection and Gemini client once for all questions (not needed to replay)
+    rag_engine = None
+    answer_version = None
+    if evaluation_mode != "replay":
+        rag_engine = get_engine()
         try:
-            # Get response from chatbot logic imported from llm_rag.py
-            chatbot_response_text = car_rag_pipeline(question)
-            
-            # Process response for evaluation
-            processed_response = extract_relevant_info(question, chatbot_response_text)
-            
-            # Evaluate metrics
-            bert, meteor, rouge, f1 = evaluate_metrics(ground_truth, processed_response)
+            answer_version = rag_engine.warm_up().answer_version()
+        except Exception as e:
+            print(f"Error initializing RAG engine: {str(e)}")
+            answer_version = ""
+
+    # Recorded answers from earlier runs: those of the current prompt and collection, or the latest ones to replay
+    response_store = EvalStore(response_store_path, version=answer_version)
+    print(f"Evaluating in {evaluation_mode} mode with {len(response_store)} recorded responses "
+          f"(version {response_store.version or 'none'})")
+
+    # Load the BERT model and ROUGE scorer once for all questions
+    evaluator = get_evaluator()
+
+    for i, chunk in enumerate(car_chunks):
+        questions, answers = generate_questions(chunk)
+    
+        for j, (question, ground_truth) in enumerate(zip(questions, answers)):
+            try:
+                chatbot_response_text = get_chatbot_response(question, response_store, rag_engine, evaluation_mode)
+                if chatbot_response_text is None:
+                    print(f"No recorded response for question {j+1} of chunk {i+1}, skipping")
+                    continue
             
-            # Add to totals for averaging
-            total_bert += bert
-            total_meteor += meteor
-            total_rouge += rouge
-            total_f1 += f1
-            count += 1
+                # Process response for evaluation
+                processed_response = extract_relevant_info(question, chatbot_response_text)
             
-            results.append({
-                "question": question,
-                "ground_truth": ground_truth,
-                "chatbot_response": chatbot_response_text,
-                "bert_score": bert,
-                "meteor_score": meteor,
-                "rouge_score": rouge,
-                "f1_score": f1
-            })
+                # Metrics are filled in when the next metric batch is scored
+                results.append({
+                    "question": question,
+                    "ground_truth": ground_truth,
+                    "chatbot_response": chatbot_response_text
+                })
+                processed_responses.append(processed_response)
             
-            question_counter += 1
+                question_counter += 1
             
-            # Save results periodically in batches
-            if question_counter % batch_size == 0:
-                batch_number += 1
-                save_results_batch(results[-batch_size:], batch_number)
-
-            # Check if we've reached the maximum number of questions
-            if question_counter >= max_questions:
-                break
+                # Score a full metric batch and save the results in batches
+                if question_counter % metric_batch_size == 0:
+                    scored = score_results(evaluator, results, processed_responses, scored)
+                    saved, batch_number = save_scored_batches(results, saved, scored, batch_number)
+
+                # Check if we've reached the maximum number of questions
+                if question_counter >= max_questions:
+                    break
                 
-        except Exception as e:
-            print(f"Error processing question {j+1} for chunk {i+1}: {str(e)}")
+            except Exception as e:
+                print(f"Error processing question {j+1} for chunk {i+1}: {str(e)}")
     
-    # Break the outer loop if we've reached the maximum number of questions
-    if question_counter >= max_questions:
-        print(f"Reached the maximum of {max_questions} questions. Stopping.")
-        break
+        # Break the outer loop if we've reached the maximum number of questions
+        if question_counter >= max_questions:
+            print(f"Reached the maximum of {max_questions} questions. Stopping.")
+            break
     
-    # Print progress periodically for better visibility during execution.
-    print(f"Processed {i+1} chunks, generated {question_counter} questions")
-
-# Final batch save for any remaining results not saved yet.
-if len(results) % batch_size != 0:
-    batch_number += 1
-    save_results_batch(results[-(len(results) % batch_size):], batch_number)
-
-# Calculate averages and save summary to a final file.
-avg_bert = total_bert / count if count > 0 else 0
-avg_meteor = total_meteor / count if count > 0 else 0
-avg_rouge = total_rouge / count if count > 0 else 0
-avg_f1 = total_f1 / count if count > 0 else 0
-
-summary = {
-    "total_questions_evaluated": count,
-    "average_bert_score": avg_bert,
-    "average_meteor_score": avg_meteor,
-    "average_rouge_score": avg_rouge,
-    "average_f1_score": avg_f1
-}
-
-output_filename_final_summary = 'evaluation_results_summary.json'
-with open(output_filename_final_summary, 'w') as file:
-    json.dump(summary, file, indent=4)
-
-print("\nEvaluation completed! Results saved incrementally.")
-print(f"Final metrics - BERTScore: {avg_bert:.4f}, METEOR: {avg_meteor:.4f}, ROUGE: {avg_rouge:.4f}, F1: {avg_f1:.4f}")
\ No newline at end of file
+        # Print progress periodically for better visibility during execution.
+        print(f"Processed {i+1} chunks, generated {question_counter} questions")
+
+    # Score and save any remaining results not saved yet.
+    scored = score_results(evaluator, results, processed_responses, scored)
+    saved, batch_number = save_scored_batches(results, saved, scored, batch_number, final=True)
+
+    # Calculate averages and save summary to a final file.
+    count = len(results)
+    avg_bert = sum(result["bert_score"] for result in results) / count if count > 0 else 0
+    avg_meteor = sum(result["meteor_score"] for result in results) / count if count > 0 else 0
+    avg_rouge = sum(result["rouge_score"] for result in results) / count if count > 0 else 0
+    avg_f1 = sum(result["f1_score"] for result in results) / count if count > 0 else 0
+
+    summary = {
+        "total_questions_evaluated": count,
+        "average_bert_score": avg_bert,
+        "average_meteor_score": avg_meteor,
+        "average_rouge_score": avg_rouge,
+        "average_f1_score": avg_f1,
+        "metric_timings": evaluator.timing_summary()
+    }
+
+    output_filename_final_summary = 'evaluation_results_summary.json'
+    with open(output_filename_final_summary, 'w') as file:
+        json.dump(summary, file, indent=4)
+
+    print("\nEvaluation completed! Results saved incrementally.")
+    response_store.close()
+    if rag_engine is not None:
+        print(f"RAG engine timings: {rag_engine.stats()}")
+    print(f"Metric timings: {evaluator.timing_summary()}")
+    print(f"Final metrics - BERTScore: {avg_bert:.4f}, METEOR: {avg_meteor:.4f}, ROUGE: {avg_rouge:.4f}, F1: {avg_f1:.4f}")
+
+if __name__ == "__main__":
+    main()
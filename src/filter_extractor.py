@@ -0,0 +1,195 @@
+import json
+import re
+from car_fields import split_car_name
+
+# Used when no scraped listings are available to harvest a vocabulary from
+SEED_VOCABULARY = {
+    "brand": ["Toyota", "Honda", "Maruti Suzuki", "Hyundai", "Mahindra", "Tata", "Kia", "Mercedes-Benz",
+              "BMW", "Audi", "Volkswagen", "Ford", "Renault", "Nissan", "MG"],
+    "fuel_type": ["Petrol", "Diesel", "CNG", "Electric", "Hybrid"],
+    "city": ["Delhi", "Mumbai", "Bangalore", "Hyderabad", "Chennai", "Kolkata", "Pune"],
+}
+
+# Everyday spellings of brand names as they appear in listing titles
+BRAND_ALIASES = {
+    "maruti": "Maruti Suzuki",
+    "suzuki": "Maruti Suzuki",
+    "mercedes": "Mercedes-Benz",
+    "benz": "Mercedes-Benz",
+    "merc": "Mercedes-Benz",
+    "rolls royce": "Rolls-Royce",
+    "vw": "Volkswagen",
+}
+
+FUEL_KEYWORDS = ["petrol", "diesel", "cng", "electric", "hybrid"]
+
+# Model names that are also ordinary words; they only count when the brand is mentioned too
+AMBIGUOUS_MODELS = {"city", "range", "compass", "discovery", "defender", "go", "one", "cross", "grand",
+                    "wagon", "select", "glory", "s", "new", "plus", "sport", "x"}
+
+# Filter order in the generated where clause
+FILTER_FIELDS = ["brand", "model", "variant", "fuel_type", "city", "manufacturing_year", "colour"]
+
+def _trie_pattern(terms):
+    """Regex alternation for terms, factored as a prefix trie.
+
+    A flat "a|b|c|..." over hundreds of terms makes the regex engine try every
+    alternative at every position; sharing prefixes keeps each step to one
+    character class or a handful of branches. Longer terms are tried first.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def render(node):
+        ends_here = "" in node
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if ends_here else body
+
+    return render(trie)
+
+# Fields matched on the raw query, independently of the car name terms; a
+# variant such as "HTX 1.5 Diesel" must not swallow the fuel the user asked for
+ATTRIBUTE_FIELDS = {"fuel_type", "city", "colour"}
+
+class FilterExtractor:
+    """Query filter extractor built from the listing vocabulary.
+
+    Brand, model and variant terms are compiled into one prefix-trie regex
+    (longest terms first) together with a year pattern; fuel, city and
+    colour terms into a second one. A query is lowercased once and scanned
+    once per regex, so an attribute inside a matched variant name still counts.
+    """
+
+    def __init__(self, brands=(), models=(), variants=(), fuel_types=(), cities=(), colours=()):
+        self._terms = {}
+        self._attribute_terms = {}
+
+        for brand in brands:
+            self._add_term(brand, "brand", brand)
+        for alias, brand in BRAND_ALIASES.items():
+            if brand in brands:
+                self._add_term(alias, "brand", brand)
+
+        # models: (brand, model) pairs; variants: (model, variant) pairs
+        for brand, model in models:
+            self._add_term(model, "model", (brand, model))
+        for model, variant in variants:
+            if len(variant) >= 3:
+                self._add_term(variant, "variant", (model, variant))
+
+        # A fuel keyword maps to every listed fuel label equal to it, or containing it
+        for keyword in FUEL_KEYWORDS:
+            exact = [fuel for fuel in fuel_types if fuel.lower() == keyword]
+            labels = exact or [fuel for fuel in fuel_types if keyword in fuel.lower()]
+            if labels:
+                self._add_term(keyword, "fuel_type", tuple(sorted(labels)))
+
+        for city in cities:
+            self._add_term(city, "city", city)
+        for colour in colours:
+            if colour.lower() not in ("other", "others", "n/a"):
+                self._add_term(colour, "colour", colour)
+
+        self._pattern = re.compile(
+            rf"(?<!\w)(?:(?P<year>(?:19|20)\d{{2}})|(?P<term>{_trie_pattern(self._terms)}))(?!\w)"
+        )
+        self._attribute_pattern = (
+            re.compile(rf"(?<!\w)(?:{_trie_pattern(self._attribute_terms)})(?!\w)") if self._attribute_terms else None
+        )
+
+    def _add_term(self, term, field, value):
+        term = " ".join(term.lower().split())
+        if term and re.search(r'[a-z]', term):
+            terms = self._attribute_terms if field in ATTRIBUTE_FIELDS else self._terms
+            terms.setdefault(term, []).append((field, value))
+
+    @classmethod
+    def from_listings(cls, cars):
+        """Harvest the vocabulary from scraped listings"""
+        brands, models, variants = set(), set(), set()
+        fuel_types, cities, colours = set(), set(), set()
+        for car in cars:
+            parts = split_car_name(car.get("car_name"))
+            if parts["brand"]:
+                brands.add(parts["brand"])
+                if parts["model"]:
+                    models.add((parts["brand"], parts["model"]))
+                    if parts["variant"]:
+                        variants.add((parts["model"], parts["variant"]))
+            details = car.get("details") or {}
+            for values, key in ((fuel_types, "fuel_type"), (cities, "city"), (colours, "colour")):
+                if details.get(key):
+                    values.add(details[key])
+        return cls(sorted(brands), sorted(models), sorted(variants), sorted(fuel_types),
+                   sorted(cities), sorted(colours))
+
+    @classmethod
+    def from_json(cls, filepath):
+        with open(filepath, 'r', encoding='utf-8') as file:
+            return cls.from_listings(json.load(file))
+
+    @classmethod
+    def default(cls):
+        """Extractor over the built-in seed vocabulary"""
+        return cls(SEED_VOCABULARY["brand"], fuel_types=SEED_VOCABULARY["fuel_type"],
+                   cities=SEED_VOCABULARY["city"])
+
+    def extract(self, query):
+        """Return {field: value} for every filter mentioned in the query"""
+        found = {}
+        text = (query or "").lower()
+        if self._attribute_pattern is not None:
+            for match in self._attribute_pattern.finditer(text):
+                for field, value in self._attribute_terms[match.group(0)]:
+                    found.setdefault(field, value)
+
+        pending_models, pending_variants = [], []
+        for match in self._pattern.finditer(text):
+            if match.group("year"):
+                found.setdefault("manufacturing_year", match.group("year"))
+                continue
+            for field, value in self._terms[match.group("term")]:
+                if field == "model":
+                    pending_models.append(value)
+                elif field == "variant":
+                    pending_variants.append(value)
+                else:
+                    found.setdefault(field, value)
+
+        # Models are accepted when unambiguous or backed by their brand
+        for brand, model in pending_models:
+            if "model" in found:
+                break
+            if found.get("brand") not in (None, brand):
+                continue
+            if model.lower() in AMBIGUOUS_MODELS and found.get("brand") != brand:
+                continue
+            found["model"] = model
+            found.setdefault("brand", brand)
+
+        # Variants only make sense for the model they belong to
+        for model, variant in pending_variants:
+            if found.get("model") == model:
+                found["variant"] = variant
+                break
+        return found
+
+    def where_for(self, query):
+        """ChromaDB where clause for the filters in a query, or None"""
+        found = self.extract(query)
+        filters = []
+        for field in FILTER_FIELDS:
+            if field not in found:
+                continue
+            value = found[field]
+            if field == "fuel_type":
+                value = value[0] if len(value) == 1 else {"$in": list(value)}
+            filters.append({field: value})
+        return {"$and": filters} if len(filters) > 1 else filters[0] if filters else None
@@ -0,0 +1,236 @@
+import argparse
+import asyncio
+import re
+from urllib.parse import urljoin
+import httpx
+from lxml import html
+from cartrade_pages import (CARD_XPATH, CAR_NAME_XPATH, DETAILS_TABLE_XPATH, LISTING_PAGE_URL, PRICE_XPATH,
+                            SELLER_REMARKS_XPATH, clean_label)
+from scrape_checkpoint import ScrapeCheckpoint
+
+# Elements the browser renders on their own line, so Selenium's .text puts line breaks around them
+_BLOCK_TAGS = {"address", "article", "aside", "blockquote", "dd", "div", "dl", "dt", "fieldset", "figcaption",
+               "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main",
+               "nav", "ol", "p", "pre", "section", "table", "tbody", "td", "tfoot", "th", "thead", "tr", "ul"}
+_SKIPPED_TAGS = {"script", "style", "noscript", "template"}
+
+_WHITESPACE = re.compile(r"\s+")
+
+_V_TABLE_XPATH = "//table[contains(concat(' ', normalize-space(@class), ' '), ' v_table ')]"
+
+def element_text(element):
+    """Approximate Selenium's element.text for an lxml element.
+
+    Whitespace in the markup collapses to single spaces, block-level elements
+    start new lines and blank lines are dropped.
+    """
+    parts = []
+
+    def walk(node):
+        tag = node.tag if isinstance(node.tag, str) else None
+        if tag in _SKIPPED_TAGS or (tag is None and node is not element):
+            return
+        block = tag in _BLOCK_TAGS
+        if block:
+            parts.append("\n")
+        if node.text:
+            parts.append(_WHITESPACE.sub(" ", node.text))
+        for child in node:
+            walk(child)
+            if child.tail:
+                parts.append(_WHITESPACE.sub(" ", child.tail))
+        if block or tag == "br":
+            parts.append("\n")
+
+    walk(element)
+    lines = (" ".join(line.split()) for line in "".join(parts).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+def get_text_safely(tree, xpath):
+    """Text of the first element matching xpath, or None"""
+    found = tree.xpath(xpath)
+    return element_text(found[0]) if found else None
+
+def get_car_details(tree):
+    """Extract the car details table as {label: value}, like scrapper.get_car_details"""
+    tables = tree.xpath(DETAILS_TABLE_XPATH) or tree.xpath(_V_TABLE_XPATH)
+    details = {}
+    if not tables:
+        return details
+    for row in tables[0].iter("tr"):
+        # Skip rows with colspan (usually footer rows)
+        if row.xpath(".//td[@colspan]"):
+            continue
+        cells = row.xpath(".//td")
+        if len(cells) >= 2:
+            details[clean_label(element_text(cells[0]))] = element_text(cells[1])
+    return details
+
+def parse_car_page(page_html, car_url):
+    """Build a car record from a detail page, in the same schema as the Selenium scraper"""
+    tree = html.fromstring(page_html)
+    return {
+        'price': get_text_safely(tree, PRICE_XPATH),
+        'car_name': get_text_safely(tree, CAR_NAME_XPATH),
+        'details': get_car_details(tree),
+        'seller_remarks': get_text_safely(tree, SELLER_REMARKS_XPATH),
+        'url': car_url,
+    }
+
+def parse_card_urls(page_html, page_url):
+    """Absolute detail page URLs of the cards on a listing page"""
+    tree = html.fromstring(page_html)
+    urls = []
+    for card in tree.xpath(CARD_XPATH):
+        for href in card.xpath("./a/@href")[:1]:
+            if href.strip():
+                urls.append(urljoin(page_url, href.strip()))
+    return urls
+
+class HttpScraper:
+    """Scrapes CarTrade listings over plain HTTP instead of driving a browser.
+
+    Listing and detail pages are fetched with one pooled httpx.AsyncClient and
+    parsed with lxml using the Selenium scraper's XPaths. A window of listing
+    pages is fetched at a time and every car on them is fetched concurrently,
+    bounded by max_concurrent_requests. Scraping stops at the first listing
+    page without cards, as the Selenium scraper does.
+
+    The XPaths are absolute paths into the browser DOM, so pages whose content
+    is injected by JavaScript still need the Selenium scraper.
+    """
+
+    def __init__(self, max_concurrent_requests=16, pages_per_batch=4, timeout=15.0, retries=2,
+                 page_url_template=LISTING_PAGE_URL, headers=None):
+        self.max_concurrent_requests = max_concurrent_requests
+        self.pages_per_batch = pages_per_batch
+        self.timeout = timeout
+        self.retries = retries
+        self.page_url_template = page_url_template
+        self.headers = headers or {"User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+                                                 "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"}
+        self.stats = {"requests": 0, "retries": 0, "failed": 0}
+
+    async def fetch(self, client, semaphore, url):
+        """GET a page, retrying transient failures with backoff; returns the body or None"""
+        for attempt in range(self.retries + 1):
+            try:
+                async with semaphore:
+                    self.stats["requests"] += 1
+                    response = await client.get(url)
+                if response.status_code < 500:
+                    response.raise_for_status()
+                    return response.text
+            except httpx.HTTPStatusError as e:
+                print(f"Error fetching {url}: {e}")
+                break
+            except httpx.TransportError as e:
+                print(f"Error fetching {url} (attempt {attempt + 1}): {e}")
+            if attempt < self.retries:
+                self.stats["retries"] += 1
+                await asyncio.sleep(0.5 * 2 ** attempt)
+        self.stats["failed"] += 1
+        return None
+
+    async def scrape_page_urls(self, client, semaphore, page):
+        page_url = self.page_url_template.format(page=page)
+        page_html = await self.fetch(client, semaphore, page_url)
+        urls = parse_card_urls(page_html, page_url) if page_html else []
+        print(f"Found {len(urls)} car URLs on page {page}: {page_url}")
+        return urls
+
+    async def scrape_car(self, client, semaphore, car_url):
+        page_html = await self.fetch(client, semaphore, car_url)
+        if page_html is None:
+            return None
+        try:
+            return parse_car_page(page_html, car_url)
+        except Exception as e:
+            print(f"Error parsing {car_url}: {e}")
+            return None
+
+    async def scrape(self, start_page=2, max_pages=50, checkpoint=None):
+        """Scrape listing pages start_page..max_pages; returns the car records in page order.
+
+        With a ScrapeCheckpoint, finished pages and recorded car URLs are
+        skipped, each car is appended as soon as it is parsed, and a page is
+        marked finished once all of its cars are recorded. The returned list
+        then holds only the cars scraped in this run.
+        """
+        all_cars = []
+        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        limits = httpx.Limits(max_connections=self.max_concurrent_requests,
+                              max_keepalive_connections=self.max_concurrent_requests)
+        async with httpx.AsyncClient(headers=self.headers, timeout=self.timeout, limits=limits,
+                                     follow_redirects=True) as client:
+            page = start_page
+            while page <= max_pages:
+                window = range(page, min(page + self.pages_per_batch, max_pages + 1))
+                page += len(window)
+                pages = [p for p in window if not (checkpoint and checkpoint.is_page_done(p))]
+                if not pages:
+                    print(f"Skipping pages {window[0]}-{window[-1]}, already scraped")
+                    continue
+                page_urls = await asyncio.gather(*(self.scrape_page_urls(client, semaphore, p) for p in pages))
+
+                # Keep pages up to the first empty one, like the Selenium scraper
+                scraped_pages, page_cars = [], []
+                reached_end = False
+                queued_urls = set()
+                for p, urls in zip(pages, page_urls):
+                    if not urls:
+                        reached_end = True
+                        break
+                    scraped_pages.append(p)
+                    for url in urls:
+                        if checkpoint and (checkpoint.is_url_done(url) or url in queued_urls):
+                            continue
+                        queued_urls.add(url)
+                        page_cars.append((p, url))
+
+                cars = await asyncio.gather(*(self.scrape_car(client, semaphore, url) for _, url in page_cars))
+                incomplete_pages = set()
+                for (p, _), car in zip(page_cars, cars):
+                    if car is None:
+                        incomplete_pages.add(p)
+                        continue
+                    all_cars.append(car)
+                    if checkpoint:
+                        checkpoint.add_car(car)
+                if checkpoint:
+                    # A page with a failed car stays open so a resumed run retries just that car
+                    for p in scraped_pages:
+                        if p not in incomplete_pages:
+                            checkpoint.complete_page(p)
+                print(f"Scraped {len(all_cars)} cars through page {pages[-1]}")
+                if reached_end:
+                    break
+        return all_cars
+
+def scrape_car_listing_http(start_page=2, max_pages=50, output_path='cartrade_cars_final.json', resume=False,
+                            records_path='cartrade_cars.jsonl', **kwargs):
+    """HTTP counterpart of scrapper.scrape_car_listing; saves and returns the records.
+
+    As there, resume=True continues an interrupted scrape instead of fetching every page again.
+    """
+    scraper = HttpScraper(**kwargs)
+    with ScrapeCheckpoint(records_path, resume=resume) as checkpoint:
+        asyncio.run(scraper.scrape(start_page, max_pages, checkpoint=checkpoint))
+        all_cars = checkpoint.write_json(output_path)
+    print(f"Scraping completed. Saved {len(all_cars)} car listings to {output_path} "
+          f"({scraper.stats['requests']} requests, {scraper.stats['failed']} failed)")
+    return all_cars
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape used car listings from CarTrade over HTTP")
+    parser.add_argument("--start-page", type=int, default=5)
+    parser.add_argument("--max-pages", type=int, default=500)
+    parser.add_argument("--max-concurrent-requests", type=int, default=16)
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted scrape, skipping pages and cars already recorded")
+    args = parser.parse_args(argv)
+    scrape_car_listing_http(start_page=args.start_page, max_pages=args.max_pages, resume=args.resume,
+                            max_concurrent_requests=args.max_concurrent_requests)
+
+if __name__ == "__main__":
+    main()
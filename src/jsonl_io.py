@@ -0,0 +1,58 @@
+import json
+
+def _iter_json_array(file, read_size):
+    """Yield the elements of a top-level JSON array without loading the whole file"""
+    decoder = json.JSONDecoder()
+    buffer = file.read(read_size).lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("Expected a JSON array or JSON Lines file")
+    buffer = buffer[1:]
+    eof = False
+
+    while True:
+        buffer = buffer.lstrip()
+        if buffer.startswith(","):
+            buffer = buffer[1:].lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            record, end = decoder.raw_decode(buffer)
+            # A value ending exactly at the buffer edge may continue in the next read
+            if end == len(buffer) and not eof:
+                raise json.JSONDecodeError("Incomplete value", buffer, end)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more = file.read(read_size)
+            eof = not more
+            buffer += more
+            continue
+        yield record
+        buffer = buffer[end:]
+
+def iter_json_records(filepath, read_size=1 << 16):
+    """Stream records from a JSON Lines file or a JSON array file.
+
+    The format is detected from the first non-blank character, so both the
+    scraper's JSON output and JSONL files written by write_jsonl work.
+    Memory use stays bounded by the largest single record.
+    """
+    with open(filepath, 'r', encoding='utf-8') as file:
+        first = file.read(read_size)
+        file.seek(0)
+        if first.lstrip().startswith("["):
+            yield from _iter_json_array(file, read_size)
+            return
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+def write_jsonl(records, filepath):
+    """Write records one JSON object per line; returns how many were written"""
+    count = 0
+    with open(filepath, 'w', encoding='utf-8') as file:
+        for record in records:
+            file.write(json.dumps(record, ensure_ascii=False))
+            file.write("\n")
+            count += 1
+    return count
@@ -0,0 +1,35 @@
+import importlib.util
+import sys
+
+class _MissingModule:
+    """Stands in for a module that is not installed; fails only when it is used"""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        raise ModuleNotFoundError(f"No module named '{self._name}'", name=self._name)
+
+def lazy_import(name):
+    """Return module `name` without executing it until an attribute is first used.
+
+    Heavy dependencies (chromadb, google.generativeai, bert_score, nltk) take
+    seconds to import; loading them lazily keeps importing our modules cheap
+    for tests and tools that never touch them. The returned object is the
+    real module, so unittest.mock.patch('mod.dependency.attr') still works.
+    Parent packages of a dotted name are imported eagerly.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return _MissingModule(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent, _, child = name.rpartition('.')
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
@@ -0,0 +1,138 @@
+import re
+import numpy as np
+
+LEXICAL_INDEX_FILENAME = "bm25_index.npz"
+
+# Keeps model/variant tokens like "1.5", "i-vtec" and "6-series" in one piece
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+
+def tokenize(text):
+    """Lowercase word tokens used for both indexing and querying"""
+    return _TOKEN_PATTERN.findall((text or "").lower())
+
+class BM25Index:
+    """Compact BM25 inverted index over chunk texts.
+
+    Postings are stored in CSR form: for term t, the documents containing it
+    are doc_ids[offsets[t]:offsets[t + 1]] with matching term frequencies in
+    term_freqs. Everything is kept in a handful of NumPy arrays so the index
+    saves to a single compressed .npz file next to the Chroma collection.
+    """
+
+    def __init__(self, ids, vocabulary, offsets, doc_ids, term_freqs, doc_lengths, k1=1.5, b=0.75):
+        self.ids = list(ids)
+        self.vocabulary = {term: i for i, term in enumerate(vocabulary)}
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+        document_freqs = np.diff(offsets)
+        self.idf = np.log(1 + (len(self.ids) - document_freqs + 0.5) / (document_freqs + 0.5))
+
+    @classmethod
+    def build(cls, ids, texts, k1=1.5, b=0.75):
+        """Index chunk texts under their chunk IDs"""
+        builder = BM25Builder(k1=k1, b=b)
+        for chunk_id, text in zip(ids, texts):
+            builder.add(chunk_id, text)
+        return builder.finish()
+
+    def save(self, path):
+        """Write the index to a compressed .npz file"""
+        vocabulary = sorted(self.vocabulary, key=self.vocabulary.get)
+        np.savez_compressed(
+            path,
+            ids=np.array(self.ids, dtype=str),
+            vocabulary=np.array(vocabulary, dtype=str),
+            offsets=self.offsets,
+            doc_ids=self.doc_ids,
+            term_freqs=self.term_freqs,
+            doc_lengths=self.doc_lengths,
+            params=np.array([self.k1, self.b])
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Load an index written by save()"""
+        with np.load(path) as data:
+            k1, b = data["params"]
+            return cls(
+                data["ids"].tolist(), data["vocabulary"].tolist(), data["offsets"],
+                data["doc_ids"], data["term_freqs"], data["doc_lengths"], k1=float(k1), b=float(b)
+            )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, top_k=10):
+        """Return up to top_k (chunk_id, score) pairs ranked by BM25 score"""
+        scores = np.zeros(len(self.ids), dtype=np.float64)
+        matched = False
+        for token in set(tokenize(query)):
+            term = self.vocabulary.get(token)
+            if term is None:
+                continue
+            matched = True
+            start, end = self.offsets[term], self.offsets[term + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.term_freqs[start:end].astype(np.float64)
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / self.avg_doc_length)
+            scores[docs] += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+
+        if not matched:
+            return []
+        top_k = min(top_k, int(np.count_nonzero(scores)))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(self.ids[i], float(scores[i])) for i in best]
+
+class BM25Builder:
+    """Accumulates postings one chunk at a time, so an index can be built from a stream"""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = []
+        self._postings = {}
+        self._doc_lengths = []
+
+    def add(self, chunk_id, text):
+        doc_id = len(self.ids)
+        self.ids.append(chunk_id)
+        tokens = tokenize(text)
+        self._doc_lengths.append(len(tokens))
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            self._postings.setdefault(token, []).append((doc_id, count))
+
+    def finish(self):
+        """Pack the accumulated postings into a BM25Index"""
+        vocabulary = sorted(self._postings)
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        doc_ids, term_freqs = [], []
+        for i, term in enumerate(vocabulary):
+            for doc_id, count in self._postings[term]:
+                doc_ids.append(doc_id)
+                term_freqs.append(count)
+            offsets[i + 1] = len(doc_ids)
+
+        return BM25Index(
+            self.ids, vocabulary, offsets,
+            np.array(doc_ids, dtype=np.int32),
+            np.minimum(np.array(term_freqs, dtype=np.int64), np.iinfo(np.uint16).max).astype(np.uint16),
+            np.array(self._doc_lengths, dtype=np.int32),
+            k1=self.k1, b=self.b
+        )
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse several ranked ID lists into one, best first"""
+    fused = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking):
+            fused[item_id] = fused.get(item_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused, key=fused.get, reverse=True)
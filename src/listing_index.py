@@ -0,0 +1,354 @@
+import json
+import re
+import numpy as np
+from car_fields import format_rupees, parse_kms, parse_owner_rank, parse_price_rupees, split_car_name
+from filter_extractor import AMBIGUOUS_MODELS
+
+# Question phrasings that ask for an aggregate over many listings rather than a lookup
+_OPERATION_PATTERNS = [
+    # Only questions counting listings; "how many owners does ..." is a lookup about one car
+    ("count", None, r'\b(how many|number of|count of)\s+(?:(?!(?:of|the|does|do|has|have|is|are)\b)[\w.-]+\s+)'
+                    r'{0,4}?(cars?|listings?|vehicles?|options)\b'),
+    ("avg", None, r'\b(average|avg|mean|typical)\b'),
+    ("min", "price", r'\b(cheapest|least expensive|most affordable|lowest[- ]priced|lowest price|minimum price)\b'),
+    ("max", "price", r'\b(most expensive|costliest|priciest|highest[- ]priced|highest price|maximum price)\b'),
+    ("min", "kms_driven", r'\b(least driven|lowest (kms|km|mileage)|fewest (kms|km|kilomet\w*))\b'),
+    ("max", "kms_driven", r'\b(most driven|highest (kms|km|mileage))\b'),
+    ("max", "year", r'\b(newest|latest model|most recent)\b'),
+    ("min", "year", r'\b(oldest)\b'),
+]
+
+_RANGE_PATTERN = re.compile(
+    r'\b(?:(price[ds]?|budget|costs?|costing)\s+(?:is\s+|of\s+)?)?'
+    r'(under|below|less than|within|upto|up to|over|above|more than)\s*(₹|rs\.?)?\s*'
+    r'(\d[\d,]*(?:\.\d+)?)\s*(k\b)?\s*'
+    r'(lakhs?|lacs?|crores?|cr\b|kms?\b|kilomet\w*|owners?\b|years?\b|seats?\b|seaters?\b)?'
+)
+
+# "newer than 2018", "before 2015", "2018 onwards": (comparator, year) or (year, comparator)
+_YEAR_RANGE_PATTERN = re.compile(
+    r'\b(newer than|later than|after|since|older than|earlier than|before)\s+((?:19|20)\d{2})\b'
+    r'|\b((?:19|20)\d{2})\s+(or newer|or later|onwards|and above|or older|or earlier|and below)\b'
+)
+_YEAR_BOUNDS = {
+    "newer than": ("min", 1), "later than": ("min", 1), "after": ("min", 1), "since": ("min", 0),
+    "or newer": ("min", 0), "or later": ("min", 0), "onwards": ("min", 0), "and above": ("min", 0),
+    "older than": ("max", -1), "earlier than": ("max", -1), "before": ("max", -1),
+    "or older": ("max", 0), "or earlier": ("max", 0), "and below": ("max", 0),
+}
+
+# Constraints the listing index has no column for; such questions go through retrieval instead
+_UNSUPPORTED_PATTERN = re.compile(
+    r'\b(automatic|manual|transmission|amt|suvs?|sedans?|hatchbacks?|muvs?|mpvs?|convertibles?|coupes?|'
+    r'seaters?|colou?rs?|red|white|black|silver|grey|gray|blue|owners?)\b'
+)
+_FIRST_OWNER_PATTERN = re.compile(r'\b(first|single|one)[- ]owner\b')
+_PRICE_WORDS_PATTERN = re.compile(r'\b(price[ds]?|budget|costs?|costing|rupees)\b')
+
+_FUEL_WORDS = ["petrol", "diesel", "cng", "electric", "hybrid"]
+
+# A year is a four-digit number that is not an amount or distance ("2000 km", "rs 2000")
+_YEAR_PATTERN = re.compile(
+    r'(?<![₹\d,.])(?<!rs )(?<!rs\. )\b((?:19|20)\d{2})\b'
+    r'(?!\s*(?:k\b|kms?\b|kilomet|cc\b|lakhs?\b|lacs?\b|crores?\b|cr\b|rupees\b))'
+)
+
+# "in <place>" phrases; the place ends at the next range/connective word or punctuation
+_LOCATION_PATTERN = re.compile(
+    r'\b(?:in|at|from|near|around)\s+([a-z][a-z .-]*?)\s*'
+    r'(?=\b(?:under|below|less|within|upto|up|over|above|more|with|for|that|which|having|and|or|by)\b|[?,!]|$)'
+)
+# Words after "in" that do not name a place ("in good condition", "in the list", "in diesel")
+_NON_LOCATION_WORDS = {"a", "an", "the", "my", "our", "your", "this", "that", "good", "excellent", "great",
+                       "total", "stock", "india", "budget", "range", "terms", "all", "any", "general",
+                       "kms", "km", "lakh", "lakhs", "rupees", "automatic", "manual", *_FUEL_WORDS}
+
+_FIELD_LABELS = {
+    "price": "price",
+    "kms_driven": "kilometers driven",
+    "year": "manufacturing year",
+    "owners": "number of owners",
+}
+
+def _mentioned_location(text):
+    """The place an "in <place>" phrase of the question names, or None"""
+    for match in _LOCATION_PATTERN.finditer(text):
+        place = match.group(1).strip(" .-")
+        if place and place.split()[0] not in _NON_LOCATION_WORDS:
+            return place
+    return None
+
+def parse_analytical_query(query, cities=None):
+    """Recognize aggregation-style questions.
+
+    Returns a dict describing the operation, target field and numeric range
+    constraints, or None when the question is a plain lookup that should go
+    through vector retrieval. With the known cities given, a question about
+    a place none of them matches also returns None, rather than an aggregate
+    over every city.
+    """
+    text = query.lower()
+    operation = field = None
+    for op, op_field, pattern in _OPERATION_PATTERNS:
+        if re.search(pattern, text):
+            operation, field = op, op_field
+            break
+    if operation is None:
+        return None
+
+    if field is None:
+        if re.search(r'\b(kms?|mileage|kilomet\w*|driven)\b', text) and operation == "avg":
+            field = "kms_driven"
+        elif re.search(r'\b(age|year)\b', text) and operation == "avg":
+            field = "year"
+        else:
+            field = "price"
+
+    if cities is not None:
+        place = _mentioned_location(text)
+        if place is not None and not any(re.search(rf'(?<!\w){re.escape(city.lower())}(?!\w)', place)
+                                         for city in cities):
+            return None
+
+    if _UNSUPPORTED_PATTERN.search(_FIRST_OWNER_PATTERN.sub(" ", text)):
+        return None
+
+    ranges = []
+    for price_word, word, currency, number, thousands, unit in _RANGE_PATTERN.findall(text):
+        value = float(number.replace(',', ''))
+        if thousands:
+            value *= 1000
+        if unit.startswith("km") or unit.startswith("kilomet"):
+            range_field = "kms_driven"
+        elif unit.startswith("lakh") or unit.startswith("lac"):
+            range_field, value = "price", value * 100000
+        elif unit.startswith("cr"):
+            range_field, value = "price", value * 10000000
+        elif unit:
+            # Owner counts, age in years, seats: not columns of the index
+            return None
+        elif currency or price_word or _PRICE_WORDS_PATTERN.search(text):
+            # Bare prices: small ones are in lakh, large ones rupees
+            range_field = "price"
+            value = value * 100000 if value < 1000 else value
+        else:
+            # A bare number with nothing saying it is a price
+            return None
+        bound = "max" if word in ("under", "below", "less than", "within", "upto", "up to") else "min"
+        ranges.append((range_field, bound, value))
+
+    for comparator, year, year_first, comparator_after in _YEAR_RANGE_PATTERN.findall(text):
+        bound, offset = _YEAR_BOUNDS[comparator or comparator_after]
+        ranges.append(("year", bound, float(int(year or year_first) + offset)))
+
+    return {
+        "operation": operation,
+        "field": field,
+        "ranges": ranges,
+        # Numbers inside a range phrase ("under 2000 km", "after 2018") are bounds, not years
+        "year": (_YEAR_PATTERN.search(_YEAR_RANGE_PATTERN.sub(" ", _RANGE_PATTERN.sub(" ", text)))
+                 or [None, None])[1],
+        "fuel": next((fuel for fuel in _FUEL_WORDS if re.search(rf'\b{fuel}\b', text)), None),
+        "first_owner": bool(_FIRST_OWNER_PATTERN.search(text)),
+        "text": text,
+    }
+
+class ListingIndex:
+    """NumPy-backed columnar index over the scraped car listings.
+
+    Numeric columns (price in rupees, kms driven, year, owner rank) are float
+    arrays with NaN for unknown values; fuel, city, brand and model are stored
+    as integer codes into small label lists. Filters, sorts and aggregates are
+    vectorized operations over these columns.
+    """
+
+    def __init__(self, listings):
+        # The scrape can list the same car on several pages; keep one row per URL
+        seen_urls = set()
+        unique = []
+        for car in listings:
+            if not car.get("car_name") or car.get("url") in seen_urls:
+                continue
+            seen_urls.add(car.get("url"))
+            unique.append(car)
+        listings = unique
+        details = [car.get("details") or {} for car in listings]
+        names = [split_car_name(car["car_name"]) for car in listings]
+
+        self.size = len(listings)
+        self.car_names = [car["car_name"] for car in listings]
+        self.raw_prices = [car.get("price") for car in listings]
+        self.urls = [car.get("url") for car in listings]
+
+        self.price = self._numeric([parse_price_rupees(car.get("price")) for car in listings])
+        self.kms_driven = self._numeric([parse_kms(d.get("kms_driven")) for d in details])
+        self.year = self._numeric([d.get("manufacturing_year") or n["year"] for d, n in zip(details, names)])
+        self.owners = self._numeric([parse_owner_rank(d.get("number_of_owners")) for d in details])
+
+        self.fuel_labels, self.fuel = self._categorical([d.get("fuel_type") for d in details])
+        self.city_labels, self.city = self._categorical([d.get("city") for d in details])
+        self.brand_labels, self.brand = self._categorical([n["brand"] for n in names])
+        self.model_labels, self.model = self._categorical([n["model"] for n in names])
+        # Brand codes each model is listed under, for models that are also ordinary words ("city")
+        self._model_brands = {code: set(self.brand[self.model == code].tolist())
+                              for code, label in enumerate(self.model_labels) if label.lower() in AMBIGUOUS_MODELS}
+
+        # One compiled alternation per label column so a question is scanned once per column
+        self._label_matchers = {
+            column: self._compile_labels(getattr(self, f"{column}_labels"))
+            for column in ("brand", "model", "city")
+        }
+
+    @classmethod
+    def from_json(cls, filepath):
+        """Build the index from a scraped listings file (JSON array)"""
+        with open(filepath, 'r', encoding='utf-8') as file:
+            return cls(json.load(file))
+
+    @staticmethod
+    def _numeric(values):
+        return np.array(
+            [float(v) if v not in (None, "", "N/A") else np.nan for v in values], dtype=np.float64
+        )
+
+    @staticmethod
+    def _categorical(values):
+        labels = sorted({v for v in values if v})
+        lookup = {label: code for code, label in enumerate(labels)}
+        codes = np.array([lookup.get(v, -1) for v in values], dtype=np.int32)
+        return labels, codes
+
+    def _codes_matching(self, labels, word):
+        """Label codes equal to word, or containing it when nothing matches exactly"""
+        exact = [code for code, label in enumerate(labels) if label.lower() == word]
+        if exact:
+            return exact
+        return [code for code, label in enumerate(labels) if word in label.lower()]
+
+    @staticmethod
+    def _compile_labels(labels):
+        # Purely numeric labels (BMW '3', '5') would match ordinary numbers in questions
+        lookup = {label.lower(): code for code, label in enumerate(labels) if re.search(r'[a-z]', label.lower())}
+        if not lookup:
+            return None, lookup
+        alternation = "|".join(re.escape(label) for label in sorted(lookup, key=len, reverse=True))
+        return re.compile(rf'(?<!\w)(?:{alternation})(?!\w)'), lookup
+
+    def _mentioned_codes(self, column, text):
+        """Codes of a label column's values mentioned as whole words in the question text"""
+        pattern, lookup = self._label_matchers[column]
+        if pattern is None:
+            return []
+        codes = sorted({lookup[match] for match in pattern.findall(text)})
+        if column == "model" and any(code in self._model_brands for code in codes):
+            # As in FilterExtractor, an ambiguous model name only counts next to its brand
+            brands = set(self._mentioned_codes("brand", text))
+            codes = [code for code in codes if code not in self._model_brands or self._model_brands[code] & brands]
+        return codes
+
+    def mask_for(self, spec):
+        """Boolean row mask for the filters of a parsed analytical query"""
+        mask = np.ones(self.size, dtype=bool)
+        text = spec.get("text", "")
+
+        for column in ("brand", "model", "city"):
+            codes = self._mentioned_codes(column, text)
+            if codes:
+                mask &= np.isin(getattr(self, column), codes)
+        if spec.get("fuel"):
+            mask &= np.isin(self.fuel, self._codes_matching(self.fuel_labels, spec["fuel"]))
+        if spec.get("year"):
+            mask &= self.year == float(spec["year"])
+        if spec.get("first_owner"):
+            mask &= self.owners == 1
+
+        for field, bound, value in spec.get("ranges", []):
+            column = getattr(self, field)
+            mask &= (column <= value) if bound == "max" else (column >= value)
+        return mask
+
+    def describe_filters(self, spec):
+        """Human-readable summary of the filters applied for a query"""
+        text = spec.get("text", "")
+        parts = []
+        for column in ("brand", "model", "city"):
+            labels = getattr(self, f"{column}_labels")
+            mentioned = [labels[code] for code in self._mentioned_codes(column, text)]
+            if mentioned:
+                parts.append(f"{column} = {', '.join(mentioned)}")
+        if spec.get("fuel"):
+            parts.append(f"fuel = {spec['fuel']}")
+        if spec.get("year"):
+            parts.append(f"year = {spec['year']}")
+        if spec.get("first_owner"):
+            parts.append("first owner")
+        for field, bound, value in spec.get("ranges", []):
+            if field == "price":
+                shown = format_rupees(value)
+            else:
+                shown = f"{value:.0f}" if field == "year" else f"{value:,.0f}"
+            parts.append(f"{_FIELD_LABELS[field]} {'<=' if bound == 'max' else '>='} {shown}")
+        return parts
+
+    def listing(self, row):
+        """Display fields of one listing"""
+        return {
+            "car_name": self.car_names[row],
+            "price": self.raw_prices[row],
+            "kms_driven": None if np.isnan(self.kms_driven[row]) else int(self.kms_driven[row]),
+            "year": None if np.isnan(self.year[row]) else int(self.year[row]),
+            "fuel_type": self.fuel_labels[self.fuel[row]] if self.fuel[row] >= 0 else None,
+            "city": self.city_labels[self.city[row]] if self.city[row] >= 0 else None,
+            "url": self.urls[row],
+        }
+
+    def answer(self, spec, top_k=3):
+        """Run the filter and aggregate described by a parsed analytical query"""
+        mask = self.mask_for(spec)
+        column = getattr(self, spec["field"])
+        valid = mask & ~np.isnan(column)
+        result = {
+            "operation": spec["operation"],
+            "field": spec["field"],
+            "filters": self.describe_filters(spec),
+            "matched": int(mask.sum()),
+        }
+
+        if spec["operation"] == "count" or not valid.any():
+            return result
+
+        values = column[valid]
+        if spec["operation"] == "avg":
+            result.update(value=float(values.mean()), minimum=float(values.min()),
+                          maximum=float(values.max()), counted=int(valid.sum()))
+        else:
+            rows = np.flatnonzero(valid)
+            order = np.argsort(values, kind="stable")
+            if spec["operation"] == "max":
+                order = order[::-1]
+            result["listings"] = [self.listing(int(rows[i])) for i in order[:top_k]]
+        return result
+
+def format_analytical_result(result, total_listings):
+    """Render a computed result as the context block sent to the LLM"""
+    label = _FIELD_LABELS[result["field"]]
+    show = format_rupees if result["field"] == "price" else (lambda v: f"{v:,.0f}")
+
+    lines = [f"COMPUTED RESULT (calculated over all {total_listings} listings in the database):"]
+    lines.append(f"Filters: {'; '.join(result['filters']) if result['filters'] else 'none'}")
+    lines.append(f"Matching listings: {result['matched']}")
+
+    if result["operation"] == "avg" and "value" in result:
+        lines.append(f"Average {label}: {show(result['value'])} (over {result['counted']} listings)")
+        lines.append(f"Range: {show(result['minimum'])} to {show(result['maximum'])}")
+    elif result.get("listings"):
+        which = "Lowest" if result["operation"] == "min" else "Highest"
+        lines.append(f"{which} {label}:")
+        for i, car in enumerate(result["listings"], 1):
+            lines.append(
+                f"{i}. {car['car_name']} | Price: {car['price']} | Kms Driven: {car['kms_driven']} | "
+                f"Year: {car['year']} | Fuel: {car['fuel_type']} | City: {car['city']} | URL: {car['url']}"
+            )
+    elif result["operation"] != "count":
+        lines.append("No matching listings have this value.")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,114 @@
+import abc
+import asyncio
+import os
+from lazy_import import lazy_import
+
+httpx = lazy_import("httpx")
+
+GEMINI_MODEL = 'gemini-2.0-flash'
+
+class LLMBackend(abc.ABC):
+    """Interface the RAG pipeline generates answers through.
+
+    Subclasses implement generate(); stream() and generate_async() fall back
+    to it, so a backend only overrides them when it can do better.
+    """
+
+    @abc.abstractmethod
+    def generate(self, prompt):
+        """The full answer to a prompt"""
+
+    def stream(self, prompt):
+        """Yield the answer as text fragments"""
+        yield self.generate(prompt)
+
+    async def generate_async(self, prompt):
+        return await asyncio.to_thread(self.generate, prompt)
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through a configured google.generativeai client"""
+
+    def __init__(self, client, model_name=GEMINI_MODEL):
+        self.client = client
+        self.model_name = model_name
+
+    def generate(self, prompt):
+        model = self.client.GenerativeModel(self.model_name)
+        return model.generate_content(prompt).text
+
+    def stream(self, prompt):
+        model = self.client.GenerativeModel(self.model_name)
+        for chunk in model.generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+    async def generate_async(self, prompt):
+        model = self.client.GenerativeModel(self.model_name)
+        response = await model.generate_content_async(prompt)
+        return response.text
+
+class HttpLLMBackend(LLMBackend):
+    """An LLM served over HTTP with the llm_standin protocol.
+
+    POST {base_url}/generate with {"prompt": ..., "stream": bool}; the reply
+    is {"text": ...}, or the plain-text answer streamed in chunks. Sync calls
+    share one pooled httpx.Client; async calls share one httpx.AsyncClient,
+    created on first use in the running event loop.
+    """
+
+    def __init__(self, base_url, timeout=60.0, max_connections=64):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client = httpx.Client(base_url=self.base_url, timeout=timeout, limits=self._limits)
+        self._async_client = None
+        self._async_loop = None
+
+    def generate(self, prompt):
+        response = self._client.post("/generate", json={"prompt": prompt, "stream": False})
+        response.raise_for_status()
+        return response.json()["text"]
+
+    def stream(self, prompt):
+        with self._client.stream("POST", "/generate", json={"prompt": prompt, "stream": True}) as response:
+            response.raise_for_status()
+            for fragment in response.iter_text():
+                if fragment:
+                    yield fragment
+
+    def _get_async_client(self):
+        # Pooled connections belong to the loop that opened them, so a new loop (e.g. another asyncio.run) gets a new client
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self._limits)
+            self._async_loop = loop
+        return self._async_client
+
+    async def generate_async(self, prompt):
+        response = await self._get_async_client().post("/generate", json={"prompt": prompt, "stream": False})
+        response.raise_for_status()
+        return response.json()["text"]
+
+    async def aclose(self):
+        """Close the async client from inside its event loop"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = self._async_loop = None
+
+    def close(self):
+        self._client.close()
+        if self._async_client is not None:
+            try:
+                asyncio.run(self.aclose())
+            except RuntimeError:
+                # Its loop is gone; the connections went with it
+                self._async_client = self._async_loop = None
+
+def as_backend(client):
+    """The LLMBackend for a pipeline LLM client; a bare Gemini client is wrapped in GeminiBackend"""
+    return client if isinstance(client, LLMBackend) else GeminiBackend(client)
+
+def llm_backend_from_env():
+    """HttpLLMBackend for LLM_BACKEND_URL when it is set (e.g. a local stand-in), else None for Gemini"""
+    url = os.getenv("LLM_BACKEND_URL")
+    return HttpLLMBackend(url) if url else None
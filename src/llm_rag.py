@@ -1,34 +1,61 @@
-import chromadb
-from chromadb.utils import embedding_functions
-# from google import genai
-import google.generativeai as genai
+import asyncio
 import json
 import os
 from dotenv import load_dotenv
-import re
+import threading
+import time
+import weakref
+from lazy_import import lazy_import
+from context_builder import (CONTEXT_HEADER, CONTEXT_TOKEN_BUDGET, NO_CONTEXT_TEXT, build_context, clean_price,
+                             relaxed_filters_note)
+from rag_cache import AnswerCache, EmbeddingCache, collection_fingerprint
+from listing_index import ListingIndex, format_analytical_result, parse_analytical_query
+from lexical_index import LEXICAL_INDEX_FILENAME, BM25Index, reciprocal_rank_fusion
+from filter_extractor import FilterExtractor
+from query_planner import FIELD_STATS_FILENAME, QueryPlanner, where_clauses
+from llm_backends import as_backend, llm_backend_from_env
+import tracing
+
+# chromadb and Gemini take seconds to import, so they load on first use
+chromadb = lazy_import("chromadb")
+# from google import genai
+genai = lazy_import("google.generativeai")
 
-# Load environment variables from .env file
-load_dotenv()
+CHROMA_DB_PATH = "car_chroma_db"
+LISTINGS_PATH = "cartrade_cars_final.json"
 
-def initialize_clients():
-    """Initialize ChromaDB and Google Gemini API clients"""
-    # ChromaDB setup
-    chroma_db_path = "car_chroma_db" 
-    sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
+# How many candidates each ranking contributes per requested result in hybrid retrieval
+HYBRID_FETCH_MULTIPLIER = 4
+
+def load_embedding_function():
+    """Load the sentence-transformer embedding function used by the collection"""
+    from chromadb.utils import embedding_functions
+    return embedding_functions.SentenceTransformerEmbeddingFunction(
         model_name="all-MiniLM-L6-v2"
     )
+
+def load_collection(embedding_function=None):
+    """Open the car chunk collection, or return None if it is not available"""
+    # ChromaDB setup
+    chroma_db_path = CHROMA_DB_PATH
+    sentence_transformer_ef = embedding_function or load_embedding_function()
     chroma_client = chromadb.PersistentClient(path=chroma_db_path)
 
     try:
-        collection = chroma_client.get_collection(
+        return chroma_client.get_collection(
             name="car_data_chunks",
             embedding_function=sentence_transformer_ef
         )
     except Exception as e:
         print(f"Error accessing collection: {e}")
-        collection = None
+        return None
+
+def initialize_clients(embedding_function=None):
+    """Initialize ChromaDB and Google Gemini API clients"""
+    collection = load_collection(embedding_function)
 
-    # Google Gemini API setup
+    # Google Gemini API setup, with environment variables from the .env file
+    load_dotenv()
     gemini_api_key = os.getenv("GEMINI_API_KEY")
     if not gemini_api_key:
         raise ValueError("GEMINI_API_KEY environment variable is not set")
@@ -38,79 +65,449 @@ def initialize_clients():
 
     return collection, genai
 
-def clean_price(price_str):
-    """Convert price string like '₹ 32.8 Lakh' to a structured format"""
-    # Extract the numeric part and the denomination (Lakh/Crore)
-    if not price_str or not isinstance(price_str, str):
-        return price_str
-
-    match = re.search(r'₹\s*([\d.]+)\s*(Lakh|Crore)?', price_str)
-    if not match:
-        return price_str
-
-    amount = float(match.group(1))
-    denomination = match.group(2) if match.group(2) else ""
+class RAGEngine:
+    """Long-lived holder for the embedding model, ChromaDB collection and Gemini client.
+
+    The clients are created lazily on first use and reused for every later
+    question, so only the first query pays the model and collection start-up
+    cost. One engine can be shared safely between threads.
+
+    Answers come from Gemini unless an llm_backend (an llm_backends.LLMBackend)
+    is given or LLM_BACKEND_URL points at an HTTP backend such as the local
+    stand-in. context_layout and context_token_budget choose how retrieved
+    chunks are written into the prompt (see format_context_for_llm).
+    Filtered queries go through a query_planner.QueryPlanner, loaded from the
+    field statistics saved next to the collection unless one is given.
+    """
+
+    def __init__(self, embedding_cache_size=1024, embedding_cache_ttl=3600,
+                 answer_cache_path="rag_answer_cache.sqlite3", answer_cache_size=10000,
+                 max_concurrent_retrievals=8, max_concurrent_llm_calls=16,
+                 listings_path=LISTINGS_PATH, llm_backend=None, context_layout="compact",
+                 context_token_budget=CONTEXT_TOKEN_BUDGET, query_planner=None):
+        self._lock = threading.Lock()
+        self._collection = None
+        self._llm_client = None
+        self.llm_backend = llm_backend
+        self.context_layout = context_layout
+        self.context_token_budget = context_token_budget
+        self.embedding_cache_size = embedding_cache_size
+        self.embedding_cache_ttl = embedding_cache_ttl
+        self.embedding_function = None
+        self.embedding_cache = None
+        self.answer_cache_path = answer_cache_path
+        self.answer_cache_size = answer_cache_size
+        self.answer_cache = None
+        self.max_concurrent_retrievals = max_concurrent_retrievals
+        self.max_concurrent_llm_calls = max_concurrent_llm_calls
+        self._async_limits = weakref.WeakKeyDictionary()
+        self.listings_path = listings_path
+        self.listing_index = None
+        self.lexical_index = None
+        self.query_planner = query_planner
+        self._loaded = False
+        self.cold_start_seconds = None
+        self.warm_queries = 0
+        self.warm_query_seconds = 0.0
+        self.last_query_seconds = None
+        self.first_token_count = 0
+        self.first_token_seconds = 0.0
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            start = time.perf_counter()
+            with tracing.span("client_init"):
+                embedding_function = load_embedding_function()
+                llm_backend = self.llm_backend or llm_backend_from_env()
+                if llm_backend is not None:
+                    collection, llm_client = load_collection(embedding_function), llm_backend
+                else:
+                    collection, llm_client = initialize_clients(embedding_function)
+                if collection is None:
+                    raise RuntimeError("Car collection 'car_data_chunks' is not available")
+                self._load_components(collection, llm_client, embedding_function)
+            self.cold_start_seconds = time.perf_counter() - start
+            self._loaded = True
+            print(f"RAG engine initialized in {self.cold_start_seconds:.2f}s (cold start)")
+
+    def _load_components(self, collection, llm_client, embedding_function, chroma_db_path=CHROMA_DB_PATH):
+        """Set up the caches and indexes around a collection and LLM client"""
+        self._collection, self._llm_client = collection, llm_client
+        self.embedding_function = embedding_function
+        self.embedding_cache = EmbeddingCache(
+            embedding_function,
+            max_size=self.embedding_cache_size,
+            ttl_seconds=self.embedding_cache_ttl
+        )
+        if self.answer_cache_path:
+            self.answer_cache = AnswerCache(self.answer_cache_path, max_entries=self.answer_cache_size)
+            self.answer_cache.validate_collection(collection_fingerprint(collection))
+        if self.listings_path and os.path.exists(self.listings_path):
+            self.listing_index = ListingIndex.from_json(self.listings_path)
+        # The BM25 index is written next to the collection at ingest time
+        lexical_index_path = os.path.join(chroma_db_path, LEXICAL_INDEX_FILENAME) if chroma_db_path else None
+        if lexical_index_path and os.path.exists(lexical_index_path):
+            self.lexical_index = BM25Index.load(lexical_index_path)
+        # So are the field statistics the query planner needs
+        field_stats_path = os.path.join(chroma_db_path, FIELD_STATS_FILENAME) if chroma_db_path else None
+        if self.query_planner is None and field_stats_path and os.path.exists(field_stats_path):
+            self.query_planner = QueryPlanner.load(field_stats_path)
+
+    @classmethod
+    def from_components(cls, collection, llm_client, embedding_function, chroma_db_path=None, **kwargs):
+        """An engine around an already opened collection and LLM client (e.g. for load tests).
+
+        The BM25 index and field statistics are loaded from chroma_db_path when one is given.
+        """
+        engine = cls(**kwargs)
+        start = time.perf_counter()
+        engine._load_components(collection, llm_client, embedding_function, chroma_db_path)
+        engine.cold_start_seconds = time.perf_counter() - start
+        engine._loaded = True
+        return engine
+
+    def warm_up(self):
+        """Load all clients now instead of on the first question"""
+        self._ensure_loaded()
+        return self
+
+    def clients(self):
+        """Return the shared (collection, llm_client) pair, loading them if needed"""
+        self._ensure_loaded()
+        return self._collection, self._llm_client
+
+    def prompt_version(self):
+        """Everything besides the question and chunks that shapes the prompt"""
+        # The context layout and budget change the prompt as much as the template does
+        return f"{PROMPT_TEMPLATE_VERSION}:{self.context_layout}:{self.context_token_budget}"
+
+    def answer_version(self):
+        """The prompt version and collection fingerprint answers from this engine depend on"""
+        collection, _ = self.clients()
+        return f"{self.prompt_version()}|{collection_fingerprint(collection)}"
+
+    def async_limits(self):
+        """Return the (retrieval, llm) semaphores of the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            limits = self._async_limits.get(loop)
+            if limits is None:
+                limits = (
+                    asyncio.Semaphore(self.max_concurrent_retrievals),
+                    asyncio.Semaphore(self.max_concurrent_llm_calls)
+                )
+                self._async_limits[loop] = limits
+            return limits
+
+    def record_query(self, seconds):
+        """Record the duration of one query answered by the warm engine"""
+        with self._lock:
+            self.warm_queries += 1
+            self.warm_query_seconds += seconds
+            self.last_query_seconds = seconds
+
+    def record_first_token(self, seconds):
+        """Record the time to first token of a streamed answer"""
+        with self._lock:
+            self.first_token_count += 1
+            self.first_token_seconds += seconds
+
+    def stats(self):
+        """Cold-start and warm-query timings collected so far"""
+        with self._lock:
+            return {
+                "loaded": self._loaded,
+                "cold_start_seconds": self.cold_start_seconds,
+                "warm_queries": self.warm_queries,
+                "avg_warm_query_seconds": (
+                    self.warm_query_seconds / self.warm_queries if self.warm_queries else None
+                ),
+                "last_query_seconds": self.last_query_seconds,
+                "avg_time_to_first_token_seconds": (
+                    self.first_token_seconds / self.first_token_count if self.first_token_count else None
+                ),
+                "embedding_cache": self.embedding_cache.stats() if self.embedding_cache else None,
+                "answer_cache": self.answer_cache.stats() if self.answer_cache else None,
+            }
 
-    if denomination.lower() == "lakh":
-        return f"₹{amount} Lakh (₹{amount*100000:,.2f})"
-    elif denomination.lower() == "crore":
-        return f"₹{amount} Crore (₹{amount*10000000:,.2f})"
+_default_engine = None
+_default_engine_lock = threading.Lock()
+
+def get_engine():
+    """Return the process-wide RAG engine shared by the pipeline, UI and evaluation"""
+    global _default_engine
+    if _default_engine is None:
+        with _default_engine_lock:
+            if _default_engine is None:
+                _default_engine = RAGEngine()
+    return _default_engine
+
+def retrieve_context(collection, query, n_results=5, filters=None, embedding_cache=None,
+                     lexical_index=None, mode=None, planner=None):
+    """Retrieve relevant context from ChromaDB.
+
+    mode is "vector" (default without a lexical index) or "hybrid" (default
+    with one), which fuses the vector ranking with BM25 matches on the exact
+    chunk text. With a QueryPlanner, filtered queries are planned from the
+    field statistics and relaxed progressively; without one, a filter that
+    fails or matches nothing is dropped altogether.
+    """
+    mode = mode or ("hybrid" if lexical_index is not None else "vector")
+    requested_results = n_results
+    if mode == "hybrid":
+        # Over-fetch from both rankings so the fusion has candidates to choose from
+        n_results = max(n_results * HYBRID_FETCH_MULTIPLIER, n_results)
+
+    # With an embedding cache the collection is queried by vector, skipping the encoder on hits
+    if embedding_cache is not None:
+        with tracing.span("embedding"):
+            query_input = {"query_embeddings": [embedding_cache.get_embedding(query)]}
     else:
-        return f"₹{amount:,.2f}"
+        query_input = {"query_texts": [query]}
 
-def retrieve_context(collection, query, n_results=5, filters=None):
-    """Retrieve relevant context from ChromaDB"""
+    # Filters with field statistics: the planner picks the strategy and relaxes as needed
+    if filters and planner is not None:
+        return _planned_contexts(collection, query, query_input, filters, planner, lexical_index, mode,
+                                 requested_results, n_results)
     # No filters case
-    if not filters:
-        results = collection.query(
-            query_texts=[query],
-            n_results=n_results
-        )
+    elif not filters:
+        with tracing.span("vector_search"):
+            results = collection.query(
+                **query_input,
+                n_results=n_results
+            )
     else:
         # With filters case
         try:
-            results = collection.query(
-                query_texts=[query],
-                n_results=n_results,
-                where=filters
-            )
+            with tracing.span("vector_search"):
+                results = collection.query(
+                    **query_input,
+                    n_results=n_results,
+                    where=filters
+                )
         except ValueError as e:
             print(f"Filter error: {e}. Falling back to query without filters.")
-            results = collection.query(
-                query_texts=[query],
-                n_results=n_results
-            )
+            results = _fallback_query(collection, query_input, n_results, "filter_error")
+        else:
+            # A filter on a field the collection was not ingested with matches nothing
+            if not (results and results['documents'] and results['documents'][0]):
+                print("No results with filters. Falling back to query without filters.")
+                results = _fallback_query(collection, query_input, n_results, "no_results")
+
+    contexts = _contexts_from_results(results)
+    if mode == "hybrid" and lexical_index is not None:
+        with tracing.span("lexical_fusion"):
+            return _fuse_with_lexical(collection, query, contexts, lexical_index, requested_results, n_results,
+                                      filters)
+    return contexts[:requested_results]
+
+def _planned_contexts(collection, query, query_input, filters, planner, lexical_index, mode, n_results,
+                      fetch_size):
+    """Contexts for one filtered query run through a QueryPlanner, relaxed levels marked"""
+    # Relax only as far as the requested results need; the extra candidates are for the fusion
+    results, plan = planner.retrieve(collection, query_input, n_results, filters, fetch_size=fetch_size)
+    if plan.relaxed:
+        print(f"Relaxed filters: {plan.describe()}")
+    contexts = _contexts_from_results(results)
+    if mode == "hybrid" and lexical_index is not None:
+        with tracing.span("lexical_fusion"):
+            return _fuse_plan_levels(collection, query, contexts, plan, filters, lexical_index, n_results,
+                                     fetch_size)
+    start = 0
+    for step in plan.steps:
+        _mark_relaxed_filters(contexts[start:start + step.returned], filters, step.where)
+        start += step.returned
+    return contexts[:n_results]
+
+def _fallback_query(collection, query_input, n_results, reason):
+    """Re-run a filtered query without its filters"""
+    tracing.count("rag_fallback_queries_total", reason=reason)
+    with tracing.span("fallback_query"):
+        return collection.query(
+            **query_input,
+            n_results=n_results
+        )
 
-    # Process results
+def _fuse_with_lexical(collection, query, vector_contexts, lexical_index, n_results, fetch_size, filters=None):
+    """Combine vector contexts with BM25 hits using reciprocal rank fusion"""
+    lexical_ids = [chunk_id for chunk_id, _ in lexical_index.search(query, top_k=fetch_size)]
+    by_id = {ctx["chunk_id"]: ctx for ctx in vector_contexts}
+
+    # Lexical-only hits are loaded from the collection, honouring the same filters
+    missing = [chunk_id for chunk_id in lexical_ids if chunk_id not in by_id]
+    if missing:
+        try:
+            records = collection.get(ids=missing, where=filters or None, include=["documents", "metadatas"])
+        except ValueError:
+            records = collection.get(ids=missing, include=["documents", "metadatas"])
+        for chunk_id, document, metadata in zip(records["ids"], records["documents"], records["metadatas"]):
+            by_id[chunk_id] = _context_from_record(chunk_id, document, metadata)
+
+    ranking = reciprocal_rank_fusion([[ctx["chunk_id"] for ctx in vector_contexts], lexical_ids])
+    return [by_id[chunk_id] for chunk_id in ranking if chunk_id in by_id][:n_results]
+
+def _mark_relaxed_filters(contexts, filters, level_where):
+    """Note on each context the requested filter fields its plan level dropped (context_builder shows them)"""
+    kept = where_clauses(level_where)
+    relaxed = [next(iter(clause)) for clause in where_clauses(filters) if clause not in kept]
+    if relaxed:
+        for ctx in contexts:
+            ctx["relaxed_filters"] = relaxed
+    return contexts
+
+def _fuse_plan_levels(collection, query, vector_contexts, plan, filters, lexical_index, n_results, fetch_size):
+    """Fuse each level of a relaxed query plan with the BM25 hits under that level's filter.
+
+    Levels stay in plan order, so chunks matching more of the requested
+    filters always rank ahead of those found after relaxing them.
+    """
+    fused, start = [], 0
+    for step in plan.steps:
+        level = vector_contexts[start:start + step.returned]
+        start += step.returned
+        seen = {ctx["chunk_id"] for ctx in fused}
+        level = _fuse_with_lexical(collection, query, level, lexical_index, n_results, fetch_size, step.where)
+        fused.extend(_mark_relaxed_filters([ctx for ctx in level if ctx["chunk_id"] not in seen], filters,
+                                           step.where))
+        if len(fused) >= n_results:
+            break
+    return fused[:n_results]
+
+def _context_from_record(chunk_id, document, metadata, distance=None):
+    """Context dict for one stored chunk"""
+    return {
+        "chunk_id": chunk_id,
+        "content": document,
+        "car_name": metadata['car_name'],
+        "price": metadata['price'],
+        "city": metadata['city'],
+        "fuel_type": metadata['fuel_type'],
+        "manufacturing_year": metadata['manufacturing_year'],
+        "url": metadata['url'],
+        "similarity": distance
+    }
+
+def _contexts_from_results(results, row=0):
+    """Turn one row of a collection.query result into context dicts"""
     contexts = []
-    if results and results['documents'] and results['documents'][0]:
-        for i in range(len(results['documents'][0])):
-            context = {
-                "content": results['documents'][0][i],
-                "car_name": results['metadatas'][0][i]['car_name'],
-                "price": results['metadatas'][0][i]['price'],
-                "city": results['metadatas'][0][i]['city'],
-                "fuel_type": results['metadatas'][0][i]['fuel_type'],
-                "manufacturing_year": results['metadatas'][0][i]['manufacturing_year'],
-                "url": results['metadatas'][0][i]['url'],
-                "similarity": results['distances'][0][i] if 'distances' in results else None
-            }
-            contexts.append(context)
+    if results and results['documents'] and results['documents'][row]:
+        for i in range(len(results['documents'][row])):
+            contexts.append(_context_from_record(
+                results['ids'][row][i] if 'ids' in results else None,
+                results['documents'][row][i],
+                results['metadatas'][row][i],
+                results['distances'][row][i] if 'distances' in results else None
+            ))
 
     return contexts
 
-def format_context_for_llm(contexts):
-    """Format retrieved contexts into a single string for the LLM prompt"""
+def retrieve_context_batch(collection, queries, n_results=5, filters_list=None, embedding_function=None,
+                           embedding_cache=None, lexical_index=None, mode=None, planner=None):
+    """Retrieve contexts for many queries at once, as retrieve_context would for each.
+
+    All queries are encoded in a single batch (with an embedding cache, only
+    its misses are encoded) and queries that share a filter are sent to
+    ChromaDB in one collection.query call, falling back (together) to no
+    filter when it fails or matches nothing. Filtered queries with a
+    QueryPlanner are planned and relaxed one by one, since each query may
+    need a different relaxation. In hybrid mode every query is then fused
+    with its BM25 matches. Returns one list of contexts per query, in input
+    order.
+    """
+    queries = list(queries)
+    if filters_list is None:
+        filters_list = [parse_query_for_filters(query) for query in queries]
+    mode = mode or ("hybrid" if lexical_index is not None else "vector")
+    fetch_size = max(n_results * HYBRID_FETCH_MULTIPLIER, n_results) if mode == "hybrid" else n_results
+
+    # One encoder forward pass for the whole batch
+    if embedding_cache is not None:
+        with tracing.span("embedding"):
+            input_name, query_values = "query_embeddings", embedding_cache.get_embeddings(queries)
+    elif embedding_function is not None:
+        input_name, query_values = "query_embeddings", list(embedding_function(queries))
+    else:
+        input_name, query_values = "query_texts", queries
+
+    # Group query positions by their (canonicalized) filter
+    groups = {}
+    for position, filters in enumerate(filters_list):
+        key = json.dumps(filters, sort_keys=True) if filters else None
+        groups.setdefault(key, []).append(position)
+
+    all_contexts = [[] for _ in queries]
+    for key, positions in groups.items():
+        filters = filters_list[positions[0]] if key is not None else None
+
+        if filters and planner is not None:
+            for position in positions:
+                all_contexts[position] = _planned_contexts(
+                    collection, queries[position], {input_name: [query_values[position]]}, filters, planner,
+                    lexical_index, mode, n_results, fetch_size
+                )
+            continue
+
+        group_input = {input_name: [query_values[p] for p in positions]}
+        if not filters:
+            with tracing.span("vector_search"):
+                results = collection.query(**group_input, n_results=fetch_size)
+        else:
+            try:
+                with tracing.span("vector_search"):
+                    results = collection.query(**group_input, n_results=fetch_size, where=filters)
+            except ValueError as e:
+                print(f"Filter error: {e}. Falling back to query without filters.")
+                results = _fallback_query(collection, group_input, fetch_size, "filter_error")
+
+        for row, position in enumerate(positions):
+            all_contexts[position] = _contexts_from_results(results, row)
+
+        empty = [position for position in positions if not all_contexts[position]]
+        if filters and empty:
+            print("No results with filters. Falling back to query without filters.")
+            results = _fallback_query(collection, {input_name: [query_values[p] for p in empty]}, fetch_size,
+                                      "no_results")
+            for row, position in enumerate(empty):
+                all_contexts[position] = _contexts_from_results(results, row)
+
+        for position in positions:
+            if mode == "hybrid" and lexical_index is not None:
+                with tracing.span("lexical_fusion"):
+                    all_contexts[position] = _fuse_with_lexical(collection, queries[position],
+                                                                all_contexts[position], lexical_index, n_results,
+                                                                fetch_size, filters)
+            else:
+                all_contexts[position] = all_contexts[position][:n_results]
+
+    return all_contexts
+
+def format_context_for_llm(contexts, layout="compact", token_budget=CONTEXT_TOKEN_BUDGET):
+    """Format retrieved contexts into a single string for the LLM prompt.
+
+    The "compact" layout merges the chunks of each listing, leaves out fields
+    already in the listing header and keeps within token_budget (see
+    context_builder.build_context). "full" is the original layout: every
+    chunk in full under its own header, without a budget.
+    """
+    if layout == "compact":
+        return build_context(contexts, token_budget)
+    if layout != "full":
+        raise ValueError(f"Unknown context layout: {layout}")
     if not contexts:
-        return "No relevant car information found."
+        return NO_CONTEXT_TEXT
 
-    formatted_context = "RELEVANT CAR LISTINGS:\n\n"
+    formatted_context = CONTEXT_HEADER
 
     for i, ctx in enumerate(contexts):
         # Format price for better readability
         clean_price_str = clean_price(ctx.get('price', 'Price not available'))
 
         formatted_context += f"[CAR {i+1}] {ctx['car_name']}\n"
+        formatted_context += relaxed_filters_note(ctx)
         formatted_context += f"Price: {clean_price_str}\n"
         formatted_context += f"Location: {ctx.get('city', 'Not specified')}\n"
         formatted_context += f"Fuel Type: {ctx.get('fuel_type', 'Not specified')}\n"
@@ -120,9 +517,9 @@ def format_context_for_llm(contexts):
 
     return formatted_context
 
-def generate_answer_with_llm(client, query, context):
-    """Generate an answer using Google Gemini with the retrieved context"""
-    prompt = f"""You are a knowledgeable automotive expert assistant. You help users find and understand information about used cars based on a database of car listings. You'll be given information about various car listings and a user question.
+# Bump PROMPT_TEMPLATE_VERSION whenever the template changes so cached answers are not reused
+PROMPT_TEMPLATE_VERSION = 3
+PROMPT_TEMPLATE = """You are a knowledgeable automotive expert assistant. You help users find and understand information about used cars based on a database of car listings. You'll be given information about various car listings and a user question.
 
 CONTEXT:
 {context}
@@ -135,60 +532,101 @@ In your answer:
 1. Provide specific details about the cars that match the user's query
 2. Compare options if multiple relevant cars are available,and give details about the most relevant one.
 3. Highlight important features like car_name,year,city,price,kms driven, and fuel_type.
+4. A listing with a "Note: does not match" line was found only after dropping those requested filters; if you mention it, say that it does not match them.
 
 ANSWER:"""
 
+def _build_prompt(query, context):
+    prompt = PROMPT_TEMPLATE.format(context=context, query=query)
+    tracing.observe("rag_prompt_chars", len(prompt))
+    return prompt
+
+LLM_ERROR_PREFIX = "Error generating response"
+
+def _llm_error(e):
+    tracing.count("rag_llm_errors_total", error=type(e).__name__)
+    return f"{LLM_ERROR_PREFIX}: {str(e)}"
+
+def generate_answer_with_llm(client, query, context):
+    """Generate an answer with the LLM backend (Google Gemini by default) from the retrieved context"""
+    prompt = _build_prompt(query, context)
+
     try:
-        # Initialize Gemini model
-        model = client.GenerativeModel('gemini-2.0-flash')
-        
-        # Generate content
-        response = model.generate_content(prompt)
-        
-        return response.text
+        with tracing.span("llm_generation"):
+            return as_backend(client).generate(prompt)
     except Exception as e:
-        return f"Error generating response: {str(e)}"
+        return _llm_error(e)
 
-def parse_query_for_filters(query):
-    """Extract potential filters from a query to narrow down search"""
-    filters = []
+def stream_answer_with_llm(client, query, context):
+    """Stream the answer as text fragments while it is being generated.
 
-    brands = ["Toyota", "Honda", "Maruti", "Suzuki", "Hyundai", "Mahindra", "Tata", "Kia",
-              "Mercedes", "BMW", "Audi", "Volkswagen", "Ford", "Renault", "Nissan", "MG"]
+    If generation fails, possibly after some fragments, the error message is
+    the last fragment.
+    """
+    prompt = _build_prompt(query, context)
 
-    for brand in brands:
-        if brand.lower() in query.lower():
-            filters.append({"car_name": {"$contains": brand}})
-            break
+    try:
+        with tracing.span("llm_generation", mode="stream"):
+            yield from as_backend(client).stream(prompt)
+    except Exception as e:
+        yield _llm_error(e)
 
-    fuel_types = ["Petrol", "Diesel", "CNG", "Electric", "Hybrid"]
-    for fuel in fuel_types:
-        if fuel.lower() in query.lower():
-            filters.append({"fuel_type": fuel})
-            break
+async def generate_answer_with_llm_async(client, query, context):
+    """Async variant of generate_answer_with_llm"""
+    prompt = _build_prompt(query, context)
 
-    cities = ["Delhi", "Mumbai", "Bangalore", "Hyderabad", "Chennai", "Kolkata", "Pune"]
-    for city in cities:
-        if city.lower() in query.lower():
-            filters.append({"city": city})
-            break
+    try:
+        with tracing.span("llm_generation", mode="async"):
+            return await as_backend(client).generate_async(prompt)
+    except Exception as e:
+        return _llm_error(e)
+
+_filter_extractor = None
+_filter_extractor_lock = threading.Lock()
+
+def get_filter_extractor():
+    """Filter extractor built once from the scraped listings (or the seed vocabulary)"""
+    global _filter_extractor
+    if _filter_extractor is None:
+        with _filter_extractor_lock:
+            if _filter_extractor is None:
+                if os.path.exists(LISTINGS_PATH):
+                    _filter_extractor = FilterExtractor.from_json(LISTINGS_PATH)
+                else:
+                    _filter_extractor = FilterExtractor.default()
+    return _filter_extractor
+
+def parse_query_for_filters(query):
+    """Extract potential filters from a query to narrow down search"""
+    return get_filter_extractor().where_for(query)
 
-    year_match = re.search(r'\b(20\d{2})\b', query)
-    if year_match:
-        filters.append({"manufacturing_year": year_match.group(1)})
+NO_CONTEXT_ANSWER = "I couldn't find relevant information about this in my car database. Try a different query or check back later as our database is regularly updated."
 
-    return {"$and": filters} if len(filters) > 1 else filters[0] if filters else None
+def car_rag_pipeline(query, explicit_filters=None, engine=None, trace=None):
+    """Full RAG pipeline combining retrieval and generation.
 
-def car_rag_pipeline(query, explicit_filters=None):
-    """Full RAG pipeline combining retrieval and generation"""
-    # Initialize clients
+    Pass a dict as trace to have it filled with the retrieved chunk IDs and
+    the prompt behind the answer (used to record evaluation runs).
+    """
+    # Reuse the warm clients of the shared engine
+    engine = engine or get_engine()
     try:
-        collection, gemini_client = initialize_clients()
+        collection, gemini_client = engine.clients()
     except Exception as e:
         return f"Error initializing clients: {str(e)}"
 
+    query_start = time.perf_counter()
+    try:
+        with tracing.span("query"):
+            return _answer_query(engine, collection, gemini_client, query, explicit_filters, trace)
+    finally:
+        engine.record_query(time.perf_counter() - query_start)
+
+def _retrieve_for_query(engine, collection, query, explicit_filters):
+    """Resolve filters for a question and retrieve its contexts with the engine's indexes"""
     # Parse query for implicit filters
-    implicit_filters = parse_query_for_filters(query)
+    with tracing.span("filter_parsing"):
+        implicit_filters = parse_query_for_filters(query)
 
     # Use either explicit or implicit filters, with explicit taking precedence
     filters = None
@@ -201,23 +639,190 @@ def car_rag_pipeline(query, explicit_filters=None):
     print(f"Retrieving context for query: '{query}'")
     if filters:
         print(f"Using filters: {filters}")
-    contexts = retrieve_context(collection, query, n_results=5, filters=filters)
+    return retrieve_context(collection, query, n_results=5, filters=filters,
+                            embedding_cache=engine.embedding_cache, lexical_index=engine.lexical_index,
+                            planner=engine.query_planner)
+
+def _answer_cache_key(engine, query, contexts):
+    """Cache key for a question and its retrieved chunks, or None when caching is not possible"""
+    chunk_ids = [ctx.get('chunk_id') for ctx in contexts]
+    if engine.answer_cache is None or not all(chunk_ids):
+        return None
+    return AnswerCache.make_key(query, chunk_ids, engine.prompt_version())
+
+def _format_engine_context(engine, contexts):
+    return format_context_for_llm(contexts, engine.context_layout, engine.context_token_budget)
+
+def _analytical_context(listing_index, query):
+    """Computed-result context for aggregation questions, or None for plain lookups"""
+    if listing_index is None:
+        return None
+    spec = parse_analytical_query(query, cities=listing_index.city_labels)
+    if spec is None:
+        return None
+    return format_analytical_result(listing_index.answer(spec), listing_index.size)
+
+def _prepare_llm_context(engine, collection, query, explicit_filters, trace=None):
+    """Do everything that happens before the LLM call.
+
+    Returns (final_answer, formatted_context, cache_key). final_answer is set
+    when no LLM call is needed, i.e. nothing was retrieved or the answer
+    cache already holds the answer. A trace dict gets the retrieved chunk IDs
+    and, for cached answers, the prompt that produced them.
+    """
+    # Aggregation questions are computed over every listing; only the result goes to the LLM
+    analytical_context = _analytical_context(engine.listing_index, query)
+    if analytical_context is not None:
+        print("Answering aggregate question from the listing index")
+        if trace is not None:
+            trace["chunk_ids"] = []
+        return None, analytical_context, None
+
+    contexts = _retrieve_for_query(engine, collection, query, explicit_filters)
+    if trace is not None:
+        trace["chunk_ids"] = [ctx.get('chunk_id') for ctx in contexts]
 
     if not contexts:
-        return "I couldn't find relevant information about this in my car database. Try a different query or check back later as our database is regularly updated."
+        return NO_CONTEXT_ANSWER, None, None
+
+    # Repeat questions over the same listings are answered from the cache
+    cache_key = _answer_cache_key(engine, query, contexts)
+    if cache_key is not None:
+        cached_answer = engine.answer_cache.get(cache_key)
+        tracing.count("rag_answer_cache_total", result="miss" if cached_answer is None else "hit")
+        if cached_answer is not None:
+            print("Answer served from cache")
+            if trace is not None:
+                trace["prompt"] = PROMPT_TEMPLATE.format(context=_format_engine_context(engine, contexts), query=query)
+            return cached_answer, None, None
 
     # Step 2: Format contexts for the LLM
-    formatted_context = format_context_for_llm(contexts)
+    with tracing.span("prompt_formatting"):
+        formatted_context = _format_engine_context(engine, contexts)
+    return None, formatted_context, cache_key
+
+def _answer_query(engine, collection, gemini_client, query, explicit_filters, trace=None):
+    """Answer one question with already initialized clients.
+
+    A trace dict also gets retrieval_seconds and generation_seconds.
+    """
+    start = time.perf_counter()
+    final_answer, formatted_context, cache_key = _prepare_llm_context(engine, collection, query, explicit_filters,
+                                                                      trace)
+    if trace is not None:
+        trace["retrieval_seconds"] = time.perf_counter() - start
+        trace["generation_seconds"] = 0.0
+    if final_answer is not None:
+        return final_answer
+    if trace is not None:
+        trace["prompt"] = PROMPT_TEMPLATE.format(context=formatted_context, query=query)
 
     # Step 3: Generate answer using Google Gemini
     print("Generating answer with Google Gemini...")
+    start = time.perf_counter()
     answer = generate_answer_with_llm(gemini_client, query, formatted_context)
+    if trace is not None:
+        trace["generation_seconds"] = time.perf_counter() - start
+
+    if cache_key is not None and not answer.startswith(LLM_ERROR_PREFIX):
+        engine.answer_cache.put(cache_key, answer)
 
     return answer
 
+def car_rag_pipeline_stream(query, explicit_filters=None, engine=None, trace=None):
+    """Streaming RAG pipeline that yields the answer incrementally.
+
+    car_rag_pipeline keeps returning the complete answer string for existing
+    callers; this generator is used where text can be shown as it arrives.
+    A trace dict is filled as in car_rag_pipeline.
+    """
+    engine = engine or get_engine()
+    try:
+        collection, gemini_client = engine.clients()
+    except Exception as e:
+        yield f"Error initializing clients: {str(e)}"
+        return
+
+    query_start = time.perf_counter()
+    try:
+        with tracing.span("query", mode="stream"):
+            final_answer, formatted_context, cache_key = _prepare_llm_context(engine, collection, query,
+                                                                              explicit_filters, trace)
+            generation_start = time.perf_counter()
+            if trace is not None:
+                trace["retrieval_seconds"] = generation_start - query_start
+                trace["generation_seconds"] = 0.0
+            if final_answer is not None:
+                engine.record_first_token(time.perf_counter() - query_start)
+                yield final_answer
+                return
+            if trace is not None:
+                trace["prompt"] = PROMPT_TEMPLATE.format(context=formatted_context, query=query)
+
+            print("Streaming answer from Google Gemini...")
+            fragments = []
+            for fragment in stream_answer_with_llm(gemini_client, query, formatted_context):
+                if not fragments:
+                    time_to_first_token = time.perf_counter() - query_start
+                    engine.record_first_token(time_to_first_token)
+                    print(f"Time to first token: {time_to_first_token:.2f}s")
+                fragments.append(fragment)
+                yield fragment
+
+            if trace is not None:
+                trace["generation_seconds"] = time.perf_counter() - generation_start
+            # A stream that failed part way ends in the error after a partial answer
+            failed = not fragments or fragments[-1].startswith(LLM_ERROR_PREFIX)
+            if cache_key is not None and not failed:
+                engine.answer_cache.put(cache_key, "".join(fragments))
+    finally:
+        engine.record_query(time.perf_counter() - query_start)
+
+async def car_rag_pipeline_async(query, explicit_filters=None, engine=None):
+    """Async RAG pipeline: retrieval runs in a worker thread, generation uses the async Gemini client"""
+    engine = engine or get_engine()
+    try:
+        collection, gemini_client = await asyncio.to_thread(engine.clients)
+    except Exception as e:
+        return f"Error initializing clients: {str(e)}"
+
+    retrieval_limit, llm_limit = engine.async_limits()
+    query_start = time.perf_counter()
+    try:
+        with tracing.span("query", mode="async"):
+            # Chroma and the sentence-transformer are blocking, keep them off the event loop
+            async with retrieval_limit:
+                final_answer, formatted_context, cache_key = await asyncio.to_thread(
+                    _prepare_llm_context, engine, collection, query, explicit_filters
+                )
+            if final_answer is not None:
+                return final_answer
+
+            async with llm_limit:
+                answer = await generate_answer_with_llm_async(gemini_client, query, formatted_context)
+
+            if cache_key is not None and not answer.startswith(LLM_ERROR_PREFIX):
+                engine.answer_cache.put(cache_key, answer)
+
+            return answer
+    finally:
+        engine.record_query(time.perf_counter() - query_start)
+
+async def car_rag_pipeline_many(queries, explicit_filters=None, engine=None):
+    """Answer many questions concurrently, bounded by the engine's async limits"""
+    engine = engine or get_engine()
+    return await asyncio.gather(
+        *(car_rag_pipeline_async(query, explicit_filters, engine) for query in queries)
+    )
+
 # Example usage
 if __name__ == "__main__":
-    
+    # RAG_METRICS_PORT exposes per-stage timings at http://127.0.0.1:<port>/metrics
+    metrics_port = os.getenv("RAG_METRICS_PORT")
+    if metrics_port:
+        tracing.enable_tracing()
+        tracing.start_metrics_server(int(metrics_port))
+        print(f"Serving metrics on http://127.0.0.1:{metrics_port}/metrics")
 
     # Interactive mode
     print("\n=== Interactive Mode ===")
@@ -226,6 +831,7 @@ if __name__ == "__main__":
     while True:
         user_query = input("\nWhat would you like to know about cars for sale? ")
         if user_query.lower() in ['exit', 'quit', 'bye']:
+            print(f"Engine timings: {get_engine().stats()}")
             print("Thank you for using the Car RAG system. Goodbye!")
             break
 
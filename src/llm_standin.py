@@ -0,0 +1,158 @@
+"""Local stand-in for the Gemini API, for load tests and offline runs.
+
+Serves POST /generate (see llm_backends.HttpLLMBackend) with a canned answer
+about the first car in the prompt, simulating a time to first token (with
+an optional prompt-processing rate so longer prompts take longer), a
+generation rate in tokens per second and a rate of failed requests. Point the
+pipeline at it with LLM_BACKEND_URL=http://127.0.0.1:8765.
+
+Usage:
+    python llm_standin.py --port 8765 --latency-ms 400 --tokens-per-second 80 --error-rate 0.02
+    python llm_standin.py --prefill-tokens-per-second 4000
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from context_builder import estimate_tokens
+
+_FIRST_CAR = re.compile(r"\[CAR 1\] (.+)")
+
+_FILLER = ("It is a well maintained listing with the details shown above, and the price is in line with "
+           "similar cars in the area.").split()
+
+def standin_answer(prompt, answer_tokens):
+    """A deterministic answer of answer_tokens words mentioning the first car in the prompt"""
+    match = _FIRST_CAR.search(prompt)
+    opening = f"The best match is the {match.group(1).strip()}." if match else "I found no matching car."
+    words = opening.split()
+    while len(words) < answer_tokens:
+        words.extend(_FILLER)
+    return " ".join(words[:max(answer_tokens, 1)])
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path != "/health":
+            self.send_error(404)
+            return
+        self._send_json(200, {"status": "ok", "requests": self.server.stats["requests"]})
+
+    def do_POST(self):
+        if self.path != "/generate":
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        server.count("requests")
+
+        prompt = body.get("prompt", "")
+        time.sleep(server.first_token_delay(prompt))
+        if server.should_fail():
+            server.count("errors")
+            self._send_json(server.error_status, {"error": "simulated failure"})
+            return
+
+        words = standin_answer(prompt, server.answer_tokens).split(" ")
+        if not body.get("stream"):
+            time.sleep(len(words) / server.tokens_per_second)
+            self._send_json(200, {"text": " ".join(words), "tokens": len(words)})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for index, word in enumerate(words):
+            time.sleep(1 / server.tokens_per_second)
+            data = (word if index == 0 else " " + word).encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+class StandinServer(ThreadingHTTPServer):
+    """HTTP server simulating an LLM API's latency, generation speed and failures"""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=8765, latency_ms=400.0, jitter_ms=100.0, tokens_per_second=80.0,
+                 answer_tokens=35, error_rate=0.0, error_status=503, seed=None, prefill_tokens_per_second=None):
+        super().__init__((host, port), StandinHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.stats = {"requests": 0, "errors": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def first_token_delay(self, prompt=""):
+        """Seconds before the first token: latency_ms plus uniform jitter, plus prompt processing if set"""
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        prefill = estimate_tokens(prompt) / self.prefill_tokens_per_second if self.prefill_tokens_per_second else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000 + prefill
+
+    def should_fail(self):
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+def start_standin(**settings):
+    """Run a StandinServer on a background thread; returns the server (stop it with shutdown())"""
+    server = StandinServer(**settings)
+    threading.Thread(target=server.serve_forever, name="llm-standin", daemon=True).start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=400.0, help="mean time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--answer-tokens", type=int, default=35)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--prefill-tokens-per-second", type=float,
+                        help="prompt processing rate; longer prompts delay the first token")
+    args = parser.parse_args(argv)
+
+    server = StandinServer(**vars(args))
+    print(f"LLM stand-in listening on {server.url} (set LLM_BACKEND_URL={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
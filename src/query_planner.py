@@ -0,0 +1,383 @@
+"""Selectivity-aware planning of filtered vector queries.
+
+FieldStats holds how many chunks carry each value of each metadata field.
+It is written next to the collection at ingest time (see embedding_store).
+QueryPlanner uses it to estimate how many chunks a where clause matches and
+picks one of three strategies per query:
+
+- "exact": fetch the few matching chunks and rank them by exact distance
+- "prefilter": let Chroma apply the where clause during the ANN search
+- "post_filter": over-fetch without the filter and drop non-matching chunks
+
+A filter that is estimated to match fewer chunks than requested is relaxed
+one field at a time, in the same call: results that match more of the
+filters come first, and the remaining slots are filled from the relaxed
+queries.
+"""
+import json
+import logging
+import math
+
+import numpy as np
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+FIELD_STATS_FILENAME = "field_stats.json"
+
+# Fields dropped first when a filter has to be relaxed; the car's identity is kept longest
+RELAXATION_ORDER = ["colour", "variant", "manufacturing_year", "city", "fuel_type", "model", "brand"]
+
+# Assumed selectivity of comparisons the value counts cannot answer ($gt, $lte, ...)
+DEFAULT_SELECTIVITY = 1 / 3
+
+def where_clauses(where):
+    """The single-field clauses of a where filter; a top-level $and is flattened"""
+    if not where:
+        return []
+    if set(where) == {"$and"}:
+        return [clause for part in where["$and"] for clause in where_clauses(part)]
+    if len(where) > 1:
+        return [{field: condition} for field, condition in where.items()]
+    return [where]
+
+def combine_clauses(clauses):
+    """The where filter requiring all clauses, or None for no clauses"""
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": list(clauses)}
+
+def _clause_field(clause):
+    return next(iter(clause))
+
+_OPERATORS = {"$eq", "$ne", "$in", "$nin", "$gt", "$gte", "$lt", "$lte"}
+
+def supports_where(where):
+    """Whether where_matches can evaluate every operator in a where filter"""
+    for field, condition in where.items():
+        if field in ("$and", "$or"):
+            if not all(supports_where(part) for part in condition):
+                return False
+        elif isinstance(condition, dict) and not set(condition) <= _OPERATORS:
+            return False
+    return True
+
+def where_matches(where, metadata):
+    """Evaluate a where filter against one chunk's metadata, as Chroma would"""
+    for field, condition in where.items():
+        if field == "$and":
+            if not all(where_matches(part, metadata) for part in condition):
+                return False
+        elif field == "$or":
+            if not any(where_matches(part, metadata) for part in condition):
+                return False
+        elif not _condition_matches(condition, metadata.get(field)):
+            return False
+    return True
+
+def _condition_matches(condition, value):
+    if not isinstance(condition, dict):
+        return value == condition
+    for operator, operand in condition.items():
+        if operator == "$eq":
+            matched = value == operand
+        elif operator == "$ne":
+            matched = value != operand
+        elif operator == "$in":
+            matched = value in operand
+        elif operator == "$nin":
+            matched = value not in operand
+        elif value is None:
+            matched = False
+        elif operator == "$gt":
+            matched = value > operand
+        elif operator == "$gte":
+            matched = value >= operand
+        elif operator == "$lt":
+            matched = value < operand
+        elif operator == "$lte":
+            matched = value <= operand
+        else:
+            raise ValueError(f"Unsupported where operator: {operator}")
+        if not matched:
+            return False
+    return True
+
+class FieldStats:
+    """Per-field value counts over the chunks of a collection"""
+
+    def __init__(self, total, fields):
+        self.total = total
+        self.fields = fields
+
+    @classmethod
+    def from_metadatas(cls, metadatas):
+        builder = FieldStatsBuilder()
+        for position, metadata in enumerate(metadatas):
+            builder.add(position, metadata)
+        return builder.finish()
+
+    @classmethod
+    def from_collection(cls, collection, page_size=10000):
+        """Count the metadata of every chunk already in a collection"""
+        builder = FieldStatsBuilder()
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            for chunk_id, metadata in zip(page["ids"], page["metadatas"]):
+                builder.add(chunk_id, metadata)
+            if len(page["ids"]) < page_size:
+                return builder.finish()
+            offset += page_size
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({"total": self.total, "fields": self.fields}, file, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        return cls(data["total"], data["fields"])
+
+    def selectivity(self, where):
+        """Estimated fraction of chunks matching a where filter.
+
+        Clauses are combined with exponential backoff (the most selective
+        counts fully, the next with its square root, then its fourth root,
+        ...) because fields such as brand and model are strongly correlated
+        and a plain product would underestimate the matches.
+        """
+        if not where or not self.total:
+            return 1.0
+        if set(where) == {"$or"}:
+            return min(1.0, sum(self.selectivity(part) for part in where["$or"]))
+        selectivities = sorted(self._clause_selectivity(clause) for clause in where_clauses(where))
+        estimate = 1.0
+        for i, value in enumerate(selectivities):
+            estimate *= value ** (1 / 2 ** i)
+        return estimate
+
+    def estimate(self, where):
+        """Estimated number of chunks matching a where filter"""
+        return self.total * self.selectivity(where)
+
+    def _clause_selectivity(self, clause):
+        field, condition = next(iter(clause.items()))
+        if field in ("$and", "$or"):
+            return self.selectivity(clause)
+        counts = self.fields.get(field)
+        if counts is None:
+            # The collection was not ingested with this field, so nothing can match it
+            return 0.0
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        selectivity = 1.0
+        for operator, operand in condition.items():
+            if operator == "$eq":
+                matching = counts.get(str(operand), 0)
+            elif operator == "$in":
+                matching = sum(counts.get(str(value), 0) for value in operand)
+            elif operator == "$ne":
+                matching = self.total - counts.get(str(operand), 0)
+            elif operator == "$nin":
+                matching = self.total - sum(counts.get(str(value), 0) for value in operand)
+            else:
+                matching = self.total * DEFAULT_SELECTIVITY
+            selectivity = min(selectivity, matching / self.total)
+        return selectivity
+
+class FieldStatsBuilder:
+    """Accumulates FieldStats one chunk at a time, counting each chunk ID once"""
+
+    def __init__(self):
+        self._seen_ids = set()
+        self._fields = {}
+
+    def add(self, chunk_id, metadata):
+        if chunk_id in self._seen_ids:
+            return
+        self._seen_ids.add(chunk_id)
+        for field, value in (metadata or {}).items():
+            counts = self._fields.setdefault(field, {})
+            counts[str(value)] = counts.get(str(value), 0) + 1
+
+    def finish(self):
+        return FieldStats(len(self._seen_ids), self._fields)
+
+class QueryStep:
+    """One query run for a plan: the filter used, how it was run and what it found"""
+
+    def __init__(self, where, strategy, estimated):
+        self.where = where
+        self.strategy = strategy
+        self.estimated = estimated
+        # Number of results this step added, None until it has run
+        self.returned = None
+
+    def describe(self):
+        filters = ", ".join(f"{_clause_field(c)}={json.dumps(c[_clause_field(c)], ensure_ascii=False)}"
+                            for c in where_clauses(self.where)) or "no filter"
+        return f"{self.strategy}({filters}) est {self.estimated:.0f} -> {self.returned}"
+
+class QueryPlan:
+    """The steps a planner took for one query"""
+
+    def __init__(self, n_results):
+        self.n_results = n_results
+        self.steps = []
+
+    @property
+    def relaxed(self):
+        return len(self.steps) > 1
+
+    def describe(self):
+        return "; ".join(step.describe() for step in self.steps)
+
+class QueryPlanner:
+    """Chooses how to run each filtered query from the collection's field statistics.
+
+    exact_scan_max is the largest estimated match count ranked by exact
+    scan. Filters keeping at least post_filter_min_selectivity of the
+    chunks are applied after an unfiltered query over-fetching
+    over_fetch_factor times the expected need (at most max_fetch results).
+    """
+
+    def __init__(self, stats, exact_scan_max=64, post_filter_min_selectivity=0.25, over_fetch_factor=2.0,
+                 max_fetch=256):
+        self.stats = stats
+        self.exact_scan_max = exact_scan_max
+        self.post_filter_min_selectivity = post_filter_min_selectivity
+        self.over_fetch_factor = over_fetch_factor
+        self.max_fetch = max_fetch
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        return cls(FieldStats.load(path), **kwargs)
+
+    def relaxation_levels(self, where, n_results):
+        """[(where, estimated matches)] from the full filter down to what is expected to fill n_results.
+
+        The unfiltered query always ends the list, in case the estimates were too high.
+        """
+        clauses = where_clauses(where)
+        # Fields outside RELAXATION_ORDER are dropped first, then in its order
+        drop_order = sorted(range(len(clauses)), key=lambda i: (
+            RELAXATION_ORDER.index(_clause_field(clauses[i])) if _clause_field(clauses[i]) in RELAXATION_ORDER
+            else -1
+        ))
+        levels = []
+        for dropped in range(len(clauses) + 1):
+            kept = sorted(set(range(len(clauses))) - set(drop_order[:dropped]))
+            level_where = combine_clauses([clauses[i] for i in kept])
+            estimated = self.stats.estimate(level_where)
+            if estimated > 0 or level_where is None:
+                levels.append((level_where, estimated))
+            if estimated >= n_results:
+                break
+        if levels[-1][0] is not None:
+            levels.append((None, float(self.stats.total)))
+        return levels
+
+    def choose_strategy(self, where, estimated, has_embedding=True):
+        if where is None:
+            return "unfiltered"
+        if estimated <= self.exact_scan_max and has_embedding:
+            return "exact"
+        if (self.stats.total and estimated / self.stats.total >= self.post_filter_min_selectivity
+                and supports_where(where)):
+            return "post_filter"
+        return "prefilter"
+
+    def plan(self, where, n_results, has_embedding=True):
+        """The steps retrieve() would run, before running them"""
+        plan = QueryPlan(n_results)
+        for level_where, estimated in self.relaxation_levels(where, n_results):
+            plan.steps.append(QueryStep(level_where, self.choose_strategy(level_where, estimated, has_embedding),
+                                        estimated))
+        return plan
+
+    def retrieve(self, collection, query_input, n_results, where, fetch_size=None):
+        """Run a query with its filter relaxed as needed; returns (collection.query-style results, plan).
+
+        query_input is {"query_embeddings": [vector]} or {"query_texts": [text]};
+        exact scans need the embedding. The filter is only relaxed until
+        n_results chunks are found, but up to fetch_size (default n_results)
+        candidates are returned for callers that re-rank them. Results keep
+        the order of the steps: plan.steps[i].returned of them per step.
+        """
+        has_embedding = "query_embeddings" in query_input
+        fetch_size = max(fetch_size or n_results, n_results)
+        plan = self.plan(where, n_results, has_embedding)
+        merged = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for step in plan.steps:
+            if len(merged["ids"]) >= n_results:
+                break
+            step.returned = 0
+            tracing.count("rag_query_plan_steps_total", strategy=step.strategy)
+            if step is not plan.steps[0]:
+                tracing.count("rag_filter_relaxations_total")
+            wanted = fetch_size + len(merged["ids"])
+            try:
+                with tracing.span("vector_search", strategy=step.strategy):
+                    found = self._run_step(collection, query_input, step, wanted)
+            except ValueError as e:
+                logger.warning(f"Query step {step.describe()} failed: {e}")
+                continue
+            seen = set(merged["ids"])
+            for chunk_id, document, metadata, distance in zip(*found):
+                if chunk_id in seen or len(merged["ids"]) >= fetch_size:
+                    continue
+                seen.add(chunk_id)
+                for key, value in zip(("ids", "documents", "metadatas", "distances"),
+                                      (chunk_id, document, metadata, distance)):
+                    merged[key].append(value)
+                step.returned += 1
+
+        # Later levels are not needed once the first ones filled n_results
+        plan.steps = [step for step in plan.steps if step.returned is not None]
+        logger.info(f"Query plan: {plan.describe()}")
+        return {key: [values] for key, values in merged.items()}, plan
+
+    def _run_step(self, collection, query_input, step, wanted):
+        """(ids, documents, metadatas, distances) of the best `wanted` chunks for one step"""
+        if step.strategy == "exact":
+            return self._exact_scan(collection, query_input["query_embeddings"][0], step.where, wanted)
+        if step.strategy == "post_filter":
+            fetch = min(self.max_fetch, max(wanted, math.ceil(
+                wanted / max(step.estimated / self.stats.total, 1e-9) * self.over_fetch_factor
+            )))
+            rows = _query_rows(collection.query(**query_input, n_results=fetch))
+            rows = [row for row in zip(*rows) if where_matches(step.where, row[2])]
+            if len(rows) >= wanted or fetch >= self.stats.total:
+                return list(zip(*rows)) or ([], [], [], [])
+            # Fewer matches than estimated among the over-fetched results
+            step.strategy = "post_filter+prefilter"
+        return _query_rows(collection.query(**query_input, n_results=wanted, where=step.where))
+
+    @staticmethod
+    def _exact_scan(collection, embedding, where, wanted):
+        records = collection.get(where=where, include=["embeddings", "documents", "metadatas"])
+        if not records["ids"]:
+            return [], [], [], []
+        vectors = np.asarray(records["embeddings"], dtype=np.float32)
+        query = np.asarray(embedding, dtype=np.float32)
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+        if space == "cosine":
+            norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+            distances = 1 - vectors @ query / np.where(norms == 0, 1.0, norms)
+        elif space == "ip":
+            distances = 1 - vectors @ query
+        else:
+            # Chroma reports squared L2 distances
+            distances = ((vectors - query) ** 2).sum(axis=1)
+        best = np.argsort(distances, kind="stable")[:wanted]
+        return ([records["ids"][i] for i in best], [records["documents"][i] for i in best],
+                [records["metadatas"][i] for i in best], [float(distances[i]) for i in best])
+
+def _query_rows(results):
+    """(ids, documents, metadatas, distances) of the first row of a collection.query result"""
+    if not results or not results["ids"] or not results["ids"][0]:
+        return [], [], [], []
+    return results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0]
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import tracing
+from collection_sync import stored_chunk_ids
+
+def normalize_query(query):
+    """Normalize a question so trivially different phrasings share a cache key"""
+    return re.sub(r'\s+', ' ', query or "").strip().lower().rstrip("?!. ")
+
+class EmbeddingCache:
+    """In-process LRU cache of query embeddings with time-based expiry.
+
+    Entries are keyed by the normalized query text. A hit returns the stored
+    vector without touching the sentence-transformer model; a miss encodes the
+    query as given (so the vector is the one query_texts=[query] would search
+    with) and stores the result, evicting the least recently used entry when
+    the cache is full.
+    """
+
+    def __init__(self, embedding_function, max_size=1024, ttl_seconds=3600):
+        self._embedding_function = embedding_function
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_embedding(self, query):
+        """Return the embedding for a query, encoding it only on a cache miss"""
+        return self.get_embeddings([query])[0]
+
+    def get_embeddings(self, queries):
+        """Embeddings for a list of queries; all misses are encoded in one batch"""
+        now = time.monotonic()
+        embeddings = [None] * len(queries)
+        missing = {}
+        with self._lock:
+            for position, query in enumerate(queries):
+                key = normalize_query(query)
+                entry = self._entries.get(key)
+                if entry is not None:
+                    expires_at, embedding = entry
+                    if expires_at > now:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                        tracing.count("rag_embedding_cache_total", result="hit")
+                        embeddings[position] = embedding
+                        continue
+                    del self._entries[key]
+                if key in missing:
+                    # A repeat within the batch is encoded once
+                    self.hits += 1
+                    tracing.count("rag_embedding_cache_total", result="hit")
+                else:
+                    self.misses += 1
+                    tracing.count("rag_embedding_cache_total", result="miss")
+                missing.setdefault(key, (query, []))[1].append(position)
+        if not missing:
+            return embeddings
+
+        # Encode outside the lock so concurrent misses don't serialize on the model
+        encoded = self._embedding_function([query for query, _ in missing.values()])
+
+        with self._lock:
+            for (key, (_, positions)), embedding in zip(missing.items(), encoded):
+                for position in positions:
+                    embeddings[position] = embedding
+                self._entries[key] = (now + self.ttl_seconds, embedding)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        return embeddings
+
+    def clear(self):
+        """Drop all cached embeddings"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+def collection_fingerprint(collection):
+    """Identify the current contents of a collection for cache invalidation.
+
+    Chunk IDs are content-addressed (see chunking.make_chunk_id), so a hash of
+    the stored IDs changes whenever a chunk is edited, even if the count does not.
+    """
+    ids_hash = hashlib.sha256()
+    for chunk_id in sorted(stored_chunk_ids(collection)):
+        ids_hash.update(chunk_id.encode("utf-8"))
+        ids_hash.update(b"\n")
+    return f"{collection.name}:{collection.count()}:{ids_hash.hexdigest()[:16]}"
+
+class AnswerCache:
+    """Persistent, size-bounded cache of generated answers backed by SQLite.
+
+    An answer is keyed by the normalized question, the IDs of the chunks that
+    were retrieved for it and the prompt template version, so a different
+    retrieval result or a prompt change never returns a stale answer. The
+    whole cache is dropped when the collection fingerprint changes.
+    """
+
+    def __init__(self, path="rag_answer_cache.sqlite3", max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, answer TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(query, chunk_ids, prompt_version):
+        """Build the cache key for a question and its retrieved chunk set"""
+        payload = json.dumps([prompt_version, normalize_query(query), sorted(str(i) for i in chunk_ids)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def validate_collection(self, fingerprint):
+        """Clear the cache if it was filled against a different collection state"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'collection'").fetchone()
+            if row is None or row[0] != fingerprint:
+                self._conn.execute("DELETE FROM answers")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES ('collection', ?)", (fingerprint,)
+                )
+                self._conn.commit()
+
+    def get(self, key):
+        """Return the cached answer for a key, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT answer FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, answer):
+        """Store an answer, evicting the least recently used entries beyond max_entries"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (key, answer, last_used) VALUES (?, ?, ?)",
+                (key, answer, time.time())
+            )
+            self._conn.execute(
+                "DELETE FROM answers WHERE key IN ("
+                "SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def clear(self):
+        """Drop all cached answers"""
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "size": size,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
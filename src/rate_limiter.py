@@ -0,0 +1,60 @@
+import threading
+import time
+
+class AdaptiveRateLimiter:
+    """Token bucket shared by scraper workers whose rate follows the site's health.
+
+    acquire() blocks until a request may start. After each request the caller
+    reports its latency and whether it succeeded: fast successes raise the
+    rate additively, while an error or a response slower than target_latency
+    cuts it multiplicatively (at most once per cooldown, so a burst of slow
+    responses from several workers counts as one slowdown).
+    """
+
+    def __init__(self, rate=1.0, min_rate=0.1, max_rate=5.0, burst=1, target_latency=5.0,
+                 increase=0.1, decrease=0.5, cooldown=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.target_latency = target_latency
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = target_latency if cooldown is None else cooldown
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._last_decrease = None
+        self.stats = {"requests": 0, "slowdowns": 0, "waited_seconds": 0.0}
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a token is available and take it"""
+        while True:
+            with self._lock:
+                self._refill(self._clock())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self.stats["requests"] += 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+                self.stats["waited_seconds"] += wait
+            self._sleep(wait)
+
+    def record(self, latency, ok=True):
+        """Adapt the rate to one finished request"""
+        with self._lock:
+            now = self._clock()
+            # Tokens earned so far accrue at the old rate
+            self._refill(now)
+            if ok and latency <= self.target_latency:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+            elif self._last_decrease is None or now - self._last_decrease >= self.cooldown:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self._last_decrease = now
+                self.stats["slowdowns"] += 1
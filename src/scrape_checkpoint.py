@@ -0,0 +1,98 @@
+import json
+import os
+
+class ScrapeCheckpoint:
+    """Append-only record of scraped cars and completed listing pages.
+
+    Every car is appended once to a JSON Lines file as soon as it is scraped,
+    and a listing page number is appended to a small checkpoint file once all
+    of its cars are recorded. By default both files start empty; with
+    resume=True they are read back, so a restarted scrape skips finished
+    pages and already scraped car URLs. Disk writes stay proportional to the
+    number of cars scraped. A line cut short by a crash is discarded on resume.
+    """
+
+    def __init__(self, records_path="cartrade_cars.jsonl", checkpoint_path=None, resume=False):
+        self.records_path = records_path
+        self.checkpoint_path = checkpoint_path or records_path + ".pages"
+        self.done_urls = set()
+        self.done_pages = set()
+
+        if resume:
+            for car in self._read_lines(self.records_path):
+                self.done_urls.add(car.get("url"))
+            for entry in self._read_lines(self.checkpoint_path):
+                self.done_pages.add(entry["page"])
+
+        mode = 'a' if resume else 'w'
+        self._records = open(self.records_path, mode, encoding='utf-8')
+        self._pages = open(self.checkpoint_path, mode, encoding='utf-8')
+
+    @staticmethod
+    def _read_lines(path):
+        """Parsed lines of a JSONL file, truncating a partial last line left by a crash"""
+        if not os.path.exists(path):
+            return []
+        entries = []
+        good_bytes = 0
+        with open(path, 'rb') as file:
+            for line in file:
+                try:
+                    if line.endswith(b"\n") and line.strip():
+                        entries.append(json.loads(line))
+                    elif line.strip():
+                        break
+                except json.JSONDecodeError:
+                    break
+                good_bytes += len(line)
+        if good_bytes < os.path.getsize(path):
+            print(f"Discarding an incomplete record at the end of {path}")
+            with open(path, 'r+b') as file:
+                file.truncate(good_bytes)
+        return entries
+
+    def is_page_done(self, page):
+        return page in self.done_pages
+
+    def is_url_done(self, url):
+        return url in self.done_urls
+
+    def add_car(self, car):
+        """Append a scraped car unless its URL is already recorded; returns True if written"""
+        if car.get("url") in self.done_urls:
+            return False
+        self._records.write(json.dumps(car, ensure_ascii=False) + "\n")
+        self._records.flush()
+        self.done_urls.add(car.get("url"))
+        return True
+
+    def complete_page(self, page):
+        """Mark a listing page finished, after all of its cars were added"""
+        if page in self.done_pages:
+            return
+        self._records.flush()
+        self._pages.write(json.dumps({"page": page}) + "\n")
+        self._pages.flush()
+        self.done_pages.add(page)
+
+    def cars(self):
+        """All recorded cars, in the order they were scraped"""
+        self._records.flush()
+        return self._read_lines(self.records_path)
+
+    def write_json(self, output_path):
+        """Write every recorded car to a JSON array file in one pass; returns the cars"""
+        cars = self.cars()
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(cars, f, ensure_ascii=False, indent=4)
+        return cars
+
+    def close(self):
+        self._records.close()
+        self._pages.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
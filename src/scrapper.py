@@ -1,13 +1,20 @@
-import json
-import time
+import argparse
 import os
+import queue
+import threading
+import time
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, TimeoutException, StaleElementReferenceException
+from selenium.common.exceptions import (NoSuchElementException, TimeoutException, StaleElementReferenceException,
+                                        WebDriverException)
+from cartrade_pages import (CARD_ANCHOR_XPATH, CARD_XPATH, CAR_NAME_XPATH, DETAILS_TABLE_CSS, DETAILS_TABLE_XPATH,
+                            LISTING_PAGE_URL, PRICE_XPATH, SELLER_REMARKS_XPATH, clean_label)
+from rate_limiter import AdaptiveRateLimiter
+from scrape_checkpoint import ScrapeCheckpoint
 
 def setup_driver():
     """Set up and return the Chrome WebDriver with appropriate options."""
@@ -38,8 +45,7 @@ def get_car_details(driver):
     
     try:
         # Look for the details table
-        table_xpath = "/html/body/div[2]/div[9]/div[1]/div[2]/div/div[4]/table"
-        table = driver.find_element(By.XPATH, table_xpath)
+        table = driver.find_element(By.XPATH, DETAILS_TABLE_XPATH)
         
         # Find all rows in the table
         rows = table.find_elements(By.TAG_NAME, "tr")
@@ -59,15 +65,14 @@ def get_car_details(driver):
                 value = cells[1].text.strip()
                 
                 # Clean the label (convert to lowercase and remove spaces)
-                clean_label = label.lower().replace(' ', '_')
-                details[clean_label] = value
+                details[clean_label(label)] = value
                 
     except (NoSuchElementException, StaleElementReferenceException):
         print("Car details table not found, trying alternative approaches")
         
         # Try alternative approach - look for table with class 'v_table'
         try:
-            table = driver.find_element(By.CSS_SELECTOR, "table.v_table")
+            table = driver.find_element(By.CSS_SELECTOR, DETAILS_TABLE_CSS)
             rows = table.find_elements(By.TAG_NAME, "tr")
             
             for row in rows:
@@ -79,8 +84,7 @@ def get_car_details(driver):
                 if len(cells) >= 2:
                     label = cells[0].text.strip()
                     value = cells[1].text.strip()
-                    clean_label = label.lower().replace(' ', '_')
-                    details[clean_label] = value
+                    details[clean_label(label)] = value
         except Exception as e:
             print(f"Alternative approach for details also failed: {e}")
             
@@ -89,7 +93,69 @@ def get_car_details(driver):
     
     return details
 
-def get_card_urls_from_page(driver, page_url):
+# Reads every field of a car page in the browser, so extraction costs one WebDriver round trip.
+# innerText gives the same rendered text as Selenium's element.text.
+CAR_PAGE_SCRIPT = """
+const [priceXpath, nameXpath, tableXpath, tableCss, remarksXpath] = arguments;
+const byXpath = (xpath) => document.evaluate(
+    xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+const textOf = (xpath) => {
+    const node = byXpath(xpath);
+    return node ? node.innerText.trim() : null;
+};
+const table = byXpath(tableXpath) || document.querySelector(tableCss);
+const details = [];
+if (table) {
+    for (const row of table.querySelectorAll("tr")) {
+        if (row.querySelector("td[colspan]")) continue;
+        const cells = row.querySelectorAll("td");
+        if (cells.length >= 2) details.push([cells[0].innerText.trim(), cells[1].innerText.trim()]);
+    }
+}
+return {
+    price: textOf(priceXpath),
+    car_name: textOf(nameXpath),
+    details: details,
+    seller_remarks: textOf(remarksXpath)
+};
+"""
+
+# Collects the href of every listing card's link in one round trip
+CARD_URLS_SCRIPT = """
+const cards = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+const urls = [];
+for (let i = 0; i < cards.snapshotLength; i++) {
+    const anchor = Array.from(cards.snapshotItem(i).children).find((child) => child.tagName === "A");
+    if (anchor && anchor.href) urls.push(anchor.href);
+}
+return urls;
+"""
+
+def extract_car_page(driver):
+    """Price, name, details and remarks of the loaded car page in a single execute_script call."""
+    data = driver.execute_script(CAR_PAGE_SCRIPT, PRICE_XPATH, CAR_NAME_XPATH, DETAILS_TABLE_XPATH,
+                                 DETAILS_TABLE_CSS, SELLER_REMARKS_XPATH)
+    return {
+        'price': data['price'],
+        'car_name': data['car_name'],
+        'details': {clean_label(label): value for label, value in data['details']},
+        'seller_remarks': data['seller_remarks'],
+    }
+
+def extract_car_page_by_elements(driver):
+    """Element-by-element extraction of the loaded car page (one WebDriver call per element)."""
+    return {
+        # Get price
+        'price': get_text_safely(driver, PRICE_XPATH),
+        # Get car name/model
+        'car_name': get_text_safely(driver, CAR_NAME_XPATH),
+        # Get detailed car specifications
+        'details': get_car_details(driver),
+        # Get seller remarks
+        'seller_remarks': get_text_safely(driver, SELLER_REMARKS_XPATH),
+    }
+
+def get_card_urls_from_page(driver, page_url, extraction="script"):
     """Extract all car card URLs from the listing page."""
     urls = []
     
@@ -99,19 +165,26 @@ def get_card_urls_from_page(driver, page_url):
         
         # Wait for the page to load and cards to be available
         WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.XPATH, "/html/body/div[6]/div[2]/div[1]/div[4]/ul/li[1]"))
+            EC.presence_of_element_located((By.XPATH, CARD_XPATH + "[1]"))
         )
         
+        if extraction == "script":
+            try:
+                urls = driver.execute_script(CARD_URLS_SCRIPT, CARD_XPATH)
+                print(f"Found {len(urls)} card URLs on the page")
+                return urls
+            except WebDriverException as e:
+                print(f"Script extraction failed on {page_url}, falling back to elements: {e}")
+
         # Find all card elements
-        card_elements = driver.find_elements(By.XPATH, "/html/body/div[6]/div[2]/div[1]/div[4]/ul/li")
+        card_elements = driver.find_elements(By.XPATH, CARD_XPATH)
         print(f"Found {len(card_elements)} card elements on the page")
         
         # Extract URLs from each card
         for i in range(1, len(card_elements) + 1):
             try:
                 # Get the href attribute from the anchor tag
-                card_anchor_xpath = f"/html/body/div[6]/div[2]/div[1]/div[4]/ul/li[{i}]/a"
-                card_anchor = driver.find_element(By.XPATH, card_anchor_xpath)
+                card_anchor = driver.find_element(By.XPATH, CARD_ANCHOR_XPATH.format(index=i))
                 url = card_anchor.get_attribute('href')
                 
                 if url:
@@ -127,100 +200,236 @@ def get_card_urls_from_page(driver, page_url):
         print(f"Error extracting URLs from page {page_url}: {e}")
         return []
 
-def scrape_car_listing(start_page=2, max_pages=50):
-    """Scrape car listings from multiple pages."""
-    driver = setup_driver()
-    all_cars = []
-    current_page = start_page
-    
+def wait_for_car_page(driver, timeout=15):
+    """Wait until the car page has loaded and its name is rendered (or the wait times out)."""
+    WebDriverWait(driver, timeout).until(lambda d: d.execute_script("return document.readyState") == "complete")
     try:
-        while current_page <= max_pages:
-            # Construct the page URL
-            page_url = f"https://www.cartrade.com/second-hand/delhi/page-{current_page}/#so=-1&sc=-1&city=10"
-            print(f"Processing page {current_page}: {page_url}")
-            
-            # Get all card URLs from the current page
-            car_urls = get_card_urls_from_page(driver, page_url)
-            
-            if not car_urls:
-                print(f"No car URLs found on page {current_page}. Ending scraping.")
-                break
-            
-            # Process each car URL
-            for index, car_url in enumerate(car_urls, 1):
+        WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.XPATH, CAR_NAME_XPATH)))
+    except TimeoutException:
+        # Removed listings have no name; extract whatever fields are there
+        print(f"Car name did not appear on {driver.current_url}")
+
+def scrape_car(driver, car_url, extraction="script"):
+    """Load a car details page and return its record."""
+    # Navigate to the car details page
+    driver.get(car_url)
+    wait_for_car_page(driver)
+
+    # Extract car information
+    car_data = None
+    if extraction == "script":
+        try:
+            car_data = extract_car_page(driver)
+        except WebDriverException as e:
+            print(f"Script extraction failed, falling back to elements: {e}")
+    if car_data is None:
+        car_data = extract_car_page_by_elements(driver)
+
+    # Add the URL for reference
+    car_data['url'] = car_url
+    return car_data
+
+class WorkerStats:
+    """Per-worker counters for the scraper pool."""
+
+    def __init__(self, name):
+        self.name = name
+        self.cars = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.started = time.monotonic()
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        attempts = self.cars + self.errors
+        return {
+            "worker": self.name,
+            "cars": self.cars,
+            "errors": self.errors,
+            "error_rate": self.errors / attempts if attempts else 0.0,
+            "cars_per_minute": 60 * self.cars / elapsed if elapsed else 0.0,
+            "avg_seconds_per_car": self.busy_seconds / attempts if attempts else 0.0,
+        }
+
+class ScraperPool:
+    """Scrapes car pages with several Chrome drivers pulling from one queue.
+
+    The calling thread walks the listing pages with its own driver and queues
+    every car URL it finds; each worker thread owns a driver (a separate
+    browser process) and scrapes URLs from the queue. All page loads go
+    through one AdaptiveRateLimiter, which slows the whole pool down when the
+    site gets slow or starts failing and speeds it back up when it recovers.
+    """
+
+    def __init__(self, workers=4, limiter=None, extraction="script", driver_factory=setup_driver):
+        self.workers = workers
+        self.limiter = limiter or AdaptiveRateLimiter()
+        self.extraction = extraction
+        self.driver_factory = driver_factory
+        self.worker_stats = []
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._failed_pages = set()
+
+    def _timed(self, load):
+        """Run one rate-limited page load, feeding its latency back to the limiter."""
+        self.limiter.acquire()
+        start = time.monotonic()
+        try:
+            result = load()
+        except Exception:
+            self.limiter.record(time.monotonic() - start, ok=False)
+            raise
+        self.limiter.record(time.monotonic() - start)
+        return result
+
+    def _finish_car(self, checkpoint, page, car_data):
+        with self._lock:
+            if car_data is None:
+                self._failed_pages.add(page)
+            else:
+                checkpoint.add_car(car_data)
+            self._pending[page] -= 1
+            # A page with a failed car stays open so a resumed run retries it
+            if self._pending[page] == 0 and page not in self._failed_pages:
+                checkpoint.complete_page(page)
+
+    def _work(self, car_queue, checkpoint, stats):
+        try:
+            driver = self.driver_factory()
+        except Exception as e:
+            print(f"[{stats.name}] Could not start a browser: {e}")
+            return
+        try:
+            while True:
+                item = car_queue.get()
+                if item is None:
+                    break
+                page, car_url = item
+                start = time.monotonic()
+                car_data = None
                 try:
-                    print(f"Processing car {index} of {len(car_urls)} on page {current_page}")
-                    print(f"URL: {car_url}")
-                    
-                    # Navigate to the car details page
-                    driver.get(car_url)
-                    
-                    # Wait for the car details page to load
-                    WebDriverWait(driver, 15).until(
-                        EC.presence_of_element_located((By.XPATH, "//body"))
-                    )
-                    
-                    # Allow some time for all elements to load
-                    time.sleep(2)
-                    
-                    # Extract car information
-                    car_data = {}
-                    
-                    # Get price
-                    car_data['price'] = get_text_safely(driver, "/html/body/div[2]/div[9]/div[1]/div[2]/div/div[1]/div[1]")
-                    
-                    # Get car name/model
-                    car_data['car_name'] = get_text_safely(driver, "/html/body/div[2]/div[9]/div[1]/div[2]/div/div[2]/h1")
-                    
-                    # Get detailed car specifications
-                    car_data['details'] = get_car_details(driver)
-                    
-                    # Get seller remarks
-                    car_data['seller_remarks'] = get_text_safely(driver, "/html/body/div[2]/div[9]/div[1]/div[1]/div[3]")
-                    
-                    # Add the URL for reference
-                    car_data['url'] = car_url
-                    
-                    # Add the data to our collection
-                    all_cars.append(car_data)
-                    print(f"Successfully scraped data for {car_data.get('car_name', 'unnamed car')}")
-                    
-                    # Save partial results after every 10 cars
-                    if len(all_cars) % 10 == 0:
-                        with open('cartrade_cars_partial.json', 'w', encoding='utf-8') as f:
-                            json.dump(all_cars, f, ensure_ascii=False, indent=4)
-                        print(f"Saved partial results with {len(all_cars)} cars")
-                    
-                    # Short delay between requests
-                    time.sleep(1)
-                    
+                    car_data = self._timed(lambda: scrape_car(driver, car_url, self.extraction))
+                    stats.cars += 1
+                    print(f"[{stats.name}] Scraped {car_data.get('car_name') or 'unnamed car'} from page {page}")
                 except Exception as e:
-                    print(f"Error processing car {index} on page {current_page}: {e}")
+                    stats.errors += 1
+                    print(f"[{stats.name}] Error processing {car_url} on page {page}: {e}")
+                finally:
+                    stats.busy_seconds += time.monotonic() - start
+                    self._finish_car(checkpoint, page, car_data)
+        finally:
+            driver.quit()
+
+    @staticmethod
+    def _put(car_queue, item, threads):
+        """Queue an item, unless every worker has stopped."""
+        while any(thread.is_alive() for thread in threads):
+            try:
+                car_queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def scrape(self, start_page, max_pages, checkpoint):
+        """Scrape pages start_page..max_pages into the checkpoint, stopping at the first empty page."""
+        car_queue = queue.Queue(maxsize=2 * self.workers)
+        self.worker_stats = [WorkerStats(f"worker-{i + 1}") for i in range(self.workers)]
+        threads = [threading.Thread(target=self._work, args=(car_queue, checkpoint, stats), name=stats.name)
+                   for stats in self.worker_stats]
+
+        # Started before any worker, so a browser that fails to launch leaves no thread waiting on the queue
+        driver = self.driver_factory()
+        try:
+            for thread in threads:
+                thread.start()
+
+            for current_page in range(start_page, max_pages + 1):
+                if checkpoint.is_page_done(current_page):
+                    print(f"Skipping page {current_page}, already scraped")
                     continue
-            
-            # Move to the next page
-            current_page += 1
-            
-            # Save results after each page
-            with open('cartrade_cars.json', 'w', encoding='utf-8') as f:
-                json.dump(all_cars, f, ensure_ascii=False, indent=4)
-            print(f"Saved results after page {current_page-1} with {len(all_cars)} cars")
-            
-            # Short delay before moving to the next page
-            time.sleep(2)
-            
+
+                # Get all card URLs from the current page
+                page_url = LISTING_PAGE_URL.format(page=current_page)
+                print(f"Processing page {current_page}: {page_url}")
+                car_urls = self._timed(lambda: get_card_urls_from_page(driver, page_url, self.extraction))
+                if not car_urls:
+                    print(f"No car URLs found on page {current_page}. Ending scraping.")
+                    break
+
+                with self._lock:
+                    new_urls = list(dict.fromkeys(url for url in car_urls if not checkpoint.is_url_done(url)))
+                    self._pending[current_page] = len(new_urls)
+                    if not new_urls:
+                        checkpoint.complete_page(current_page)
+                print(f"Queueing {len(new_urls)} of {len(car_urls)} cars from page {current_page}")
+                for car_url in new_urls:
+                    if not self._put(car_queue, (current_page, car_url), threads):
+                        raise RuntimeError("All scraper workers have stopped")
+        finally:
+            try:
+                driver.quit()
+            except Exception as e:
+                print(f"Could not close the listing browser: {e}")
+            # Every started worker has to get its sentinel, or it waits on the queue forever
+            for _ in threads:
+                self._put(car_queue, None, threads)
+            for thread in threads:
+                if thread.is_alive():
+                    thread.join()
+
+        for stats in self.worker_stats:
+            report = stats.report()
+            print(f"{report['worker']}: {report['cars']} cars, {report['errors']} errors "
+                  f"({report['error_rate']:.1%}), {report['cars_per_minute']:.1f} cars/min, "
+                  f"{report['avg_seconds_per_car']:.1f}s per car")
+        print(f"Final request rate {self.limiter.rate:.2f}/s after {self.limiter.stats['slowdowns']} slowdowns")
+        # Cars queued while the last workers were failing are never scraped; their pages stay open for a resume
+        unscraped = sum(1 for item in car_queue.queue if item is not None)
+        if unscraped:
+            raise RuntimeError(f"All scraper workers have stopped; {unscraped} queued cars were not scraped")
+
+def scrape_car_listing(start_page=2, max_pages=50, resume=False, records_path='cartrade_cars.jsonl',
+                       output_path='cartrade_cars_final.json', extraction="script", workers=1, limiter=None):
+    """Scrape car listings from multiple pages.
+
+    Each car is appended to records_path (JSON Lines) as it is scraped and
+    finished pages are checkpointed next to it. By default every page is
+    fetched again; resume=True continues an interrupted scrape, skipping
+    pages and cars that are already recorded (so listings added to those
+    pages since are not picked up). The combined JSON file is written once
+    at the end.
+
+    extraction="script" reads each page with one execute_script call;
+    extraction="elements" uses the original per-element WebDriver lookups.
+    Car pages are scraped by a ScraperPool of `workers` drivers, paced by
+    `limiter` (an AdaptiveRateLimiter) instead of fixed sleeps.
+    """
+    checkpoint = ScrapeCheckpoint(records_path, resume=resume)
+    pool = ScraperPool(workers=workers, limiter=limiter, extraction=extraction)
+    try:
+        pool.scrape(start_page, max_pages, checkpoint)
     except Exception as e:
         print(f"An error occurred during scraping: {e}")
     finally:
-        driver.quit()
-        
         # Save the final results
-        with open('cartrade_cars_final.json', 'w', encoding='utf-8') as f:
-            json.dump(all_cars, f, ensure_ascii=False, indent=4)
-        print(f"Scraping completed. Saved {len(all_cars)} car listings to cartrade_cars_final.json")
+        all_cars = checkpoint.write_json(output_path)
+        checkpoint.close()
+        print(f"Scraping completed. Saved {len(all_cars)} car listings to {output_path}")
     
     return all_cars
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape used car listings from CarTrade with Selenium")
+    parser.add_argument("--start-page", type=int, default=5)
+    parser.add_argument("--max-pages", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4, help="browsers scraping car pages")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted scrape, skipping pages and cars already recorded")
+    args = parser.parse_args(argv)
+    scrape_car_listing(start_page=args.start_page, max_pages=args.max_pages, workers=args.workers,
+                       resume=args.resume)
+
 if __name__ == "__main__":
-    # Start scraping from page 2
-    scrape_car_listing(start_page=5, max_pages=500)
\ No newline at end of file
+    main()
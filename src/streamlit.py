@@ -1,13 +1,13 @@
 import streamlit as st
-from llm_rag import car_rag_pipeline
+from llm_rag import car_rag_pipeline_stream
 
 def main():
     st.title("Car RAG System")
     query = st.text_input("Enter your car-related question:")
     
     if st.button("Submit"):
-        answer = car_rag_pipeline(query)
-        st.write(answer)
+        # Render the answer as Gemini streams it instead of waiting for the full text
+        st.write_stream(car_rag_pipeline_stream(query))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
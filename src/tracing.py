@@ -0,0 +1,300 @@
+"""Timing spans, counters and histograms for the RAG pipeline.
+
+Pipeline code calls the module-level span(), count() and observe(). They
+go to the current tracer: a Tracer that aggregates metrics, passes every
+event to registered hooks and renders them in the Prometheus text format,
+or (the default) a NoopTracer whose calls do nothing. Set RAG_TRACING=1 or
+call enable_tracing() to turn collection on.
+"""
+import contextvars
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STAGE_METRIC = "rag_stage_seconds"
+
+_SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Metric name -> (type, help text, histogram buckets)
+METRICS = {
+    STAGE_METRIC: ("histogram", "Time spent in each RAG pipeline stage", _SECONDS_BUCKETS),
+    "rag_stage_errors_total": ("counter", "Pipeline stages that raised an exception", None),
+    "rag_prompt_chars": ("histogram", "Size of the prompts sent to the LLM in characters",
+                         (500, 1000, 2000, 4000, 8000, 16000, 32000)),
+    "rag_embedding_cache_total": ("counter", "Query embedding cache lookups by result", None),
+    "rag_answer_cache_total": ("counter", "Answer cache lookups by result", None),
+    "rag_fallback_queries_total": ("counter", "Collection re-queries without filters by reason", None),
+    "rag_llm_errors_total": ("counter", "LLM calls that returned an error", None),
+    "rag_query_plan_steps_total": ("counter", "Planned collection queries by strategy", None),
+    "rag_filter_relaxations_total": ("counter", "Planned queries run with a relaxed filter", None),
+}
+
+# Name of the innermost open span, carried across threads and asyncio tasks
+_current_span = contextvars.ContextVar("rag_current_span", default=None)
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+class _Span:
+    __slots__ = ("tracer", "name", "labels", "start", "parent")
+
+    def __init__(self, tracer, name, labels):
+        self.tracer = tracer
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        # Restored by value rather than with a reset token, so a span may stay
+        # open across the yields of a generator that resumes in another context
+        self.parent = _current_span.get()
+        _current_span.set(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        _current_span.set(self.parent)
+        # A generator closed before it finished is not a failed stage
+        failed = exc_type is not None and not issubclass(exc_type, GeneratorExit)
+        self.tracer._finish_span(self.name, seconds, self.labels, self.parent, failed)
+        return False
+
+class Tracer:
+    """Thread-safe collector of spans, counters and histograms.
+
+    Every span adds its duration to the rag_stage_seconds histogram under its
+    stage name. Hooks are called with one dict per event: kind ("span",
+    "counter" or "histogram"), name, value and labels; spans also carry their
+    parent span's name and whether they raised.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._hooks = []
+
+    def span(self, name, **labels):
+        """Context manager timing one pipeline stage"""
+        return _Span(self, name, labels)
+
+    def count(self, name, value=1, **labels):
+        with self._lock:
+            key = (name, _label_key(labels))
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._emit({"kind": "counter", "name": name, "value": value, "labels": labels})
+
+    def observe(self, name, value, **labels):
+        self._record(name, value, labels)
+        self._emit({"kind": "histogram", "name": name, "value": value, "labels": labels})
+
+    def add_hook(self, hook):
+        """Call hook(event) for every span, counter increment and observation"""
+        with self._lock:
+            self._hooks = self._hooks + [hook]
+
+    def remove_hook(self, hook):
+        with self._lock:
+            self._hooks = [h for h in self._hooks if h is not hook]
+
+    def _record(self, name, value, labels):
+        buckets = METRICS.get(name, (None, None, _SECONDS_BUCKETS))[2] or _SECONDS_BUCKETS
+        with self._lock:
+            key = (name, _label_key(labels))
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets),
+                                                     "sum": 0.0, "count": 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+                    break
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def _finish_span(self, name, seconds, labels, parent, failed):
+        self._record(STAGE_METRIC, seconds, dict(labels, stage=name))
+        if failed:
+            self.count("rag_stage_errors_total", stage=name)
+        self._emit({"kind": "span", "name": name, "value": seconds, "labels": labels, "parent": parent,
+                    "error": failed})
+
+    def _emit(self, event):
+        for hook in self._hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                print(f"Tracing hook {hook!r} failed: {e}")
+
+    def snapshot(self):
+        """Current values as {"counters": {...}, "histograms": {...}}, keyed by (name, labels)"""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "histograms": {key: {"sum": h["sum"], "count": h["count"]} for key, h in self._histograms.items()},
+            }
+
+    def stage_summary(self):
+        """{stage: {"count", "total_seconds", "mean_ms"}} from the spans recorded so far"""
+        summary = {}
+        with self._lock:
+            for (name, labels), histogram in self._histograms.items():
+                if name != STAGE_METRIC:
+                    continue
+                stage = dict(labels)["stage"]
+                entry = summary.setdefault(stage, {"count": 0, "total_seconds": 0.0})
+                entry["count"] += histogram["count"]
+                entry["total_seconds"] += histogram["sum"]
+        for entry in summary.values():
+            entry["mean_ms"] = entry["total_seconds"] / entry["count"] * 1000 if entry["count"] else None
+        return summary
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        def labels_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            escaped = (f'{k}="{_escape_label(v)}"' for k, v in pairs)
+            return "{" + ",".join(escaped) + "}"
+
+        def header(name, kind):
+            help_text = METRICS.get(name, (kind, name.replace("_", " "), None))[1]
+            return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+        def number(value):
+            return "+Inf" if value == math.inf else repr(float(value)) if isinstance(value, float) else str(value)
+
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            histograms = [(key, dict(h, counts=list(h["counts"]))) for key, h in histograms]
+
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.extend(header(name, "counter"))
+            lines.append(f"{name}{labels_text(labels)} {number(value)}")
+        for (name, labels), histogram in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.extend(header(name, "histogram"))
+            cumulative = 0
+            for bound, bucket_count in zip(histogram["buckets"], histogram["counts"]):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{labels_text(labels, [('le', number(bound))])} {cumulative}")
+            lines.append(f"{name}_bucket{labels_text(labels, [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"{name}_sum{labels_text(labels)} {number(histogram['sum'])}")
+            lines.append(f"{name}_count{labels_text(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class NoopTracer:
+    """Tracer used while tracing is off; every call returns immediately"""
+
+    enabled = False
+
+    def span(self, name, **labels):
+        return _NULL_SPAN
+
+    def count(self, name, value=1, **labels):
+        pass
+
+    def observe(self, name, value, **labels):
+        pass
+
+    def add_hook(self, hook):
+        pass
+
+    def remove_hook(self, hook):
+        pass
+
+    def snapshot(self):
+        return {"counters": {}, "histograms": {}}
+
+    def stage_summary(self):
+        return {}
+
+    def reset(self):
+        pass
+
+    def render_prometheus(self):
+        return ""
+
+_tracer = Tracer() if os.getenv("RAG_TRACING", "").lower() in ("1", "true", "yes") else NoopTracer()
+
+def get_tracer():
+    return _tracer
+
+def set_tracer(tracer):
+    """Install a tracer (Tracer, NoopTracer or anything with the same methods); returns the previous one"""
+    global _tracer
+    previous, _tracer = _tracer, tracer
+    return previous
+
+def enable_tracing():
+    """Start collecting metrics if they are not collected yet; returns the active Tracer"""
+    if not _tracer.enabled:
+        set_tracer(Tracer())
+    return _tracer
+
+def disable_tracing():
+    set_tracer(NoopTracer())
+
+def span(name, **labels):
+    """Time a pipeline stage: `with tracing.span("vector_search"): ...`"""
+    return _tracer.span(name, **labels)
+
+def count(name, value=1, **labels):
+    _tracer.count(name, value, **labels)
+
+def observe(name, value, **labels):
+    _tracer.observe(name, value, **labels)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        tracer = self.server.tracer or get_tracer()
+        body = tracer.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port=9464, host="127.0.0.1", tracer=None):
+    """Serve GET /metrics for Prometheus on a background thread; returns the server"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.tracer = tracer
+    threading.Thread(target=server.serve_forever, name="rag-metrics", daemon=True).start()
+    return server
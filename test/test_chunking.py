@@ -0,0 +1,79 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import hashlib
+import importlib.util
+import json
+import unittest
+from chunking import chunk_car_documents, create_car_documents, format_car_for_chunking, make_chunk_id, split_car_text
+
+CAR = {
+    "car_name": "2020 Kia Seltos HTX 1.5 Diesel",
+    "price": "₹ 12.5 Lakh",
+    "details": {"kms_driven": "50,745 Kms", "fuel_type": "Diesel", "city": "Delhi", "number_of_owners": "First"},
+    "seller_remarks": "Well maintained, single owner.",
+    "url": "https://www.cartrade.com/buy-used-cars/kia-seltos/123",
+}
+
+def long_car(remarks_words=400):
+    car = dict(CAR)
+    car["seller_remarks"] = " ".join(f"word{i}" for i in range(remarks_words))
+    return car
+
+class TestChunking(unittest.TestCase):
+
+    def test_format_car(self):
+        self.assertEqual(format_car_for_chunking(CAR), (
+            "CAR: 2020 Kia Seltos HTX 1.5 Diesel\n"
+            "PRICE: ₹ 12.5 Lakh\n"
+            "DETAILS:\n"
+            "  Kms Driven: 50,745 Kms\n"
+            "  Fuel Type: Diesel\n"
+            "  City: Delhi\n"
+            "  Number Of Owners: First\n"
+            "SELLER REMARKS: Well maintained, single owner.\n"
+            "URL: https://www.cartrade.com/buy-used-cars/kia-seltos/123\n"
+        ))
+
+    def test_short_listing_is_one_chunk(self):
+        text = format_car_for_chunking(CAR)
+        self.assertEqual(split_car_text(text, 1500), [text.strip()])
+
+    def test_long_listing_splits_on_fields(self):
+        text = format_car_for_chunking(long_car())
+        chunks = split_car_text(text, 500)
+        self.assertGreater(len(chunks), 3)
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk), 500)
+            self.assertTrue(chunk.startswith("CAR: 2020 Kia Seltos HTX 1.5 Diesel"))
+        self.assertIn("  Number Of Owners: First", chunks[0])
+        self.assertTrue(chunks[-1].endswith("URL: https://www.cartrade.com/buy-used-cars/kia-seltos/123"))
+        words = " ".join(chunk.split("\n", 1)[1] for chunk in chunks[1:]).split()
+        self.assertEqual([w for w in words if w.startswith("word")], [f"word{i}" for i in range(400)])
+
+    def test_chunk_ids_are_stable_and_content_addressed(self):
+        first = chunk_car_documents(create_car_documents([CAR, long_car()]), chunk_size=500)
+        again = chunk_car_documents(create_car_documents([CAR, long_car()]), chunk_size=500)
+        self.assertEqual([c["chunk_id"] for c in first], [c["chunk_id"] for c in again])
+        self.assertEqual(len({c["chunk_id"] for c in first}), len(first))
+
+        changed = dict(CAR, price="₹ 11.9 Lakh")
+        self.assertNotEqual(chunk_car_documents(create_car_documents([changed]))[0]["chunk_id"],
+                            first[0]["chunk_id"])
+
+    def test_chunk_id_format_is_unchanged(self):
+        # IDs already stored in collections hash the content this way; changing it re-embeds everything
+        metadata = {"car_name": "2020 Kia Seltos", "city": "Delhi"}
+        content = json.dumps(["CAR: 2020 Kia Seltos", metadata], sort_keys=True, ensure_ascii=False)
+        key = f"{CAR['url']}\x000\x00{hashlib.sha256(content.encode('utf-8')).hexdigest()}"
+        self.assertEqual(make_chunk_id(CAR["url"], 0, "CAR: 2020 Kia Seltos", metadata),
+                         hashlib.sha256(key.encode("utf-8")).hexdigest()[:32])
+
+    @unittest.skipUnless(importlib.util.find_spec("langchain"), "langchain is not installed")
+    def test_matches_recursive_splitter_for_short_listings(self):
+        documents = create_car_documents([CAR])
+        self.assertEqual(chunk_car_documents(documents, 1500, 150),
+                         chunk_car_documents(documents, 1500, 150, splitter="recursive"))
+
+if __name__ == '__main__':
+    unittest.main()
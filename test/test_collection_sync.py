@@ -0,0 +1,81 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import unittest
+import uuid
+import chromadb
+from collection_sync import stored_chunk_ids, sync_chunks
+
+class CountingEmbeddingFunction:
+    """Tiny deterministic embedding function that records how many texts it encoded"""
+
+    def __init__(self):
+        self.encoded = 0
+
+    def __call__(self, input):
+        self.encoded += len(input)
+        return [[float(len(text)), float(sum(map(ord, text)) % 97), 1.0] for text in input]
+
+    def name(self):
+        return "counting"
+
+def make_chunk(chunk_id, text, url="https://example.com/car"):
+    return {"chunk_id": chunk_id, "chunk_index": 0, "text": text,
+            "metadata": {"car_name": text, "url": url, "city": None}}
+
+class TestCollectionSync(unittest.TestCase):
+
+    def setUp(self):
+        self.embedding_function = CountingEmbeddingFunction()
+        self.collection = chromadb.EphemeralClient().create_collection(
+            name=f"sync_{uuid.uuid4().hex}", embedding_function=self.embedding_function
+        )
+        self.chunks = [make_chunk(f"id{i}", f"2020 Kia Seltos listing {i}") for i in range(5)]
+
+    def test_streamed_chunks_with_duplicates(self):
+        sync_chunks(self.collection, self.chunks[:2] + [make_chunk("gone", "2015 Tata Nano")])
+        stats = sync_chunks(self.collection, (chunk for chunk in self.chunks + [self.chunks[2]]), batch_size=2)
+        self.assertEqual(stats, {"added": 3, "deleted": 1, "unchanged": 2})
+        self.assertEqual(stored_chunk_ids(self.collection), {f"id{i}" for i in range(5)})
+
+    def test_rerun_does_no_encoder_work(self):
+        self.assertEqual(sync_chunks(self.collection, self.chunks, batch_size=2),
+                         {"added": 5, "deleted": 0, "unchanged": 0})
+        encoded = self.embedding_function.encoded
+
+        self.assertEqual(sync_chunks(self.collection, self.chunks, batch_size=2),
+                         {"added": 0, "deleted": 0, "unchanged": 5})
+        self.assertEqual(self.embedding_function.encoded, encoded)
+        self.assertEqual(self.collection.count(), 5)
+
+    def test_changed_and_removed_chunks(self):
+        sync_chunks(self.collection, self.chunks)
+        encoded = self.embedding_function.encoded
+
+        updated = self.chunks[:3] + [make_chunk("id3-v2", "2020 Kia Seltos listing 3, price dropped")]
+        self.assertEqual(sync_chunks(self.collection, updated),
+                         {"added": 1, "deleted": 2, "unchanged": 3})
+        self.assertEqual(self.embedding_function.encoded, encoded + 1)
+        self.assertEqual(stored_chunk_ids(self.collection, page_size=2), {"id0", "id1", "id2", "id3-v2"})
+        self.assertEqual(self.collection.get(ids=["id0"])["metadatas"][0]["city"], "Unknown")
+
+    def test_precomputed_embeddings_skip_collection_encoder(self):
+        encoder = CountingEmbeddingFunction()
+        stats = sync_chunks(self.collection, self.chunks, batch_size=2,
+                            encode_batches=lambda batches: (encoder(texts) for texts in batches))
+        self.assertEqual(stats["added"], 5)
+        self.assertEqual(encoder.encoded, 5)
+        self.assertEqual(self.embedding_function.encoded, 0)
+        stored = self.collection.get(ids=["id4"], include=["embeddings"])["embeddings"][0]
+        self.assertEqual(list(stored), encoder([self.chunks[4]["text"]])[0])
+
+    def test_insert_error_is_raised(self):
+        def bad_embeddings(batches):
+            for texts in batches:
+                yield [[1.0]] * len(texts)
+        sync_chunks(self.collection, self.chunks[:1])
+        with self.assertRaises(Exception):
+            sync_chunks(self.collection, self.chunks, batch_size=1, encode_batches=bad_embeddings)
+
+if __name__ == '__main__':
+    unittest.main()
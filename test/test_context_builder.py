@@ -0,0 +1,82 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import unittest
+from context_builder import build_context, estimate_tokens, group_by_listing, split_chunk_text
+from llm_rag import format_context_for_llm
+
+KIA_TEXT = (
+    "CAR: 2020 Kia Seltos HTX 1.5 Diesel\nPRICE: ₹ 12.5 Lakh\nDETAILS:\n  City: Delhi\n  Fuel Type: Diesel\n"
+    "  Kms Driven: 50,745 Kms\n  Colour: Maroon\n  Manufacturing Year: 2020\n"
+    "SELLER REMARKS: Remarks by seller\nExcellent Condition, Certified Car"
+)
+KIA_REST = "CAR: 2020 Kia Seltos HTX 1.5 Diesel\nSingle Owner, Alloy Wheels\nURL: https://example.com/kia"
+
+def make_context(chunk_id, content, car_name="2020 Kia Seltos HTX 1.5 Diesel", url="https://example.com/kia"):
+    return {
+        "chunk_id": chunk_id, "content": content, "car_name": car_name, "price": "₹ 12.5 Lakh",
+        "city": "Delhi", "fuel_type": "Diesel", "manufacturing_year": "2020", "url": url, "similarity": None
+    }
+
+class TestContextBuilder(unittest.TestCase):
+
+    def test_split_chunk_text_drops_header_fields(self):
+        details, remarks = split_chunk_text(KIA_TEXT)
+        self.assertEqual(details, ["Kms Driven: 50,745 Kms", "Colour: Maroon"])
+        self.assertEqual(remarks, ["Excellent Condition, Certified Car"])
+
+    def test_chunks_of_one_listing_are_merged(self):
+        contexts = [
+            make_context("c1", KIA_TEXT),
+            make_context("h1", "CAR: 2019 Honda City\nPRICE: ₹ 7 Lakh", car_name="2019 Honda City",
+                         url="https://example.com/honda"),
+            make_context("c2", KIA_REST),
+        ]
+        listings = group_by_listing(contexts)
+        self.assertEqual([l["context"]["chunk_id"] for l in listings], ["c1", "h1"])
+        self.assertEqual(listings[0]["remarks"], ["Excellent Condition, Certified Car", "Single Owner, Alloy Wheels"])
+
+        formatted = build_context(contexts, token_budget=None)
+        self.assertEqual(formatted.count("[CAR "), 2)
+        self.assertIn("[CAR 2] 2019 Honda City", formatted)
+        self.assertIn("Details: Kms Driven: 50,745 Kms; Colour: Maroon\n", formatted)
+        self.assertIn("Seller Remarks: Excellent Condition, Certified Car Single Owner, Alloy Wheels\n", formatted)
+        self.assertNotIn("City: Delhi", formatted)
+        self.assertNotIn("Remarks by seller", formatted)
+
+    def test_budget_keeps_headers_before_details(self):
+        contexts = [make_context(f"c{i}", KIA_TEXT, car_name=f"Car {i}", url=f"https://example.com/{i}")
+                    for i in range(5)]
+        unlimited = build_context(contexts, token_budget=None)
+        limited = build_context(contexts, token_budget=estimate_tokens(unlimited) - 20)
+
+        self.assertLessEqual(estimate_tokens(limited), estimate_tokens(unlimited) - 20)
+        self.assertEqual(limited.count("[CAR "), 5)
+        self.assertLess(limited.count("Seller Remarks"), 5)
+        self.assertIn("Seller Remarks", limited.split("[CAR 2]")[0])
+
+        tiny = build_context(contexts, token_budget=10)
+        self.assertEqual(tiny.count("[CAR "), 1)
+
+    def test_format_context_layouts(self):
+        contexts = [make_context("c1", KIA_TEXT)]
+        full = format_context_for_llm(contexts, layout="full")
+        compact = format_context_for_llm(contexts)
+        self.assertIn("Details: " + KIA_TEXT, full)
+        self.assertLess(estimate_tokens(compact), estimate_tokens(full))
+        self.assertEqual(format_context_for_llm([]), "No relevant car information found.")
+        with self.assertRaises(ValueError):
+            format_context_for_llm(contexts, layout="wide")
+
+    def test_relaxed_listings_are_marked(self):
+        relaxed = dict(make_context("c2", KIA_REST, url="https://example.com/other"),
+                       relaxed_filters=["city", "fuel_type"])
+        contexts = [make_context("c1", KIA_TEXT), relaxed]
+        note = "Note: does not match the requested city, fuel type\n"
+        for layout in ("compact", "full"):
+            formatted = format_context_for_llm(contexts, layout=layout)
+            self.assertEqual(formatted.count(note), 1)
+            self.assertIn(note, formatted.split("[CAR 2]")[1])
+
+if __name__ == '__main__':
+    unittest.main()
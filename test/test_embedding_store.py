@@ -0,0 +1,77 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+from embedding_store import ChunkEncoder, main, peak_memory_mb
+from jsonl_io import write_jsonl
+from lexical_index import LEXICAL_INDEX_FILENAME, BM25Index
+from query_planner import FIELD_STATS_FILENAME, FieldStats
+
+class FakeEmbeddingFunction:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, input):
+        self.calls += 1
+        return [[float(len(text)), 1.0, 0.5] for text in input]
+
+    def name(self):
+        return "fake"
+
+class TestEmbeddingStore(unittest.TestCase):
+
+    def test_encoder_preserves_batch_order(self):
+        encoder = ChunkEncoder(workers=1, embedding_function=FakeEmbeddingFunction())
+        batches = list(encoder.encode_batches([["a", "bbb"], ["cc"]]))
+        self.assertEqual([batch[:, 0].tolist() for batch in batches], [[1.0, 3.0], [2.0]])
+
+    def test_main_ingests_and_rerun_is_a_no_op(self):
+        chunks = [{"chunk_id": f"c{i}", "chunk_index": 0, "text": f"2019 Honda City listing {i}",
+                   "metadata": {"car_name": "2019 Honda City", "url": f"https://example.com/{i}"}}
+                  for i in range(7)]
+        embedding_function = FakeEmbeddingFunction()
+        with tempfile.TemporaryDirectory() as tmp:
+            chunks_path = os.path.join(tmp, "chunks.jsonl")
+            write_jsonl(chunks + chunks[:2], chunks_path)
+            db_path = os.path.join(tmp, "db")
+            with patch("embedding_store.load_embedding_function", return_value=embedding_function):
+                main(["--chunks", chunks_path, "--db-path", db_path, "--batch-size", "3"])
+                self.assertEqual(embedding_function.calls, 3)
+                main(["--chunks", chunks_path, "--db-path", db_path, "--batch-size", "3"])
+                self.assertEqual(embedding_function.calls, 3)
+            self.assertEqual(len(BM25Index.load(os.path.join(db_path, LEXICAL_INDEX_FILENAME))), 7)
+            field_stats = FieldStats.load(os.path.join(db_path, FIELD_STATS_FILENAME))
+            self.assertEqual(field_stats.total, 7)
+            self.assertEqual(field_stats.estimate({"car_name": "2019 Honda City"}), 7)
+
+    def test_workers_leave_the_model_out_of_the_main_process(self):
+        chunks = [{"chunk_id": f"c{i}", "chunk_index": 0, "text": f"2019 Honda City listing {i}",
+                   "metadata": {"car_name": "2019 Honda City", "price": "₹ 8 Lakh", "city": "Delhi",
+                                "fuel_type": "Petrol", "manufacturing_year": "2019",
+                                "url": f"https://example.com/{i}"}}
+                  for i in range(4)]
+        load = MagicMock(return_value=FakeEmbeddingFunction())
+        # Stands in for the worker pool, which loads its own copies of the model
+        in_process_encoder = lambda model, workers, embedding_function: ChunkEncoder(
+            workers=1, embedding_function=FakeEmbeddingFunction())
+        with tempfile.TemporaryDirectory() as tmp:
+            chunks_path = os.path.join(tmp, "chunks.jsonl")
+            write_jsonl(chunks, chunks_path)
+            args = ["--chunks", chunks_path, "--db-path", os.path.join(tmp, "db"), "--workers", "2"]
+            with patch("embedding_store.load_embedding_function", load), \
+                    patch("embedding_store.ChunkEncoder", side_effect=in_process_encoder):
+                main(args)
+                load.assert_not_called()
+                # Embedding a query text still loads it, once
+                main(args + ["--sample-query", "Honda City"])
+                load.assert_called_once_with("all-MiniLM-L6-v2")
+
+    def test_peak_memory_without_resource_module(self):
+        # As on Windows, where resource does not exist
+        with patch.dict(sys.modules, {"resource": None, "psutil": None}):
+            self.assertEqual(peak_memory_mb(), (None, None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import sqlite3
+import tempfile
+import unittest
+from eval_store import EvalStore
+
+class TestEvalStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "responses.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_records_survive_reopening(self):
+        with EvalStore(self.path) as store:
+            store.put("What is the price of Kia Seltos?", ["abc", "def"], "PROMPT", "It costs 12.5 Lakh.")
+            self.assertEqual(len(store), 1)
+
+        with EvalStore(self.path) as store:
+            record = store.get("What is the price of Kia Seltos?")
+            self.assertIn("What is the price of Kia Seltos?", store)
+            self.assertNotIn("What is the fuel type of Kia Seltos?", store)
+            self.assertIsNone(store.get("What is the fuel type of Kia Seltos?"))
+        self.assertEqual(record["chunk_ids"], ["abc", "def"])
+        self.assertEqual(record["prompt"], "PROMPT")
+        self.assertEqual(record["response"], "It costs 12.5 Lakh.")
+
+    def test_put_replaces_previous_answer(self):
+        with EvalStore(self.path) as store:
+            store.put("q", ["a"], "old prompt", "old answer")
+            store.put("q", [], None, "new answer")
+            self.assertEqual(len(store), 1)
+            self.assertEqual(store.get("q")["response"], "new answer")
+            self.assertEqual(store.get("q")["chunk_ids"], [])
+
+    def test_records_are_kept_per_version(self):
+        with EvalStore(self.path, version="2:compact|cars:10:aaa") as store:
+            store.put("q", ["a"], "prompt", "answer over the old collection")
+        with EvalStore(self.path, version="2:compact|cars:10:bbb") as store:
+            self.assertIsNone(store.get("q"))
+            self.assertEqual(len(store), 0)
+            store.put("q", ["b"], "prompt", "answer over the new collection")
+
+        # Without a version the latest recorded run is replayed
+        with EvalStore(self.path) as store:
+            self.assertEqual(store.version, "2:compact|cars:10:bbb")
+            self.assertEqual(store.get("q")["response"], "answer over the new collection")
+
+    def test_unversioned_records_are_set_aside(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE responses (question TEXT PRIMARY KEY, chunk_ids TEXT NOT NULL, prompt TEXT, "
+                     "response TEXT NOT NULL, recorded_at REAL NOT NULL)")
+        conn.execute("INSERT INTO responses VALUES ('q', '[]', NULL, 'stale answer', 0)")
+        conn.commit()
+        conn.close()
+
+        with EvalStore(self.path) as store:
+            self.assertNotIn("q", store)
+            self.assertEqual(store.version, "")
+
+if __name__ == '__main__':
+    unittest.main()
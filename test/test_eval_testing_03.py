@@ -4,7 +4,9 @@ import json
 import os
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
-from eval_testing_03 import generate_questions, extract_relevant_info, evaluate_metrics, save_results_batch
+from eval_testing_03 import (generate_questions, extract_relevant_info, evaluate_metrics, save_results_batch,
+                             get_chatbot_response, MetricEvaluator)
+from llm_rag import NO_CONTEXT_ANSWER
 
 class TestEvalTesting03(unittest.TestCase):
 
@@ -31,20 +33,49 @@ class TestEvalTesting03(unittest.TestCase):
         extracted = extract_relevant_info(question, response)
         self.assertEqual(extracted, response)
 
-    @patch('eval_testing_03.bert_score')
     @patch('eval_testing_03.meteor_score')
     @patch('eval_testing_03.rouge_scorer.RougeScorer')
-    def test_evaluate_metrics(self, mock_rouge_scorer, mock_meteor_score, mock_bert_score):
-        mock_bert_score.return_value = (None, None, [0.8])
+    def test_evaluate_metrics(self, mock_rouge_scorer, mock_meteor_score):
+        mock_bert_scorer = MagicMock()
+        mock_bert_scorer.score.return_value = (None, None, MagicMock(tolist=lambda: [0.8]))
         mock_meteor_score.return_value = 0.7
         mock_rouge_scorer.return_value.score.return_value = {'rouge1': MagicMock(fmeasure=0.6)}
 
-        bert, meteor, rouge, f1 = evaluate_metrics("ground truth", "generated text")
+        evaluator = MetricEvaluator(bert_scorer=mock_bert_scorer)
+        bert, meteor, rouge, f1 = evaluate_metrics("ground truth", "generated text", evaluator=evaluator)
         self.assertEqual(bert, 0.8)
         self.assertEqual(meteor, 0.7)
         self.assertEqual(rouge, 0.6)
         self.assertIsInstance(f1, float)
 
+    @patch('eval_testing_03.meteor_score')
+    def test_metric_evaluator_scores_batches_with_one_model(self, mock_meteor_score):
+        mock_bert_scorer = MagicMock()
+        mock_bert_scorer.score.return_value = (None, None, MagicMock(tolist=lambda: [0.9, 0.4]))
+        mock_meteor_score.return_value = 0.5
+        evaluator = MetricEvaluator(bert_scorer=mock_bert_scorer)
+
+        scores = evaluator.score_batch(["the red car", "a blue car"], ["the red car", "green bike"])
+        mock_bert_scorer.score.assert_called_once_with(["the red car", "green bike"],
+                                                                    ["the red car", "a blue car"])
+        self.assertEqual([s["bert_score"] for s in scores], [0.9, 0.4])
+        self.assertEqual([s["f1_score"] for s in scores], [1.0, 0.0])
+        self.assertEqual(evaluator.pairs_scored, 2)
+        self.assertEqual(set(evaluator.timing_summary()), {"bert_score", "meteor_score", "rouge_score", "f1_score"})
+
+    @patch('eval_testing_03.car_rag_pipeline')
+    def test_only_real_answers_are_recorded(self, mock_pipeline):
+        store = MagicMock()
+        store.get.return_value = None
+        for response in (NO_CONTEXT_ANSWER, "Error generating response: timeout"):
+            mock_pipeline.return_value = response
+            self.assertEqual(get_chatbot_response("q", store, MagicMock(), "partial"), response)
+        store.put.assert_not_called()
+
+        mock_pipeline.return_value = "It costs 12.5 Lakh."
+        get_chatbot_response("q", store, MagicMock(), "partial")
+        store.put.assert_called_once()
+
     @patch('builtins.open', new_callable=mock_open)
     @patch('json.dump')
     def test_save_results_batch(self, mock_json_dump, mock_file):
@@ -0,0 +1,59 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import unittest
+from filter_extractor import FilterExtractor
+
+CARS = [
+    {"car_name": "2020 Kia Seltos HTX 1.5 Diesel",
+     "details": {"fuel_type": "Diesel", "city": "Delhi", "colour": "Maroon"}},
+    {"car_name": "2018 Honda City ZX CVT Petrol",
+     "details": {"fuel_type": "Petrol", "city": "Delhi", "colour": "White"}},
+    {"car_name": "2022 Toyota Fortuner 4X2 AT",
+     "details": {"fuel_type": "Diesel", "city": "Delhi", "colour": "Pearl White"}},
+    {"car_name": "2023 Toyota Innova Hycross VX",
+     "details": {"fuel_type": "Hybrid (Electric + Petrol)", "city": "Delhi", "colour": "Silver"}},
+    {"car_name": "2019 Maruti Suzuki Wagon R VXi (O) 1.2 AMT",
+     "details": {"fuel_type": "Petrol + CNG", "city": "Delhi", "colour": "Others"}},
+]
+
+class TestFilterExtractor(unittest.TestCase):
+
+    def setUp(self):
+        self.extractor = FilterExtractor.from_listings(CARS)
+
+    def test_extracts_all_fields_in_one_pass(self):
+        found = self.extractor.extract("Pearl White 2022 Toyota Fortuner diesel in Delhi")
+        self.assertEqual(found, {"colour": "Pearl White", "manufacturing_year": "2022", "brand": "Toyota",
+                                 "model": "Fortuner", "fuel_type": ("Diesel",), "city": "Delhi"})
+
+    def test_model_implies_brand_and_variant_needs_model(self):
+        self.assertEqual(self.extractor.extract("Seltos HTX 1.5 Diesel"),
+                         {"brand": "Kia", "model": "Seltos", "variant": "HTX 1.5 Diesel", "fuel_type": ("Diesel",)})
+
+    def test_variant_does_not_swallow_fuel_or_city(self):
+        found = self.extractor.extract("diesel Kia Seltos HTX 1.5 Diesel in Delhi")
+        self.assertEqual(found["variant"], "HTX 1.5 Diesel")
+        self.assertEqual(found["fuel_type"], ("Diesel",))
+        self.assertEqual(found["city"], "Delhi")
+
+    def test_brand_alias(self):
+        self.assertEqual(self.extractor.extract("maruti wagon")["brand"], "Maruti Suzuki")
+
+    def test_ambiguous_model_needs_brand(self):
+        self.assertNotIn("model", self.extractor.extract("cars in the city"))
+        self.assertEqual(self.extractor.extract("Honda City")["model"], "City")
+
+    def test_where_clause(self):
+        self.assertEqual(self.extractor.where_for("diesel cars"), {"fuel_type": "Diesel"})
+        self.assertEqual(self.extractor.where_for("petrol or cng"),
+                         {"fuel_type": "Petrol"})
+        self.assertEqual(self.extractor.where_for("cng cars"), {"fuel_type": "Petrol + CNG"})
+        self.assertIsNone(self.extractor.where_for("cheap cars"))
+
+    def test_default_vocabulary(self):
+        where = FilterExtractor.default().where_for("Honda Civic 2022 in Delhi")
+        self.assertEqual(where, {"$and": [{"brand": "Honda"}, {"city": "Delhi"}, {"manufacturing_year": "2022"}]})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import asyncio
+import json
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from http_scraper import HttpScraper, element_text, parse_car_page, scrape_car_listing_http
+from lxml import html
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'cartrade')
+
+ROUTES = {
+    "/second-hand/delhi/page-1/": "listing_page_1.html",
+    "/second-hand/delhi/page-2/": "listing_page_empty.html",
+    "/second-hand/delhi/kia-seltos/17zwpi7h/": "car_kia_seltos.html",
+    "/second-hand/delhi/honda-city/29xkq1a/": "car_honda_city.html",
+}
+
+# The Honda page answers 503 once to exercise the retry path
+FLAKY_PATHS = {"/second-hand/delhi/honda-city/29xkq1a/"}
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves the saved CarTrade pages, standing in for the real site"""
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        self.server.requests.append(path)
+        if path in self.server.flaky:
+            self.server.flaky.discard(path)
+            self.send_error(503)
+            return
+        if path not in ROUTES:
+            self.send_error(404)
+            return
+        with open(os.path.join(FIXTURES_DIR, ROUTES[path]), encoding='utf-8') as f:
+            body = f.read().replace("{host}", f"127.0.0.1:{self.server.server_port}").encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+EXPECTED_CARS = [
+    {
+        "price": "₹ 12.5 Lakh",
+        "car_name": "2020 Kia Seltos HTX 1.5 Diesel",
+        "details": {"city": "Delhi", "fuel_type": "Diesel", "kms_driven": "50,745 Kms", "number_of_owners": "Third"},
+        "seller_remarks": "Remarks by seller\nExcellent Condition, Certified Car, Less Driven, "
+                          "Single Owner & Warranty Available",
+        "url": "{base}/second-hand/delhi/kia-seltos/17zwpi7h/?dc=0",
+    },
+    {
+        "price": "₹ 9.75 Lakh",
+        "car_name": "2018 Honda City ZX CVT Petrol",
+        "details": {"fuel_type": "Petrol", "colour": "White"},
+        "seller_remarks": None,
+        "url": "{base}/second-hand/delhi/honda-city/29xkq1a/",
+    },
+]
+
+class TestHttpScraper(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+        self.server.requests = []
+        self.server.flaky = set(FLAKY_PATHS)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        self.expected = [dict(car, url=car["url"].format(base=self.base)) for car in EXPECTED_CARS]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_element_text_matches_rendered_text(self):
+        tree = html.fromstring("<div>Remarks<p>Good   car,\n  <b>single</b> owner<br>Delhi</p><script>x</script></div>")
+        self.assertEqual(element_text(tree), "Remarks\nGood car, single owner\nDelhi")
+
+    def test_parse_car_page_with_missing_fields(self):
+        car = parse_car_page("<html><body><p>Listing removed</p></body></html>", "https://example.com/car")
+        self.assertEqual(car, {"price": None, "car_name": None, "details": {}, "seller_remarks": None,
+                               "url": "https://example.com/car"})
+
+    def test_scrape_against_fixture_server(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = os.path.join(tmp, "cars.json")
+            cars = scrape_car_listing_http(
+                start_page=1, max_pages=10, output_path=output_path, resume=False,
+                records_path=os.path.join(tmp, "cars.jsonl"), pages_per_batch=4,
+                max_concurrent_requests=4, page_url_template=self.base + "/second-hand/delhi/page-{page}/"
+            )
+            with open(output_path, encoding='utf-8') as f:
+                saved = json.load(f)
+        self.assertEqual(cars, self.expected)
+        self.assertEqual(saved, self.expected)
+        # The removed listing 404s once and is skipped; the 503 is retried
+        self.assertEqual(self.server.requests.count("/second-hand/delhi/missing-car/404/"), 1)
+        self.assertEqual(self.server.requests.count("/second-hand/delhi/honda-city/29xkq1a/"), 2)
+
+    def test_stops_at_first_empty_page(self):
+        scraper = HttpScraper(pages_per_batch=1, retries=0,
+                              page_url_template=self.base + "/second-hand/delhi/page-{page}/")
+        self.server.flaky.clear()
+        cars = asyncio.run(scraper.scrape(start_page=1, max_pages=10))
+        self.assertEqual([car["car_name"] for car in cars], [car["car_name"] for car in self.expected])
+        self.assertNotIn("/second-hand/delhi/page-3/", self.server.requests)
+        self.assertEqual(scraper.stats["failed"], 1)
+
+    def test_resume_only_retries_unfinished_work(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            kwargs = dict(start_page=1, max_pages=10, output_path=os.path.join(tmp, "cars.json"),
+                          records_path=os.path.join(tmp, "cars.jsonl"), retries=0, pages_per_batch=1,
+                          page_url_template=self.base + "/second-hand/delhi/page-{page}/")
+            self.server.flaky.clear()
+            scrape_car_listing_http(resume=False, **kwargs)
+            self.server.requests.clear()
+
+            # Page 1 stays open because of the removed listing, so only it and that car are fetched again
+            cars = scrape_car_listing_http(resume=True, **kwargs)
+        self.assertEqual(cars, self.expected)
+        self.assertEqual(sorted(self.server.requests), ["/second-hand/delhi/missing-car/404/",
+                                                        "/second-hand/delhi/page-1/",
+                                                        "/second-hand/delhi/page-2/"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import json
+import subprocess
+import unittest
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), '..', 'src')
+
+# Seconds a fresh interpreter may spend importing each module
+IMPORT_BUDGET_SECONDS = 1.0
+
+# Dependencies that take seconds to import and must only load when used
+HEAVY_MODULES = ["chromadb", "google.generativeai", "bert_score", "nltk", "rouge_score.rouge_scorer", "sklearn",
+                 "torch", "sentence_transformers"]
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+loaded = [name for name in {heavy!r} if name in sys.modules and type(sys.modules[name]).__name__ != "_LazyModule"]
+print(json.dumps({{"seconds": seconds, "loaded": loaded}}))
+"""
+
+def measure_import(module):
+    """Import a module in a fresh interpreter; returns its import time and the heavy modules it loaded"""
+    output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT.format(module=module, heavy=HEAVY_MODULES)],
+                            cwd=SRC_DIR, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+class TestImportTime(unittest.TestCase):
+
+    def assert_fast_import(self, module):
+        result = measure_import(module)
+        self.assertEqual(result["loaded"], [])
+        self.assertLess(result["seconds"], IMPORT_BUDGET_SECONDS)
+
+    def test_llm_rag(self):
+        self.assert_fast_import("llm_rag")
+
+    def test_eval_testing_03(self):
+        self.assert_fast_import("eval_testing_03")
+
+    def test_embedding_store(self):
+        self.assert_fast_import("embedding_store")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import json
+import tempfile
+import unittest
+from jsonl_io import iter_json_records, write_jsonl
+
+RECORDS = [
+    {"car_name": "2020 Kia Seltos HTX 1.5 Diesel", "price": "₹ 12.5 Lakh", "details": {"city": "Delhi"}},
+    {"car_name": "Honda City [ZX], \"CVT\"", "price": None, "details": {}},
+    {"car_name": "x" * 5000, "price": 7, "details": {"nested": [1, {"a": "]"}]}},
+]
+
+class TestJsonlIO(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_json_array_small_reads(self):
+        with open(self.path("cars.json"), "w", encoding="utf-8") as f:
+            json.dump(RECORDS, f, ensure_ascii=False, indent=2)
+        self.assertEqual(list(iter_json_records(self.path("cars.json"), read_size=7)), RECORDS)
+
+    def test_jsonl_round_trip(self):
+        self.assertEqual(write_jsonl(iter(RECORDS), self.path("cars.jsonl")), 3)
+        self.assertEqual(list(iter_json_records(self.path("cars.jsonl"))), RECORDS)
+
+    def test_empty_array_and_bare_numbers(self):
+        with open(self.path("empty.json"), "w") as f:
+            f.write(" [ ] ")
+        self.assertEqual(list(iter_json_records(self.path("empty.json"))), [])
+        with open(self.path("numbers.json"), "w") as f:
+            f.write("[12345, 678]")
+        self.assertEqual(list(iter_json_records(self.path("numbers.json"), read_size=3)), [12345, 678])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import tempfile
+import unittest
+from lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+TEXTS = {
+    "a": "CAR: 2020 Kia Seltos HTX 1.5 Diesel\nRto Location: HR",
+    "b": "CAR: 2019 Kia Seltos HTK Plus 1.5\nRto Location: DL",
+    "c": "CAR: 2019 Maruti Suzuki Wagon R VXi (O) 1.2 AMT\nRto Location: DL",
+    "d": "CAR: 2018 Honda City ZX CVT Petrol\nRto Location: UP",
+}
+
+class TestBM25Index(unittest.TestCase):
+
+    def setUp(self):
+        self.index = BM25Index.build(list(TEXTS), list(TEXTS.values()))
+
+    def test_tokenize_keeps_variant_tokens(self):
+        self.assertEqual(tokenize("Seltos HTX 1.5, VXi AMT"), ["seltos", "htx", "1.5", "vxi", "amt"])
+
+    def test_exact_variant_ranks_first(self):
+        self.assertEqual(self.index.search("Seltos HTX 1.5")[0][0], "a")
+        self.assertEqual(self.index.search("VXi AMT")[0][0], "c")
+        self.assertEqual(self.index.search("registered in HR")[0][0], "a")
+
+    def test_no_match(self):
+        self.assertEqual(self.index.search("Fortuner"), [])
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "bm25_index.npz")
+            self.index.save(path)
+            loaded = BM25Index.load(path)
+        self.assertEqual(len(loaded), 4)
+        self.assertEqual(loaded.search("Seltos HTX 1.5"), self.index.search("Seltos HTX 1.5"))
+
+    def test_reciprocal_rank_fusion(self):
+        fused = reciprocal_rank_fusion([["x", "y", "z"], ["z", "w"]])
+        self.assertEqual(fused[0], "z")
+        self.assertEqual(set(fused), {"x", "y", "z", "w"})
+
+if __name__ == '__main__':
+    unittest.main()
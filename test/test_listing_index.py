@@ -0,0 +1,128 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import unittest
+from car_fields import parse_price_rupees, split_car_name
+from listing_index import ListingIndex, format_analytical_result, parse_analytical_query
+
+def make_car(name, price, kms, fuel, owners="First", url=None):
+    year = name.split()[0]
+    return {
+        "car_name": name,
+        "price": price,
+        "details": {
+            "city": "Delhi",
+            "fuel_type": fuel,
+            "kms_driven": kms,
+            "number_of_owners": owners,
+            "manufacturing_year": year,
+        },
+        "seller_remarks": None,
+        "url": url or f"https://example.com/{name.replace(' ', '-').lower()}",
+    }
+
+CARS = [
+    make_car("2019 Hyundai Creta 1.6 SX", "₹ 10.25 Lakh", "45,000 Kms", "Diesel"),
+    make_car("2019 Hyundai Creta 1.6 SX (O)", "₹ 10.75 Lakh", "72,781 Kms", "Diesel", owners="Second"),
+    make_car("2019 Hyundai Creta 1.6 E Plus", "₹ 8.5 Lakh", "30,000 Kms", "Petrol"),
+    make_car("2016 Honda City VX", "₹ 5.5 Lakh", "48,000 Kms", "Petrol"),
+    make_car("2014 Honda Brio VX MT", "₹ 2.75 Lakh", "60,000 Kms", "Petrol"),
+    make_car("2022 Maruti Suzuki Swift VXi", "₹ 6.1 Lakh", "12,000 Kms", "Petrol"),
+    make_car("2023 BMW X5 xDrive40i", "₹ 1.05 Crore", "9,000 Kms", "Petrol"),
+]
+
+class TestCarFields(unittest.TestCase):
+
+    def test_split_car_name(self):
+        self.assertEqual(split_car_name("2020 Kia Seltos HTX 1.5 Diesel"),
+                         {"year": "2020", "brand": "Kia", "model": "Seltos", "variant": "HTX 1.5 Diesel"})
+        parts = split_car_name("2022 Maruti Suzuki Wagon R VXi")
+        self.assertEqual((parts["brand"], parts["model"]), ("Maruti Suzuki", "Wagon"))
+
+    def test_parse_price_rupees(self):
+        self.assertEqual(parse_price_rupees("₹ 12.5 Lakh"), 1250000)
+        self.assertEqual(parse_price_rupees("₹ 1.05 Crore"), 10500000)
+        self.assertIsNone(parse_price_rupees(None))
+
+class TestListingIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = ListingIndex(CARS + [CARS[0]])  # duplicate URL is ignored
+
+    def test_plain_lookup_is_not_analytical(self):
+        self.assertIsNone(parse_analytical_query("What is the price of 2020 Kia Seltos?"))
+
+    def test_attribute_counts_are_lookups(self):
+        self.assertIsNone(parse_analytical_query("How many owners does the 2020 Kia Seltos HTX have?"))
+        self.assertIsNone(parse_analytical_query("What is the number of owners of the 2020 Kia Seltos HTX?"))
+        self.assertEqual(parse_analytical_query("How many diesel Hyundai cars are there?")["operation"], "count")
+
+    def test_average_with_filters(self):
+        result = self.index.answer(parse_analytical_query("average price of 2019 diesel Creta"))
+        self.assertEqual(result["matched"], 2)
+        self.assertAlmostEqual(result["value"], 1050000)
+
+    def test_cheapest_with_kms_limit(self):
+        result = self.index.answer(parse_analytical_query("cheapest Honda under 50,000 km"))
+        self.assertEqual(result["matched"], 1)
+        self.assertEqual(result["listings"][0]["car_name"], "2016 Honda City VX")
+
+    def test_number_in_range_is_not_a_year(self):
+        spec = parse_analytical_query("cheapest car under 2000 km")
+        self.assertIsNone(spec["year"])
+        self.assertEqual(spec["ranges"], [("kms_driven", "max", 2000.0)])
+        self.assertEqual(parse_analytical_query("how many 2019 cars under 9 lakh")["year"], "2019")
+
+    def test_bare_numbers_need_price_context(self):
+        self.assertIsNone(parse_analytical_query("cheapest car with more than 2 owners"))
+        self.assertIsNone(parse_analytical_query("cheapest car under 5"))
+        self.assertEqual(parse_analytical_query("cheapest car priced under 5")["ranges"], [("price", "max", 500000.0)])
+        self.assertEqual(parse_analytical_query("cheapest car under rs 5,00,000")["ranges"],
+                         [("price", "max", 500000.0)])
+
+    def test_year_comparators_are_ranges(self):
+        spec = parse_analytical_query("cheapest car newer than 2018")
+        self.assertIsNone(spec["year"])
+        self.assertEqual(spec["ranges"], [("year", "min", 2019.0)])
+        self.assertEqual(parse_analytical_query("how many cars from 2016 or older")["ranges"],
+                         [("year", "max", 2016.0)])
+        result = self.index.answer(parse_analytical_query("cheapest Honda before 2016"))
+        self.assertEqual(result["listings"][0]["car_name"], "2014 Honda Brio VX MT")
+        self.assertEqual(result["filters"], ["brand = Honda", "manufacturing year <= 2015"])
+
+    def test_unsupported_constraints_fall_back_to_retrieval(self):
+        for query in ("cheapest automatic car", "most expensive SUV", "how many cars with 2 owners",
+                      "average price of red cars"):
+            self.assertIsNone(parse_analytical_query(query), query)
+        self.assertIsNotNone(parse_analytical_query("cheapest first owner Honda"))
+
+    def test_unknown_city_falls_back_to_retrieval(self):
+        cities = self.index.city_labels
+        self.assertIsNone(parse_analytical_query("most expensive Honda in Jaipur", cities=cities))
+        self.assertIsNotNone(parse_analytical_query("most expensive Honda in Delhi", cities=cities))
+        self.assertIsNotNone(parse_analytical_query("cheapest Honda in good condition", cities=cities))
+
+    def test_ambiguous_model_needs_its_brand(self):
+        result = self.index.answer(parse_analytical_query("What is the average price of cars in the city?"))
+        self.assertEqual(result["filters"], [])
+        self.assertEqual(result["matched"], 7)
+        result = self.index.answer(parse_analytical_query("What is the average price of a Honda City?"))
+        self.assertEqual(result["filters"], ["brand = Honda", "model = City"])
+        self.assertEqual(result["matched"], 1)
+
+    def test_count_and_price_range(self):
+        result = self.index.answer(parse_analytical_query("how many cars under 9 lakh?"))
+        self.assertEqual(result["matched"], 4)
+
+    def test_most_expensive(self):
+        result = self.index.answer(parse_analytical_query("most expensive car"))
+        self.assertEqual(result["listings"][0]["car_name"], "2023 BMW X5 xDrive40i")
+
+    def test_format_analytical_result(self):
+        spec = parse_analytical_query("average price of 2019 diesel Creta")
+        text = format_analytical_result(self.index.answer(spec), self.index.size)
+        self.assertIn("Matching listings: 2", text)
+        self.assertIn("₹10.50 Lakh", text)
+
+if __name__ == '__main__':
+    unittest.main()
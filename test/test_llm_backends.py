@@ -0,0 +1,113 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import asyncio
+import unittest
+import uuid
+from unittest.mock import MagicMock
+import chromadb
+from llm_backends import GeminiBackend, HttpLLMBackend, LLMBackend, as_backend
+from llm_rag import RAGEngine, car_rag_pipeline, car_rag_pipeline_stream, generate_answer_with_llm
+from llm_standin import standin_answer, start_standin
+
+PROMPT = "RELEVANT CAR LISTINGS:\n\n[CAR 1] 2020 Kia Seltos HTX 1.5 Diesel\nPrice: ₹12.5 Lakh\n"
+
+class LengthEmbeddingFunction:
+    def __call__(self, input):
+        return [[float(len(text)), float(sum(map(ord, text)) % 97), 1.0] for text in input]
+
+    def name(self):
+        return "length"
+
+class TestLLMBackends(unittest.TestCase):
+
+    def setUp(self):
+        self.server = start_standin(port=0, latency_ms=0, jitter_ms=0, tokens_per_second=10000, answer_tokens=12)
+        self.backend = HttpLLMBackend(self.server.url)
+
+    def tearDown(self):
+        self.backend.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_standin_answer_mentions_first_car(self):
+        answer = standin_answer(PROMPT, 12)
+        self.assertTrue(answer.startswith("The best match is the 2020 Kia Seltos HTX 1.5 Diesel."))
+        self.assertEqual(len(answer.split(" ")), 12)
+
+    def test_http_backend_generate_and_stream(self):
+        expected = standin_answer(PROMPT, 12)
+        self.assertEqual(self.backend.generate(PROMPT), expected)
+        fragments = list(self.backend.stream(PROMPT))
+        self.assertEqual("".join(fragments), expected)
+        self.assertEqual(asyncio.run(self.backend.generate_async(PROMPT)), expected)
+        self.assertEqual(self.server.stats, {"requests": 3, "errors": 0})
+
+    def test_async_calls_share_one_client(self):
+        async def ask_twice():
+            first = await self.backend.generate_async(PROMPT)
+            client = self.backend._async_client
+            await asyncio.gather(*(self.backend.generate_async(PROMPT) for _ in range(3)))
+            self.assertIs(self.backend._async_client, client)
+            return first
+
+        self.assertEqual(asyncio.run(ask_twice()), standin_answer(PROMPT, 12))
+        # A later event loop gets its own client, and close() releases it
+        asyncio.run(self.backend.generate_async(PROMPT))
+        self.backend.close()
+        self.assertIsNone(self.backend._async_client)
+        self.assertEqual(self.server.stats, {"requests": 5, "errors": 0})
+
+    def test_backend_must_implement_generate(self):
+        class IncompleteBackend(LLMBackend):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompleteBackend()
+
+    def test_simulated_errors_become_error_answers(self):
+        self.server.error_rate = 1.0
+        answer = generate_answer_with_llm(self.backend, "Which Kia is cheapest?", "context")
+        self.assertTrue(answer.startswith("Error generating response"))
+        self.assertEqual(self.server.stats["errors"], 1)
+
+    def test_bare_gemini_client_is_wrapped(self):
+        client = MagicMock()
+        client.GenerativeModel.return_value.generate_content.return_value.text = "Gemini answer"
+        self.assertIsInstance(as_backend(client), GeminiBackend)
+        self.assertIs(as_backend(self.backend), self.backend)
+        self.assertEqual(generate_answer_with_llm(client, "query", "context"), "Gemini answer")
+        client.GenerativeModel.assert_called_once_with('gemini-2.0-flash')
+
+    def test_default_stream_and_async_fall_back_to_generate(self):
+        class EchoBackend(LLMBackend):
+            def generate(self, prompt):
+                return prompt.upper()
+
+        self.assertEqual(list(EchoBackend().stream("abc")), ["ABC"])
+        self.assertEqual(asyncio.run(EchoBackend().generate_async("abc")), "ABC")
+
+    def test_pipeline_end_to_end_against_standin(self):
+        embedding_function = LengthEmbeddingFunction()
+        collection = chromadb.EphemeralClient().create_collection(
+            name=f"cars_{uuid.uuid4().hex}", embedding_function=embedding_function
+        )
+        collection.add(ids=["c1"], documents=["CAR: 2020 Kia Seltos HTX 1.5 Diesel"], metadatas=[{
+            "car_name": "2020 Kia Seltos HTX 1.5 Diesel", "price": "₹ 12.5 Lakh", "city": "Delhi",
+            "fuel_type": "Diesel", "manufacturing_year": "2020", "url": "https://example.com/kia"
+        }])
+        engine = RAGEngine.from_components(collection, self.backend, embedding_function,
+                                           answer_cache_path=None, listings_path=None)
+
+        trace = {}
+        answer = car_rag_pipeline("Is there a diesel Kia?", engine=engine, trace=trace)
+        self.assertTrue(answer.startswith("The best match is the 2020 Kia Seltos HTX 1.5 Diesel."))
+        self.assertEqual(trace["chunk_ids"], ["c1"])
+        self.assertGreater(trace["retrieval_seconds"], 0)
+        self.assertGreater(trace["generation_seconds"], 0)
+
+        streamed = "".join(car_rag_pipeline_stream("Is there a diesel Kia?", engine=engine))
+        self.assertEqual(streamed, answer)
+
+if __name__ == '__main__':
+    unittest.main()
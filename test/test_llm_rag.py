@@ -1,9 +1,10 @@
 import os
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import asyncio
 import unittest
 from unittest.mock import patch, MagicMock
-from llm_rag import initialize_clients, clean_price, retrieve_context, format_context_for_llm, generate_answer_with_llm, parse_query_for_filters, car_rag_pipeline
+from llm_rag import RAGEngine, initialize_clients, clean_price, retrieve_context, format_context_for_llm, generate_answer_with_llm, parse_query_for_filters, car_rag_pipeline, _answer_query, car_rag_pipeline_many, retrieve_context_batch, car_rag_pipeline_stream
 
 class TestLLMRAG(unittest.TestCase):
 
@@ -25,6 +26,77 @@ class TestLLMRAG(unittest.TestCase):
         contexts = retrieve_context(mock_collection, "test query")
         self.assertEqual(contexts, [])
 
+    def test_retrieve_context_with_embedding_cache(self):
+        mock_collection = MagicMock()
+        mock_collection.query.return_value = {'documents': [[]], 'metadatas': [[]], 'distances': [[]]}
+        mock_cache = MagicMock()
+        mock_cache.get_embedding.return_value = [0.1, 0.2]
+
+        retrieve_context(mock_collection, "test query", embedding_cache=mock_cache)
+
+        mock_cache.get_embedding.assert_called_once_with("test query")
+        _, kwargs = mock_collection.query.call_args
+        self.assertEqual(kwargs["query_embeddings"], [[0.1, 0.2]])
+        self.assertNotIn("query_texts", kwargs)
+
+    def test_retrieve_context_hybrid_fuses_lexical_hits(self):
+        metadata = {"car_name": "", "price": "", "city": "", "fuel_type": "", "manufacturing_year": "", "url": ""}
+        mock_collection = MagicMock()
+        mock_collection.query.return_value = {
+            'ids': [["v1", "v2"]], 'documents': [["doc v1", "doc v2"]],
+            'metadatas': [[metadata, metadata]], 'distances': [[0.1, 0.2]]
+        }
+        mock_collection.get.return_value = {'ids': ["l1"], 'documents': ["doc l1"], 'metadatas': [metadata]}
+        lexical_index = MagicMock()
+        lexical_index.search.return_value = [("l1", 9.0), ("v2", 3.0)]
+
+        contexts = retrieve_context(mock_collection, "Seltos HTX 1.5", n_results=2, lexical_index=lexical_index)
+
+        self.assertEqual([c["chunk_id"] for c in contexts], ["v2", "v1"])
+        mock_collection.get.assert_called_once()
+        self.assertEqual(mock_collection.query.call_args[1]["n_results"], 8)
+
+    def test_retrieve_context_batch_groups_by_filter(self):
+        def fake_query(query_embeddings, n_results, where=None):
+            return {
+                'ids': [[f"id-{e[0]}"] for e in query_embeddings],
+                'documents': [[f"doc-{e[0]}"] for e in query_embeddings],
+                'metadatas': [[{"car_name": f"car-{e[0]}", "price": "", "city": "", "fuel_type": "",
+                                "manufacturing_year": "", "url": ""}] for e in query_embeddings],
+                'distances': [[0.1] for _ in query_embeddings],
+            }
+
+        mock_collection = MagicMock()
+        mock_collection.query.side_effect = fake_query
+        encoder = MagicMock(side_effect=lambda texts: [[i] for i in range(len(texts))])
+        filters_list = [{"city": "Delhi"}, None, {"city": "Delhi"}]
+
+        contexts = retrieve_context_batch(mock_collection, ["q0", "q1", "q2"],
+                                          filters_list=filters_list, embedding_function=encoder)
+
+        encoder.assert_called_once_with(["q0", "q1", "q2"])
+        self.assertEqual(mock_collection.query.call_count, 2)
+        self.assertEqual([c[0]["chunk_id"] for c in contexts], ["id-0", "id-1", "id-2"])
+
+    def test_retrieve_context_batch_falls_back_without_filters(self):
+        metadata = {"car_name": "", "price": "", "city": "", "fuel_type": "", "manufacturing_year": "", "url": ""}
+
+        def fake_query(query_embeddings, n_results, where=None):
+            # The filter matches nothing; without it every query finds one chunk
+            rows = [[] if where else [f"id-{e[0]}"] for e in query_embeddings]
+            return {'ids': rows, 'documents': rows, 'metadatas': [[metadata] * len(r) for r in rows],
+                    'distances': [[0.1] * len(r) for r in rows]}
+
+        mock_collection = MagicMock()
+        mock_collection.query.side_effect = fake_query
+        encoder = MagicMock(side_effect=lambda texts: [[i] for i in range(len(texts))])
+
+        contexts = retrieve_context_batch(mock_collection, ["q0", "q1"], filters_list=[{"city": "Agra"}, None],
+                                          embedding_function=encoder)
+
+        self.assertEqual([c[0]["chunk_id"] for c in contexts], ["id-0", "id-1"])
+        self.assertEqual(mock_collection.query.call_count, 3)
+
     def test_format_context_for_llm(self):
         contexts = [
             {
@@ -54,20 +126,149 @@ class TestLLMRAG(unittest.TestCase):
     def test_parse_query_for_filters(self):
         query = "Honda Civic 2022 in Delhi"
         filters = parse_query_for_filters(query)
-        self.assertIn({"car_name": {"$contains": "Honda"}}, filters["$and"])
+        self.assertIn({"brand": "Honda"}, filters["$and"])
         self.assertIn({"city": "Delhi"}, filters["$and"])
         self.assertIn({"manufacturing_year": "2022"}, filters["$and"])
 
+    @patch('llm_rag.load_embedding_function')
     @patch('llm_rag.initialize_clients')
     @patch('llm_rag.retrieve_context')
     @patch('llm_rag.generate_answer_with_llm')
-    def test_car_rag_pipeline(self, mock_generate_answer, mock_retrieve_context, mock_initialize_clients):
+    def test_car_rag_pipeline(self, mock_generate_answer, mock_retrieve_context, mock_initialize_clients,
+                              mock_load_embedding_function):
         mock_initialize_clients.return_value = (MagicMock(), MagicMock())
-        mock_retrieve_context.return_value = [{"content": "Test content"}]
+        mock_retrieve_context.return_value = [{"car_name": "Test Car", "content": "Test content"}]
+        mock_generate_answer.return_value = "Test answer"
+
+        answer = car_rag_pipeline("test query", engine=RAGEngine(answer_cache_path=None))
+        self.assertEqual(answer, "Test answer")
+
+    @patch('llm_rag.retrieve_context')
+    @patch('llm_rag.generate_answer_with_llm')
+    def test_trace_records_chunk_ids_and_prompt(self, mock_generate_answer, mock_retrieve_context):
+        mock_retrieve_context.return_value = [{"chunk_id": "abc", "car_name": "Test Car", "content": "Test content"}]
         mock_generate_answer.return_value = "Test answer"
+        trace = {}
+
+        answer = _answer_query(RAGEngine(answer_cache_path=None), MagicMock(), MagicMock(), "test query", None, trace)
 
-        answer = car_rag_pipeline("test query")
         self.assertEqual(answer, "Test answer")
+        self.assertEqual(trace["chunk_ids"], ["abc"])
+        self.assertIn("USER QUESTION: test query", trace["prompt"])
+        self.assertIn("Test content", trace["prompt"])
+
+    @patch('llm_rag.retrieve_context')
+    @patch('llm_rag.generate_answer_with_llm')
+    def test_answer_cache_hit_skips_llm(self, mock_generate_answer, mock_retrieve_context):
+        mock_retrieve_context.return_value = [{"chunk_id": "abc", "car_name": "Test Car", "content": "Test content"}]
+        engine = RAGEngine(answer_cache_path=None)
+        engine.answer_cache = MagicMock()
+        engine.answer_cache.get.return_value = "Cached answer"
+
+        answer = _answer_query(engine, MagicMock(), MagicMock(), "test query", None)
+
+        self.assertEqual(answer, "Cached answer")
+        mock_generate_answer.assert_not_called()
+
+    @patch('llm_rag.load_embedding_function')
+    @patch('llm_rag.initialize_clients')
+    @patch('llm_rag.retrieve_context')
+    @patch('llm_rag.stream_answer_with_llm')
+    def test_car_rag_pipeline_stream(self, mock_stream_answer, mock_retrieve_context, mock_initialize_clients,
+                                     mock_load_embedding_function):
+        mock_initialize_clients.return_value = (MagicMock(), MagicMock())
+        mock_retrieve_context.return_value = [{"car_name": "Test Car", "content": "Test content"}]
+        mock_stream_answer.return_value = iter(["Test ", "answer"])
+        engine = RAGEngine(answer_cache_path=None)
+
+        fragments = list(car_rag_pipeline_stream("test query", engine=engine))
+
+        self.assertEqual(fragments, ["Test ", "answer"])
+        self.assertIsNotNone(engine.stats()["avg_time_to_first_token_seconds"])
+
+    @patch('llm_rag.retrieve_context')
+    @patch('llm_rag.stream_answer_with_llm')
+    def test_failed_stream_is_not_cached(self, mock_stream_answer, mock_retrieve_context):
+        mock_retrieve_context.return_value = [{"chunk_id": "abc", "car_name": "Test Car", "content": "Test content"}]
+        engine = RAGEngine.from_components(MagicMock(), MagicMock(), MagicMock(), answer_cache_path=None)
+        engine.answer_cache = MagicMock()
+        engine.answer_cache.get.return_value = None
+
+        mock_stream_answer.return_value = iter(["The Seltos ", "Error generating response: timeout"])
+        list(car_rag_pipeline_stream("test query", engine=engine))
+        engine.answer_cache.put.assert_not_called()
+
+        mock_stream_answer.return_value = iter(["The Seltos ", "costs 12.5 Lakh."])
+        list(car_rag_pipeline_stream("test query", engine=engine))
+        engine.answer_cache.put.assert_called_once()
+        self.assertEqual(engine.answer_cache.put.call_args[0][1], "The Seltos costs 12.5 Lakh.")
+
+    @patch('llm_rag.retrieve_context')
+    @patch('llm_rag.generate_answer_with_llm')
+    def test_aggregate_question_uses_listing_index(self, mock_generate_answer, mock_retrieve_context):
+        engine = RAGEngine(answer_cache_path=None)
+        engine.listing_index = MagicMock(size=10)
+        engine.listing_index.answer.return_value = {"operation": "count", "field": "price", "filters": [], "matched": 3}
+        mock_generate_answer.return_value = "There are 3 cars."
+
+        answer = _answer_query(engine, MagicMock(), MagicMock(), "How many Honda cars are there?", None)
+
+        self.assertEqual(answer, "There are 3 cars.")
+        mock_retrieve_context.assert_not_called()
+        self.assertIn("Matching listings: 3", mock_generate_answer.call_args[0][2])
+
+    @patch('llm_rag.load_embedding_function')
+    @patch('llm_rag.initialize_clients')
+    def test_rag_engine_initializes_once(self, mock_initialize_clients, mock_load_embedding_function):
+        mock_initialize_clients.return_value = (MagicMock(), MagicMock())
+        engine = RAGEngine(answer_cache_path=None)
+        self.assertFalse(engine.stats()["loaded"])
+
+        first = engine.clients()
+        second = engine.clients()
+        engine.record_query(0.5)
+
+        mock_initialize_clients.assert_called_once()
+        self.assertIs(first[0], second[0])
+        stats = engine.stats()
+        self.assertTrue(stats["loaded"])
+        self.assertIsNotNone(stats["cold_start_seconds"])
+        self.assertEqual(stats["warm_queries"], 1)
+        self.assertEqual(stats["avg_warm_query_seconds"], 0.5)
+
+    @patch('llm_rag.load_embedding_function')
+    @patch('llm_rag.initialize_clients')
+    def test_rag_engine_missing_collection(self, mock_initialize_clients, mock_load_embedding_function):
+        mock_initialize_clients.return_value = (None, MagicMock())
+        answer = car_rag_pipeline("test query", engine=RAGEngine(answer_cache_path=None))
+        self.assertTrue(answer.startswith("Error initializing clients"))
+
+    @patch('llm_rag.load_embedding_function')
+    @patch('llm_rag.initialize_clients')
+    @patch('llm_rag.retrieve_context')
+    @patch('llm_rag.generate_answer_with_llm_async')
+    def test_car_rag_pipeline_many_respects_llm_limit(self, mock_generate_answer, mock_retrieve_context,
+                                                       mock_initialize_clients, mock_load_embedding_function):
+        mock_initialize_clients.return_value = (MagicMock(), MagicMock())
+        mock_retrieve_context.return_value = [{"car_name": "Test Car", "content": "Test content"}]
+        in_flight = {"now": 0, "max": 0}
+
+        async def fake_generate(client, query, context):
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            await asyncio.sleep(0.01)
+            in_flight["now"] -= 1
+            return f"Answer to {query}"
+
+        mock_generate_answer.side_effect = fake_generate
+        engine = RAGEngine(answer_cache_path=None, max_concurrent_llm_calls=3)
+        queries = [f"question {i}" for i in range(12)]
+
+        answers = asyncio.run(car_rag_pipeline_many(queries, engine=engine))
+
+        self.assertEqual(answers, [f"Answer to {q}" for q in queries])
+        self.assertLessEqual(in_flight["max"], 3)
+        self.assertEqual(engine.stats()["warm_queries"], 12)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,143 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import unittest
+import uuid
+import chromadb
+from lexical_index import BM25Index
+from rag_cache import EmbeddingCache
+from llm_rag import retrieve_context, retrieve_context_batch
+from query_planner import FieldStats, QueryPlanner, combine_clauses, where_clauses, where_matches
+
+CARS = (
+    [("Maruti", "Petrol", "Delhi")] * 30
+    + [("Hyundai", "Petrol", "Mumbai")] * 12
+    + [("Hyundai", "Diesel", "Delhi")] * 4
+    + [("Kia", "Diesel", "Pune")] * 2
+)
+
+class TestQueryPlanner(unittest.TestCase):
+
+    def setUp(self):
+        self.collection = chromadb.EphemeralClient().create_collection(name=f"cars_{uuid.uuid4().hex}")
+        self.metadatas = [{"car_name": f"2020 {brand}", "price": "₹ 5 Lakh", "manufacturing_year": "2020",
+                           "brand": brand, "fuel_type": fuel, "city": city, "url": f"https://example.com/{i}"}
+                          for i, (brand, fuel, city) in enumerate(CARS)]
+        self.collection.add(
+            ids=[f"c{i}" for i in range(len(CARS))],
+            embeddings=[[float(i), 1.0] for i in range(len(CARS))],
+            documents=[f"CAR: {m['brand']} {m['fuel_type']}" for m in self.metadatas],
+            metadatas=self.metadatas
+        )
+        self.stats = FieldStats.from_collection(self.collection)
+        self.planner = QueryPlanner(self.stats, exact_scan_max=8)
+
+    def query(self, where, n_results=5, position=0.0):
+        return self.planner.retrieve(self.collection, {"query_embeddings": [[position, 1.0]]}, n_results, where)
+
+    def test_where_helpers(self):
+        where = {"$and": [{"brand": "Kia"}, {"fuel_type": {"$in": ["Diesel", "CNG"]}}]}
+        self.assertEqual(where_clauses(where), [{"brand": "Kia"}, {"fuel_type": {"$in": ["Diesel", "CNG"]}}])
+        self.assertEqual(combine_clauses(where_clauses(where)), where)
+        self.assertIsNone(combine_clauses([]))
+        self.assertTrue(where_matches(where, {"brand": "Kia", "fuel_type": "Diesel"}))
+        self.assertFalse(where_matches(where, {"brand": "Kia", "fuel_type": "Petrol"}))
+
+    def test_selectivity_estimates(self):
+        self.assertEqual(self.stats.total, 48)
+        self.assertEqual(self.stats.estimate({"brand": "Hyundai"}), 16)
+        self.assertEqual(self.stats.estimate({"fuel_type": {"$in": ["Diesel", "Petrol"]}}), 48)
+        self.assertEqual(self.stats.estimate({"colour": "Red"}), 0)
+        combined = self.stats.estimate({"$and": [{"brand": "Hyundai"}, {"fuel_type": "Diesel"}]})
+        self.assertGreater(combined, 48 * (16 / 48) * (6 / 48))
+        self.assertLessEqual(combined, 6)
+
+    def test_strategy_follows_selectivity(self):
+        self.assertEqual(self.planner.plan({"brand": "Kia"}, 2).steps[0].strategy, "exact")
+        self.assertEqual(self.planner.plan({"brand": "Hyundai"}, 5).steps[0].strategy, "post_filter")
+        self.assertEqual(QueryPlanner(self.stats, exact_scan_max=8, post_filter_min_selectivity=0.5)
+                         .plan({"brand": "Hyundai"}, 5).steps[0].strategy, "prefilter")
+        self.assertEqual(self.planner.plan({"brand": "Kia"}, 2, has_embedding=False).steps[0].strategy, "prefilter")
+
+    def test_exact_scan_ranks_by_distance(self):
+        results, plan = self.query({"brand": "Kia"}, n_results=2, position=46.2)
+        self.assertEqual(results["ids"][0], ["c46", "c47"])
+        self.assertAlmostEqual(results["distances"][0][0], 0.04, places=4)
+        self.assertFalse(plan.relaxed)
+
+    def test_post_filter_returns_only_matches(self):
+        results, plan = self.query({"brand": "Hyundai"}, n_results=5, position=40.0)
+        self.assertEqual(plan.steps[0].strategy, "post_filter")
+        self.assertEqual(len(results["ids"][0]), 5)
+        self.assertTrue(all(m["brand"] == "Hyundai" for m in results["metadatas"][0]))
+
+    def test_narrow_filter_is_relaxed_in_one_call(self):
+        where = {"$and": [{"brand": "Kia"}, {"city": "Delhi"}]}
+        results, plan = self.query(where, n_results=5, position=47.0)
+
+        self.assertTrue(plan.relaxed)
+        self.assertEqual(len(results["ids"][0]), 5)
+        # Both Kia listings (city dropped) come before the unfiltered fill
+        self.assertEqual(results["ids"][0][:2], ["c47", "c46"])
+        self.assertEqual([step.where for step in plan.steps], [where, {"brand": "Kia"}, None])
+        self.assertEqual([step.returned for step in plan.steps], [0, 2, 3])
+        self.assertIn("no filter", plan.describe())
+
+    def test_filter_on_unknown_field_is_dropped_without_querying(self):
+        levels = self.planner.relaxation_levels({"$and": [{"colour": "Red"}, {"brand": "Kia"}]}, 2)
+        self.assertEqual(levels[0][0], {"brand": "Kia"})
+
+    def test_retrieve_context_uses_planner(self):
+        class StubEmbeddingCache:
+            def get_embedding(self, query):
+                return [47.0, 1.0]
+
+        contexts = retrieve_context(self.collection, "Kia in Delhi", n_results=3,
+                                    filters={"$and": [{"brand": "Kia"}, {"city": "Delhi"}]},
+                                    embedding_cache=StubEmbeddingCache(), planner=self.planner)
+        self.assertEqual([ctx["chunk_id"] for ctx in contexts], ["c47", "c46", "c45"])
+        # Rows from the relaxed levels say which requested filters they were found without
+        self.assertEqual([ctx.get("relaxed_filters") for ctx in contexts], [["city"], ["city"], ["brand", "city"]])
+
+    def test_hybrid_fusion_keeps_filter_matches_first(self):
+        class StubEmbeddingCache:
+            def get_embedding(self, query):
+                return [37.0, 1.0]
+
+        documents = [f"CAR: {m['brand']} {m['fuel_type']} in {m['city']}" for m in self.metadatas]
+        self.collection.update(ids=[f"c{i}" for i in range(len(CARS))], documents=documents,
+                               embeddings=[[float(i), 1.0] for i in range(len(CARS))])
+        lexical_index = BM25Index.build([f"c{i}" for i in range(len(CARS))], documents)
+        filters = {"$and": [{"brand": "Hyundai"}, {"fuel_type": "Diesel"}]}
+
+        # The lexical ranking favours the Petrol cars in Mumbai, which the filter excludes
+        contexts = retrieve_context(self.collection, "Hyundai Mumbai", n_results=3, filters=filters,
+                                    embedding_cache=StubEmbeddingCache(), lexical_index=lexical_index,
+                                    planner=self.planner)
+        self.assertEqual(len(contexts), 3)
+        self.assertEqual({ctx["fuel_type"] for ctx in contexts}, {"Diesel"})
+        self.assertEqual({ctx["city"] for ctx in contexts}, {"Delhi"})
+        self.assertFalse(any("relaxed_filters" in ctx for ctx in contexts))
+
+    def test_batch_matches_retrieve_context(self):
+        documents = [f"CAR: {m['brand']} {m['fuel_type']} in {m['city']}" for m in self.metadatas]
+        lexical_index = BM25Index.build([f"c{i}" for i in range(len(CARS))], documents)
+        # Each query names the position its embedding points at
+        embedding_cache = EmbeddingCache(lambda texts: [[float(text.split()[0]), 1.0] for text in texts])
+        queries = ["47 Kia in Delhi", "37 Hyundai Mumbai", "5 Maruti", "20 any colour", "47 Kia again"]
+        filters_list = [{"$and": [{"brand": "Kia"}, {"city": "Delhi"}]},
+                        {"$and": [{"brand": "Hyundai"}, {"fuel_type": "Diesel"}]},
+                        None, {"colour": "Red"}, {"$and": [{"brand": "Kia"}, {"city": "Delhi"}]}]
+
+        for options in ({"planner": self.planner}, {"planner": self.planner, "lexical_index": lexical_index},
+                        {"lexical_index": lexical_index}, {}):
+            batch = retrieve_context_batch(self.collection, queries, n_results=3, filters_list=filters_list,
+                                           embedding_cache=embedding_cache, **options)
+            single = [retrieve_context(self.collection, query, n_results=3, filters=filters,
+                                       embedding_cache=embedding_cache, **options)
+                      for query, filters in zip(queries, filters_list)]
+            self.assertEqual(batch, single, options)
+            self.assertEqual([len(contexts) for contexts in batch], [3] * len(queries))
+
+if __name__ == '__main__':
+    unittest.main()
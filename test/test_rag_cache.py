@@ -0,0 +1,126 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+from rag_cache import AnswerCache, EmbeddingCache, collection_fingerprint, normalize_query
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query("  What is the PRICE of  Kia Seltos? "), "what is the price of kia seltos")
+
+    def test_hit_skips_encoder(self):
+        encoder = MagicMock(side_effect=lambda texts: [[float(len(t))] for t in texts])
+        cache = EmbeddingCache(encoder, max_size=10)
+
+        first = cache.get_embedding("What is the price of Kia Seltos?")
+        second = cache.get_embedding("what is the price of kia seltos")
+
+        self.assertEqual(first, second)
+        # The original text is encoded; only the key is normalized
+        encoder.assert_called_once_with(["What is the price of Kia Seltos?"])
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_lru_eviction(self):
+        encoder = MagicMock(side_effect=lambda texts: [[0.0] for _ in texts])
+        cache = EmbeddingCache(encoder, max_size=2)
+
+        cache.get_embedding("a")
+        cache.get_embedding("b")
+        cache.get_embedding("a")
+        cache.get_embedding("c")  # evicts "b", the least recently used
+        cache.get_embedding("a")
+
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(cache.stats()["size"], 2)
+        self.assertEqual(encoder.call_count, 3)
+
+    def test_batch_encodes_misses_together(self):
+        encoder = MagicMock(side_effect=lambda texts: [[float(len(t))] for t in texts])
+        cache = EmbeddingCache(encoder, max_size=10)
+        cache.get_embedding("kia")
+
+        embeddings = cache.get_embeddings(["honda city", "Kia", "maruti", "HONDA CITY"])
+
+        self.assertEqual(embeddings, [[10.0], [3.0], [6.0], [10.0]])
+        encoder.assert_called_with(["honda city", "maruti"])
+        self.assertEqual(encoder.call_count, 2)
+        self.assertEqual((cache.stats()["hits"], cache.stats()["misses"]), (2, 3))
+
+    @patch('rag_cache.time.monotonic')
+    def test_ttl_expiry(self, mock_monotonic):
+        encoder = MagicMock(side_effect=lambda texts: [[0.0] for _ in texts])
+        cache = EmbeddingCache(encoder, max_size=10, ttl_seconds=60)
+
+        mock_monotonic.return_value = 100.0
+        cache.get_embedding("query")
+        mock_monotonic.return_value = 200.0
+        cache.get_embedding("query")
+
+        self.assertEqual(encoder.call_count, 2)
+        self.assertEqual(cache.stats()["hits"], 0)
+
+class TestAnswerCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "answers.sqlite3")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_key_depends_on_query_chunks_and_version(self):
+        key = AnswerCache.make_key("Price of Kia Seltos?", ["b", "a"], 1)
+        self.assertEqual(key, AnswerCache.make_key("price of kia seltos", ["a", "b"], 1))
+        self.assertNotEqual(key, AnswerCache.make_key("price of kia seltos", ["a", "c"], 1))
+        self.assertNotEqual(key, AnswerCache.make_key("price of kia seltos", ["a", "b"], 2))
+
+    def test_persists_across_instances(self):
+        cache = AnswerCache(self.path)
+        cache.put("key", "The Seltos costs 12.5 Lakh.")
+        cache.close()
+
+        reopened = AnswerCache(self.path)
+        self.assertEqual(reopened.get("key"), "The Seltos costs 12.5 Lakh.")
+        self.assertEqual(reopened.stats()["hits"], 1)
+        reopened.close()
+
+    def test_bounded_size(self):
+        cache = AnswerCache(self.path, max_entries=2)
+        for i in range(5):
+            cache.put(f"key{i}", f"answer {i}")
+        self.assertEqual(cache.stats()["size"], 2)
+        self.assertIsNone(cache.get("key0"))
+        self.assertEqual(cache.get("key4"), "answer 4")
+        cache.close()
+
+    def test_collection_change_invalidates(self):
+        cache = AnswerCache(self.path)
+        cache.validate_collection("car_data_chunks:100")
+        cache.put("key", "answer")
+        cache.validate_collection("car_data_chunks:100")
+        self.assertEqual(cache.get("key"), "answer")
+        cache.validate_collection("car_data_chunks:120")
+        self.assertIsNone(cache.get("key"))
+        cache.close()
+
+    def test_fingerprint_tracks_chunk_ids(self):
+        collection = MagicMock()
+        collection.name = "car_data_chunks"
+        collection.count.return_value = 2
+        collection.get.return_value = {"ids": ["b", "a"]}
+        fingerprint = collection_fingerprint(collection)
+        self.assertTrue(fingerprint.startswith("car_data_chunks:2:"))
+
+        # Same count, one chunk replaced by an edited one
+        collection.get.return_value = {"ids": ["a", "c"]}
+        self.assertNotEqual(collection_fingerprint(collection), fingerprint)
+        collection.get.return_value = {"ids": ["a", "b"]}
+        self.assertEqual(collection_fingerprint(collection), fingerprint)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import threading
+import unittest
+from rate_limiter import AdaptiveRateLimiter
+
+class FakeClock:
+    """Manual clock whose sleep just advances time"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+
+    def make_limiter(self, **kwargs):
+        self.clock = FakeClock()
+        return AdaptiveRateLimiter(clock=self.clock, sleep=self.clock.sleep, **kwargs)
+
+    def test_acquire_paces_requests_at_the_rate(self):
+        limiter = self.make_limiter(rate=2.0, burst=1)
+        for _ in range(5):
+            limiter.acquire()
+        # The first token is ready at once, the other four arrive every 0.5s
+        self.assertAlmostEqual(self.clock.now, 2.0)
+        self.assertEqual(limiter.stats["requests"], 5)
+
+    def test_fast_successes_increase_rate_up_to_max(self):
+        limiter = self.make_limiter(rate=1.0, max_rate=1.25, increase=0.1, target_latency=2.0)
+        limiter.record(0.5)
+        self.assertAlmostEqual(limiter.rate, 1.1)
+        for _ in range(5):
+            limiter.record(0.5)
+        self.assertEqual(limiter.rate, 1.25)
+
+    def test_errors_and_slow_responses_back_off(self):
+        limiter = self.make_limiter(rate=4.0, min_rate=0.5, decrease=0.5, target_latency=2.0, cooldown=10.0)
+        limiter.record(0.1, ok=False)
+        self.assertEqual(limiter.rate, 2.0)
+
+        # Within the cooldown further slow responses count as the same slowdown
+        limiter.record(3.0)
+        self.assertEqual(limiter.rate, 2.0)
+
+        for _ in range(3):
+            self.clock.sleep(10.0)
+            limiter.record(3.0)
+        self.assertEqual(limiter.rate, 0.5)
+        self.assertEqual(limiter.stats["slowdowns"], 4)
+
+    def test_shared_between_threads(self):
+        limiter = AdaptiveRateLimiter(rate=1000.0, burst=10, max_rate=1000.0)
+        threads = [threading.Thread(target=lambda: [limiter.acquire() for _ in range(20)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(limiter.stats["requests"], 80)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import json
+import tempfile
+import unittest
+from scrape_checkpoint import ScrapeCheckpoint
+
+def car(i):
+    return {"price": f"₹ {i} Lakh", "car_name": f"Car {i}", "details": {}, "seller_remarks": None,
+            "url": f"https://example.com/car/{i}"}
+
+class TestScrapeCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.records_path = os.path.join(self.tmp.name, "cars.jsonl")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_resume_skips_recorded_work(self):
+        with ScrapeCheckpoint(self.records_path, resume=False) as checkpoint:
+            self.assertTrue(checkpoint.add_car(car(1)))
+            self.assertFalse(checkpoint.add_car(car(1)))
+            checkpoint.add_car(car(2))
+            checkpoint.complete_page(5)
+
+        with ScrapeCheckpoint(self.records_path, resume=True) as checkpoint:
+            self.assertTrue(checkpoint.is_page_done(5))
+            self.assertFalse(checkpoint.is_page_done(6))
+            self.assertTrue(checkpoint.is_url_done(car(2)["url"]))
+            checkpoint.add_car(car(3))
+            self.assertEqual([c["car_name"] for c in checkpoint.cars()], ["Car 1", "Car 2", "Car 3"])
+
+    def test_partial_last_line_is_discarded(self):
+        with ScrapeCheckpoint(self.records_path, resume=False) as checkpoint:
+            checkpoint.add_car(car(1))
+        with open(self.records_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(car(2))[:25])
+
+        with ScrapeCheckpoint(self.records_path, resume=True) as checkpoint:
+            self.assertFalse(checkpoint.is_url_done(car(2)["url"]))
+            checkpoint.add_car(car(2))
+            output_path = os.path.join(self.tmp.name, "cars.json")
+            self.assertEqual(checkpoint.write_json(output_path), [car(1), car(2)])
+        with open(output_path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), [car(1), car(2)])
+
+    def test_fresh_start_truncates(self):
+        with ScrapeCheckpoint(self.records_path) as checkpoint:
+            checkpoint.add_car(car(1))
+            checkpoint.complete_page(2)
+        # Not resuming is the default, so a later scrape fetches every page again
+        with ScrapeCheckpoint(self.records_path) as checkpoint:
+            self.assertEqual(checkpoint.cars(), [])
+            self.assertFalse(checkpoint.is_page_done(2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import importlib.util
+import tempfile
+import threading
+import unittest
+from urllib.parse import urljoin
+from lxml import html
+from http_scraper import _V_TABLE_XPATH, element_text, parse_car_page
+from rate_limiter import AdaptiveRateLimiter
+from scrape_checkpoint import ScrapeCheckpoint
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'cartrade')
+BASE_URL = "https://www.cartrade.com"
+
+PAGES = {
+    "/second-hand/delhi/page-1/": "listing_page_1.html",
+    "/second-hand/delhi/page-2/": "listing_page_empty.html",
+    "/second-hand/delhi/kia-seltos/17zwpi7h/?dc=0": "car_kia_seltos.html",
+    "/second-hand/delhi/honda-city/29xkq1a/": "car_honda_city.html",
+}
+
+def fixture_html(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return f.read().replace("http://{host}", BASE_URL)
+
+class FixtureDriver:
+    """Stands in for a Chrome WebDriver on the saved CarTrade pages.
+
+    execute_script answers the scraper's scripts the way the browser would,
+    with lxml and element_text in place of the DOM and innerText.
+    """
+
+    def __init__(self):
+        self.current_url = None
+        self.tree = html.fromstring("<html></html>")
+        self.scripts = []
+        self.quit_calls = 0
+
+    def get(self, url):
+        self.current_url = url
+        name = PAGES.get(url.split("#")[0][len(BASE_URL):])
+        self.tree = html.fromstring(fixture_html(name) if name else "<html><body>Listing removed</body></html>")
+
+    def find_element(self, by, value):
+        # WebDriverWait only needs the element to be present
+        return object()
+
+    def execute_script(self, script, *args):
+        import scrapper
+        self.scripts.append(script)
+        if script == "return document.readyState":
+            return "complete"
+        if script == scrapper.CARD_URLS_SCRIPT:
+            return [urljoin(self.current_url, href)
+                    for card in self.tree.xpath(args[0]) for href in card.xpath("./a/@href")[:1]]
+        if script == scrapper.CAR_PAGE_SCRIPT:
+            price_xpath, name_xpath, table_xpath, table_css, remarks_xpath = args
+            text_of = lambda xpath: next((element_text(node) for node in self.tree.xpath(xpath)), None)
+            # table_css is "table.v_table", which _V_TABLE_XPATH spells as an XPath
+            tables = self.tree.xpath(table_xpath) or self.tree.xpath(_V_TABLE_XPATH)
+            details = []
+            for row in (tables[0].iter("tr") if tables else []):
+                cells = row.xpath(".//td")
+                if not row.xpath(".//td[@colspan]") and len(cells) >= 2:
+                    details.append([element_text(cells[0]), element_text(cells[1])])
+            return {"price": text_of(price_xpath), "car_name": text_of(name_xpath), "details": details,
+                    "seller_remarks": text_of(remarks_xpath)}
+        raise AssertionError(f"Unexpected script: {script[:40]}")
+
+    def quit(self):
+        self.quit_calls += 1
+
+@unittest.skipUnless(importlib.util.find_spec("selenium"), "selenium is not installed")
+class TestScriptExtraction(unittest.TestCase):
+
+    def test_extract_car_page_matches_http_parser(self):
+        import scrapper
+        for path in ("/second-hand/delhi/kia-seltos/17zwpi7h/?dc=0", "/second-hand/delhi/honda-city/29xkq1a/"):
+            driver = FixtureDriver()
+            driver.get(BASE_URL + path)
+            car = scrapper.extract_car_page(driver)
+
+            # One round trip per page, and the same record the HTTP scraper parses
+            self.assertEqual(driver.scripts, [scrapper.CAR_PAGE_SCRIPT])
+            expected = parse_car_page(fixture_html(PAGES[path]), BASE_URL + path)
+            del expected["url"]
+            self.assertEqual(car, expected)
+        self.assertEqual(car["details"], {"fuel_type": "Petrol", "colour": "White"})
+
+    def test_card_urls_from_script(self):
+        import scrapper
+        driver = FixtureDriver()
+        urls = scrapper.get_card_urls_from_page(driver, BASE_URL + "/second-hand/delhi/page-1/")
+        self.assertEqual(urls, [BASE_URL + "/second-hand/delhi/kia-seltos/17zwpi7h/?dc=0",
+                                BASE_URL + "/second-hand/delhi/honda-city/29xkq1a/",
+                                BASE_URL + "/second-hand/delhi/missing-car/404/"])
+        self.assertEqual(driver.scripts, [scrapper.CARD_URLS_SCRIPT])
+
+@unittest.skipUnless(importlib.util.find_spec("selenium"), "selenium is not installed")
+class TestScraperPool(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.checkpoint = ScrapeCheckpoint(os.path.join(self.tmp.name, "cars.jsonl"))
+        self.drivers = []
+
+    def tearDown(self):
+        self.checkpoint.close()
+        self.tmp.cleanup()
+
+    def pool(self, driver_factory=None, workers=2):
+        import scrapper
+        return scrapper.ScraperPool(workers=workers, driver_factory=driver_factory or self.new_driver,
+                                    limiter=AdaptiveRateLimiter(rate=1000, max_rate=1000, burst=100))
+
+    def new_driver(self):
+        driver = FixtureDriver()
+        self.drivers.append(driver)
+        return driver
+
+    def scrape_in_thread(self, pool):
+        """Run pool.scrape, failing the test instead of hanging if it never returns"""
+        errors = []
+
+        def run():
+            try:
+                pool.scrape(1, 5, self.checkpoint)
+            except Exception as e:
+                errors.append(e)
+
+        runner = threading.Thread(target=run, daemon=True)
+        runner.start()
+        runner.join(timeout=30)
+        self.assertFalse(runner.is_alive(), "scrape did not return")
+        self.assertFalse([t for t in threading.enumerate() if t.name.startswith("worker-")])
+        return errors
+
+    def test_scrapes_listing_pages_into_checkpoint(self):
+        self.assertEqual(self.scrape_in_thread(self.pool()), [])
+
+        names = sorted(str(car["car_name"]) for car in self.checkpoint.cars())
+        self.assertEqual(names, ["2018 Honda City ZX CVT Petrol", "2020 Kia Seltos HTX 1.5 Diesel", "None"])
+        self.assertTrue(self.checkpoint.is_page_done(1))
+        self.assertFalse(self.checkpoint.is_page_done(2))
+        # The listing browser and one per worker, each closed once
+        self.assertEqual([driver.quit_calls for driver in self.drivers], [1, 1, 1])
+
+    def test_listing_browser_failure_does_not_hang(self):
+        def broken_factory():
+            raise RuntimeError("chrome not reachable")
+
+        errors = self.scrape_in_thread(self.pool(broken_factory))
+        self.assertEqual([str(e) for e in errors], ["chrome not reachable"])
+
+    def test_worker_browser_failures_stop_the_scrape(self):
+        def factory():
+            if self.drivers:
+                raise RuntimeError("chrome not reachable")
+            return self.new_driver()
+
+        errors = self.scrape_in_thread(self.pool(factory))
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(str(errors[0]).startswith("All scraper workers have stopped"))
+        self.assertEqual(self.drivers[0].quit_calls, 1)
+        self.assertEqual(self.checkpoint.cars(), [])
+
+if __name__ == '__main__':
+    unittest.main()
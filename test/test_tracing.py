@@ -0,0 +1,136 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import unittest
+import urllib.request
+import uuid
+from unittest.mock import MagicMock
+import chromadb
+import tracing
+from llm_rag import RAGEngine, car_rag_pipeline, retrieve_context
+from tracing import NoopTracer, Tracer
+
+class LengthEmbeddingFunction:
+    def __call__(self, input):
+        return [[float(len(text)), float(sum(map(ord, text)) % 97), 1.0] for text in input]
+
+    def name(self):
+        return "length"
+
+class TestTracer(unittest.TestCase):
+
+    def setUp(self):
+        self.tracer = Tracer()
+
+    def test_span_records_stage_histogram_and_parent(self):
+        events = []
+        self.tracer.add_hook(events.append)
+        with self.tracer.span("query"):
+            with self.tracer.span("vector_search"):
+                pass
+
+        spans = [e for e in events if e["kind"] == "span"]
+        self.assertEqual([(e["name"], e["parent"]) for e in spans], [("vector_search", "query"), ("query", None)])
+        summary = self.tracer.stage_summary()
+        self.assertEqual(summary["query"]["count"], 1)
+        self.assertEqual(summary["vector_search"]["count"], 1)
+
+    def test_failed_span_is_counted(self):
+        with self.assertRaises(RuntimeError):
+            with self.tracer.span("llm_generation"):
+                raise RuntimeError("boom")
+        counters = self.tracer.snapshot()["counters"]
+        self.assertEqual(counters[("rag_stage_errors_total", (("stage", "llm_generation"),))], 1)
+
+    def test_failing_hook_does_not_break_the_pipeline(self):
+        def broken_hook(event):
+            raise ValueError("bad hook")
+
+        self.tracer.add_hook(broken_hook)
+        self.tracer.count("rag_llm_errors_total")
+        self.tracer.remove_hook(broken_hook)
+        self.assertEqual(self.tracer.snapshot()["counters"][("rag_llm_errors_total", ())], 1)
+
+    def test_render_prometheus(self):
+        self.tracer.count("rag_answer_cache_total", result="hit")
+        self.tracer.count("rag_answer_cache_total", result="hit")
+        self.tracer.observe("rag_prompt_chars", 1500)
+        self.tracer.observe("rag_prompt_chars", 40000)
+        text = self.tracer.render_prometheus()
+
+        self.assertIn("# TYPE rag_answer_cache_total counter", text)
+        self.assertIn('rag_answer_cache_total{result="hit"} 2', text)
+        self.assertIn("# TYPE rag_prompt_chars histogram", text)
+        self.assertIn('rag_prompt_chars_bucket{le="1000"} 0', text)
+        self.assertIn('rag_prompt_chars_bucket{le="2000"} 1', text)
+        self.assertIn('rag_prompt_chars_bucket{le="+Inf"} 2', text)
+        self.assertIn("rag_prompt_chars_sum 41500.0", text)
+        self.assertIn("rag_prompt_chars_count 2", text)
+
+    def test_noop_tracer_records_nothing(self):
+        tracer = NoopTracer()
+        with tracer.span("query") as first, tracer.span("embedding") as second:
+            tracer.count("rag_llm_errors_total")
+        self.assertIs(first, second)
+        self.assertEqual(tracer.render_prometheus(), "")
+
+    def test_metrics_endpoint(self):
+        self.tracer.count("rag_fallback_queries_total", reason="no_results")
+        server = tracing.start_metrics_server(port=0, tracer=self.tracer)
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+                body = response.read().decode("utf-8")
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertIn('rag_fallback_queries_total{reason="no_results"} 1', body)
+
+class TestPipelineTracing(unittest.TestCase):
+
+    def setUp(self):
+        self.tracer = Tracer()
+        self.previous = tracing.set_tracer(self.tracer)
+        embedding_function = LengthEmbeddingFunction()
+        self.collection = chromadb.EphemeralClient().create_collection(
+            name=f"cars_{uuid.uuid4().hex}", embedding_function=embedding_function
+        )
+        self.collection.add(ids=["c1"], documents=["CAR: 2020 Kia Seltos HTX 1.5 Diesel"], metadatas=[{
+            "car_name": "2020 Kia Seltos HTX 1.5 Diesel", "price": "₹ 12.5 Lakh", "city": "Delhi",
+            "fuel_type": "Diesel", "manufacturing_year": "2020", "url": "https://example.com/kia"
+        }])
+        self.llm_client = MagicMock()
+        self.llm_client.GenerativeModel.return_value.generate_content.return_value.text = "The Kia Seltos."
+        self.engine = RAGEngine.from_components(self.collection, self.llm_client, embedding_function,
+                                                answer_cache_path=None, listings_path=None)
+
+    def tearDown(self):
+        tracing.set_tracer(self.previous)
+
+    def test_pipeline_stages_are_traced(self):
+        car_rag_pipeline("Is there a diesel Kia?", engine=self.engine)
+        car_rag_pipeline("Is there a diesel Kia?", engine=self.engine)
+
+        summary = self.tracer.stage_summary()
+        for stage in ("query", "filter_parsing", "embedding", "vector_search", "prompt_formatting",
+                      "llm_generation"):
+            self.assertEqual(summary[stage]["count"], 2, stage)
+        counters = self.tracer.snapshot()["counters"]
+        self.assertEqual(counters[("rag_embedding_cache_total", (("result", "miss"),))], 1)
+        self.assertEqual(counters[("rag_embedding_cache_total", (("result", "hit"),))], 1)
+        self.assertEqual(self.tracer.snapshot()["histograms"][("rag_prompt_chars", ())]["count"], 2)
+
+    def test_fallback_and_llm_errors_are_counted(self):
+        retrieve_context(self.collection, "Petrol cars", filters={"fuel_type": "Petrol"})
+        counters = self.tracer.snapshot()["counters"]
+        self.assertEqual(counters[("rag_fallback_queries_total", (("reason", "no_results"),))], 1)
+        self.assertEqual(self.tracer.stage_summary()["fallback_query"]["count"], 1)
+
+        self.llm_client.GenerativeModel.return_value.generate_content.side_effect = RuntimeError("quota")
+        answer = car_rag_pipeline("Is there a diesel Kia?", engine=self.engine)
+
+        self.assertTrue(answer.startswith("Error generating response"))
+        counters = self.tracer.snapshot()["counters"]
+        self.assertEqual(counters[("rag_llm_errors_total", (("error", "RuntimeError"),))], 1)
+
+if __name__ == '__main__':
+    unittest.main()